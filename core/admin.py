@@ -1,11 +1,19 @@
 from django import forms
 from django.contrib import admin
 from django.utils.html import format_html
+from django.db import transaction
 from django.db.models import Count
+from django.utils import timezone
 
+from .customers import normalize_phone
+from .delivery import book_courier, reassign_courier, release_courier
+from .images import derivative_url
+from .rollups import move_order
+from .search import filter_bouquets
 from .models import (
     Bouquet, Customer, Courier, Order,
-    Consultation, Payment, Florist
+    Consultation, Payment, Florist, TelegramMessage,
+    DeliverySlot, CourierSlot, PaymentEvent
 )
 
 
@@ -32,32 +40,55 @@ class BouquetAdmin(admin.ModelAdmin):
     list_per_page = 25
     ordering = ('name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(orders_total=Count('orders'))
+
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index instead of icontains scans over search_fields.
+        return filter_bouquets(queryset, search_term), False
+
     def image_preview(self, obj):
         if obj.image:
+            url = derivative_url(obj.image.name, min(obj.image_widths), 'webp') if obj.image_widths else obj.image.url
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 100px;" />',
-                obj.image.url
+                url
             )
         return 'Нет изображения'
 
     image_preview.short_description = 'Превью'
 
     def created_orders_count(self, obj):
-        return obj.orders.count()
+        return obj.orders_total
 
     created_orders_count.short_description = 'Кол-во заказов'
+    created_orders_count.admin_order_field = 'orders_total'
 
 
 class OrderInline(admin.TabularInline):
     model = Order
     extra = 1
-    fields = ('bouquet', 'delivery_address', 'delivery_time', 'courier', 'created_at')
+    fields = ('bouquet', 'delivery_address', 'delivery_time', 'delivery_slot', 'courier', 'created_at')
     readonly_fields = ('created_at',)
     can_delete = True
 
 
+class CustomerForm(forms.ModelForm):
+    class Meta:
+        model = Customer
+        fields = '__all__'
+
+    def clean_phone_number(self):
+        phone_number = self.cleaned_data['phone_number']
+        duplicates = Customer.objects.filter(phone_key=normalize_phone(phone_number)).exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise forms.ValidationError('Покупатель с таким номером телефона уже существует.')
+        return phone_number
+
+
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
+    form = CustomerForm
     list_display = ('first_name', 'last_name', 'phone_number', 'orders_count')
     search_fields = ('first_name', 'last_name', 'phone_number')
     list_filter = ('phone_number',)
@@ -65,31 +96,40 @@ class CustomerAdmin(admin.ModelAdmin):
     list_per_page = 25
     ordering = ('first_name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(orders_total=Count('order'))
+
     def orders_count(self, obj):
-        return obj.order_set.count()
+        return obj.orders_total
 
     orders_count.short_description = 'Кол-во заказов'
+    orders_count.admin_order_field = 'orders_total'
 
 
 @admin.register(Courier)
 class CourierAdmin(admin.ModelAdmin):
-    list_display = ('name', 'phone_number', 'telegram_chat_id', 'assigned_orders_count')
+    list_display = ('name', 'phone_number', 'telegram_chat_id', 'slot_capacity', 'assigned_orders_count')
     search_fields = ('name', 'phone_number', 'telegram_chat_id')
     list_filter = ('phone_number',)
     list_per_page = 25
     ordering = ('name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(orders_total=Count('order'))
+
     def assigned_orders_count(self, obj):
-        return obj.order_set.count()
+        return obj.orders_total
 
     assigned_orders_count.short_description = 'Назначено заказов'
+    assigned_orders_count.admin_order_field = 'orders_total'
 
 
 def assign_courier(modeladmin, request, queryset):
-    courier_id = request.POST.get('courier_id')
+    courier_id = request.POST.get('courier')
     if courier_id:
         courier = Courier.objects.get(id=courier_id)
-        queryset.update(courier=courier)
+        for order in queryset.exclude(courier=courier):
+            reassign_courier(order, courier)
         modeladmin.message_user(
             request,
             f"Курьер {courier.name} назначен на выбранные заказы."
@@ -106,19 +146,35 @@ class AssignCourierForm(forms.Form):
     )
 
 
+class CourierSlotInline(admin.TabularInline):
+    model = CourierSlot
+    extra = 0
+    fields = ('courier', 'capacity', 'booked')
+
+
+@admin.register(DeliverySlot)
+class DeliverySlotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'start_time', 'end_time')
+    list_filter = ('date',)
+    inlines = [CourierSlotInline]
+    list_per_page = 25
+    ordering = ('-date', 'start_time')
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
         'bouquet', 'customer', 'customer__phone_number', 'courier',
-        'delivery_address', 'delivery_time', 'created_at'
+        'delivery_address', 'delivery_time', 'delivery_slot', 'created_at'
     )
     list_filter = (
-        'created_at', 'courier', 'bouquet__occasion', 'bouquet__budget'
+        'created_at', 'delivery_slot__date', 'courier', 'bouquet__occasion', 'bouquet__budget'
     )
     search_fields = (
         'customer__first_name', 'customer__last_name',
         'customer__phone_number', 'delivery_address', 'bouquet__name'
     )
+    list_select_related = ('bouquet', 'customer', 'courier', 'delivery_slot')
     list_per_page = 25
     ordering = ('-created_at',)
     actions = [assign_courier]
@@ -138,6 +194,17 @@ class OrderAdmin(admin.ModelAdmin):
     def get_action_form(self, request):
         return AssignCourierForm
 
+    def save_model(self, request, obj, form, change):
+        if not change or not {'bouquet', 'customer', 'courier', 'delivery_slot'} & set(form.changed_data):
+            super().save_model(request, obj, form, change)
+            return
+        with transaction.atomic():
+            previous = Order.objects.get(id=obj.id)
+            release_courier(previous)
+            super().save_model(request, obj, form, change)
+            book_courier(obj)
+            move_order(previous, obj)
+
 
 @admin.register(Consultation)
 class ConsultationAdmin(admin.ModelAdmin):
@@ -146,6 +213,7 @@ class ConsultationAdmin(admin.ModelAdmin):
     search_fields = (
         'customer__first_name', 'customer__last_name', 'customer__phone_number'
     )
+    list_select_related = ('customer', 'florist')
     list_per_page = 25
     ordering = ('-created_at',)
 
@@ -154,17 +222,21 @@ class ConsultationAdmin(admin.ModelAdmin):
 class FloristAdmin(admin.ModelAdmin):
     list_display = (
         'name', 'phone_number', 'telegram_chat_id',
-        'assigned_consultations_count'
+        'consultation_load', 'assigned_consultations_count'
     )
     search_fields = ('name', 'phone_number', 'telegram_chat_id')
     list_filter = ('phone_number',)
     list_per_page = 25
     ordering = ('name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(consultations_total=Count('consultation'))
+
     def assigned_consultations_count(self, obj):
-        return obj.consultation_set.count()
+        return obj.consultations_total
 
     assigned_consultations_count.short_description = 'Кол-во заявок'
+    assigned_consultations_count.admin_order_field = 'consultations_total'
 
 
 @admin.register(Payment)
@@ -172,5 +244,37 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ('order', 'payment_id', 'status', 'amount', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('order__id', 'payment_id')
+    list_select_related = ('order__bouquet', 'order__customer')
     ordering = ('-created_at',)
     readonly_fields = ('payment_id', 'status', 'amount', 'created_at')
+
+
+def retry_telegram_messages(modeladmin, request, queryset):
+    updated = queryset.exclude(status='sent').update(
+        status='pending', attempts=0, next_attempt_at=timezone.now()
+    )
+    modeladmin.message_user(request, f"Поставлено в очередь повторно: {updated}")
+
+
+retry_telegram_messages.short_description = "Повторить отправку выбранных уведомлений"
+
+
+@admin.register(TelegramMessage)
+class TelegramMessageAdmin(admin.ModelAdmin):
+    list_display = ('chat_id', 'bot', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'bot', 'created_at')
+    search_fields = ('chat_id', 'text', 'last_error')
+    list_per_page = 25
+    ordering = ('-created_at',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = [retry_telegram_messages]
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('event_key', 'event_type', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type', 'received_at')
+    search_fields = ('event_key',)
+    list_per_page = 25
+    ordering = ('-received_at',)
+    readonly_fields = ('event_key', 'event_type', 'payload', 'attempts', 'received_at', 'processed_at', 'error')
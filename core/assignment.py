@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Consultation, Florist
+
+
+def assign_florist():
+    """Reserve the least loaded florist and return it, or None if there are none.
+
+    The counter is bumped with a compare-and-set UPDATE, so concurrent
+    submissions that read the same candidate cannot both win it; the loser
+    re-reads and takes the next florist.
+    """
+    for _ in range(settings.FLORIST_ASSIGN_ATTEMPTS):
+        florist = Florist.objects.order_by('consultation_load', 'id').first()
+        if florist is None:
+            return None
+        updated = Florist.objects.filter(
+            id=florist.id, consultation_load=florist.consultation_load
+        ).update(consultation_load=F('consultation_load') + 1)
+        if updated:
+            florist.consultation_load += 1
+            return florist
+    Florist.objects.filter(id=florist.id).update(consultation_load=F('consultation_load') + 1)
+    return florist
+
+
+def rebuild_florist_load(window_hours=None):
+    """Reset every counter to the number of consultations in the active window."""
+    window_hours = window_hours or settings.FLORIST_LOAD_WINDOW_HOURS
+    since = timezone.now() - timedelta(hours=window_hours)
+    counts = dict(
+        Consultation.objects.filter(created_at__gte=since, florist__isnull=False)
+        .values_list('florist')
+        .annotate(count=Count('id'))
+    )
+    florists = list(Florist.objects.only('id', 'consultation_load'))
+    changed = []
+    for florist in florists:
+        load = counts.get(florist.id, 0)
+        if florist.consultation_load != load:
+            florist.consultation_load = load
+            changed.append(florist)
+    Florist.objects.bulk_update(changed, ['consultation_load'], batch_size=500)
+    return len(changed)
@@ -0,0 +1,6 @@
+from . import async_views
+from .urls import get_urlpatterns
+
+
+# The async public pages regardless of ASYNC_VIEWS, for the tests.
+urlpatterns = get_urlpatterns(async_views)
@@ -0,0 +1,179 @@
+"""Async versions of the public pages for ASGI deployments (ASYNC_VIEWS=1).
+
+Reads go through the async ORM and outbound calls through httpx, so a
+request waiting on the database or YooKassa does not hold a thread. Writes
+that need a transaction run in the ORM's worker thread, since atomic()
+has no async form. Templates are rendered with everything they need
+already loaded: a lazy queryset touched by a template on the event loop
+raises SynchronousOnlyOperation.
+"""
+import json
+from json.decoder import JSONDecodeError
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.http import HttpResponse, HttpResponseRedirect
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.views.decorators.csrf import csrf_exempt
+
+from .bouquet_index import bouquet_index
+from .db_router import use_primary
+from .forms import ConsultationForm, CustomerForm, OrderForm
+from .models import Bouquet, Payment
+from .pagination import aget_offset_page
+from .payment_events import arecord_event
+from .payments import PaymentError, get_payment_gateway
+from .search import search_bouquets
+from .views import (
+    catalog_page, get_catalog_paginator, get_catalog_sort, get_payment_details, handle_consultation_submission,
+    index_page, order_page, pick_recommended, place_order, quiz_page, quiz_step_page, read_quiz_answers, read_seen,
+    search_page, search_url,
+)
+
+
+async def ahandle_consultation_submission(request, redirect_name, *args, **kwargs):
+    if request.method != 'POST':
+        return ConsultationForm()
+    return await sync_to_async(handle_consultation_submission)(request, redirect_name, *args, **kwargs)
+
+
+async def aget_recommended_bouquets(request):
+    seen = read_seen(request)
+    ids = await bouquet_index.asample(settings.RECOMMENDATIONS_COUNT, exclude=seen)
+    return pick_recommended(seen, ids, await Bouquet.objects.ain_bulk(ids))
+
+
+async def index(request):
+    recommended_bouquets, seen = await aget_recommended_bouquets(request)
+    form = await ahandle_consultation_submission(request, 'index')
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    return index_page(request, recommended_bouquets, seen, form)
+
+
+async def quiz(request):
+    form = await ahandle_consultation_submission(request, 'quiz')
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    return quiz_page(request, form)
+
+
+async def quiz_step(request):
+    form = await ahandle_consultation_submission(request, 'quiz_step')
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    answers = read_quiz_answers(request)
+    bouquet_id = await bouquet_index.achoice(*answers) if answers else None
+    return quiz_step_page(request, form, answers, bouquet_id)
+
+
+async def result(request, bouquet_id):
+    bouquet = await aget_object_or_404(Bouquet, id=bouquet_id)
+    form = await ahandle_consultation_submission(request, 'result', bouquet_id=bouquet_id)
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    return render(
+        request,
+        'result.html',
+        {'bouquet': bouquet, 'consultation_form': form}
+    )
+
+
+async def use_cursor_pagination(request):
+    mode = settings.CATALOG_PAGINATION
+    if mode == 'auto':
+        return 'cursor' in request.GET or await bouquet_index.acount() > settings.CATALOG_CURSOR_THRESHOLD
+    return mode == 'cursor'
+
+
+async def catalog(request):
+    sort = get_catalog_sort(request)
+    form = await ahandle_consultation_submission(request, 'catalog')
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    # The sync view loads the page lazily so a fragment cache hit skips the
+    # query; here it has to be loaded before rendering.
+    cursor_pagination = await use_cursor_pagination(request)
+    paginator = get_catalog_paginator(sort, cursor_pagination)
+    if cursor_pagination:
+        page_obj = await paginator.aget_page(request.GET.get('cursor'))
+    else:
+        page_obj = await aget_offset_page(paginator, request.GET.get('page'))
+    return catalog_page(request, paginator, page_obj, cursor_pagination, sort, form)
+
+
+async def card(request, bouquet_id):
+    bouquet = await aget_object_or_404(Bouquet, id=bouquet_id)
+    form = await ahandle_consultation_submission(request, 'card', bouquet_id=bouquet_id)
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    return render(
+        request,
+        'card.html',
+        {'bouquet': bouquet, 'consultation_form': form}
+    )
+
+
+async def search(request):
+    query = request.GET.get('q', '').strip()
+    form = await ahandle_consultation_submission(request, search_url(query))
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    ids = await sync_to_async(search_bouquets)(query, settings.SEARCH_RESULTS_LIMIT)
+    return search_page(request, query, ids, await Bouquet.objects.ain_bulk(ids), form)
+
+
+async def consultation(request):
+    form = await ahandle_consultation_submission(request, 'index')
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    return render(
+        request,
+        'consultation.html',
+        {'consultation_form': form}
+    )
+
+
+async def order(request, bouquet_id):
+    bouquet = await aget_object_or_404(Bouquet, id=bouquet_id)
+    if request.method != 'POST':
+        return order_page(request, bouquet, CustomerForm(), OrderForm())
+    customer_form = CustomerForm(request.POST)
+    order_form = OrderForm(request.POST)
+    order = await sync_to_async(place_order)(request, bouquet, customer_form, order_form)
+    if order is None:
+        return order_page(request, bouquet, customer_form, order_form)
+    try:
+        payment = await get_payment_gateway().acreate_payment(**get_payment_details(request, order))
+        await Payment.objects.acreate(
+            order=order,
+            payment_id=payment.id,
+            status=payment.status,
+            amount=order.bouquet.price
+        )
+        return redirect(payment.confirmation_url)
+    except PaymentError as e:
+        messages.error(request, f"Ошибка оплаты: {e}")
+        return order_page(request, bouquet, customer_form, order_form)
+
+
+@use_primary
+async def order_complete(request, order_id):
+    payment = await aget_object_or_404(Payment, order_id=order_id)
+    if payment.status == 'succeeded':
+        messages.success(request, 'Оплата успешна! Заказ в обработке.')
+    else:
+        messages.error(request, 'Оплата не удалась.')
+    return redirect('index')
+
+
+@csrf_exempt
+async def webhook_yookassa(request):
+    if request.method == 'POST':
+        try:
+            await arecord_event(json.loads(request.body))
+        except (JSONDecodeError, KeyError, TypeError):
+            return HttpResponse(status=400)
+        return HttpResponse(status=200)
+    return HttpResponse(status=400)
@@ -0,0 +1,200 @@
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Bouquet, Consultation, Courier, Customer, Florist, Order, Payment
+
+
+FIRST_NAMES = ['Анна', 'Мария', 'Елена', 'Ольга', 'Иван', 'Сергей', 'Дмитрий', 'Алексей', 'Наталья', 'Павел']
+LAST_NAMES = ['Иванова', 'Петрова', 'Смирнова', 'Кузнецов', 'Попов', 'Соколов', 'Волкова', 'Морозов', '']
+STREETS = ['ул. Пушкинская', 'ул. Жукова', 'пр. Мира', 'ул. Ленина', 'ул. Садовая', 'наб. Фонтанки']
+FLOWERS = [
+    ('розы', 'розами'), ('пионы', 'пионами'), ('тюльпаны', 'тюльпанами'), ('хризантемы', 'хризантемами'),
+    ('лилии', 'лилиями'), ('ромашки', 'ромашками'), ('гортензии', 'гортензиями'), ('эустомы', 'эустомами'),
+    ('альстромерии', 'альстромериями'), ('гвоздики', 'гвоздиками'), ('ирисы', 'ирисами'), ('герберы', 'герберами'),
+]
+MOODS = ['Нежный', 'Яркий', 'Летний', 'Осенний', 'Праздничный', 'Воздушный', 'Классический', 'Пышный']
+PAYMENT_STATUSES = ['succeeded'] * 8 + ['pending', 'canceled']
+WRITE_PATTERN = re.compile(r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run a benchmark inside a transaction that is always rolled back."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def create_bouquets(count, batch_size=5000, prefix='Бенчмарк', start=0):
+    occasions = [value for value, _ in Bouquet.OCCASIONS]
+    budgets = [value for value, _ in Bouquet.BUDGETS]
+    for offset in range(0, count, batch_size):
+        Bouquet.objects.bulk_create(
+            random_bouquet(f'{prefix} {start + i}', occasions, budgets)
+            for i in range(offset, min(offset + batch_size, count))
+        )
+
+
+def random_bouquet(name, occasions, budgets):
+    flowers = random.sample(FLOWERS, random.randint(1, 3))
+    return Bouquet(
+        name=name,
+        price=random.randint(500, 15000),
+        description=f'{random.choice(MOODS)} букет с {flowers[0][1]} и зеленью',
+        composition=', '.join(nominative for nominative, _ in flowers).capitalize() + ', зелень',
+        occasion=random.choice(occasions),
+        budget=random.choice(budgets),
+    )
+
+
+def create_in_batches(model, objects, batch_size, backdate=False):
+    """bulk_create ``objects`` in batches.
+
+    With ``backdate`` the ``created_at`` set on each object is written back
+    by a bulk_update, since auto_now_add overwrites it on insert.
+    """
+    created = []
+    batch = []
+
+    def flush():
+        dates = [obj.created_at for obj in batch] if backdate else None
+        rows = model.objects.bulk_create(batch)
+        if backdate and rows:
+            for obj, created_at in zip(rows, dates):
+                obj.created_at = created_at
+            model.objects.bulk_update(rows, ['created_at'])
+        created.extend(rows)
+
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    flush()
+    return created
+
+
+def random_past(days):
+    return timezone.now() - timedelta(seconds=random.randint(0, days * 86400))
+
+
+def create_shop_data(bouquets=0, customers=0, couriers=0, florists=0, orders=0, consultations=0,
+                     paid=0.9, days=90, batch_size=2000):
+    """Fill the shop with random rows through bulk_create; signals are not sent."""
+    created = {}
+    create_bouquets(bouquets, batch_size, prefix='Букет', start=Bouquet.objects.count())
+    created['bouquets'] = bouquets
+
+    start = Customer.objects.count()
+    created['customers'] = len(create_in_batches(Customer, (
+        Customer(
+            first_name=random.choice(FIRST_NAMES),
+            last_name=random.choice(LAST_NAMES),
+            phone_number=f'+7901{start + i:07d}',
+            phone_key=f'+7901{start + i:07d}',
+        )
+        for i in range(customers)
+    ), batch_size))
+    created['couriers'] = len(Courier.objects.bulk_create(
+        Courier(name=f'Курьер {i}', telegram_chat_id=str(100000 + i), slot_capacity=random.randint(3, 6))
+        for i in range(couriers)
+    ))
+    created['florists'] = len(Florist.objects.bulk_create(
+        Florist(name=f'Флорист {i}', telegram_chat_id=str(200000 + i)) for i in range(florists)
+    ))
+
+    bouquet_prices = dict(Bouquet.objects.values_list('id', 'price'))
+    bouquet_ids = list(bouquet_prices)
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+    courier_ids = list(Courier.objects.values_list('id', flat=True)) or [None]
+    florist_ids = list(Florist.objects.values_list('id', flat=True)) or [None]
+    windows = [f'{start_hour}:00-{end_hour}:00' for start_hour, end_hour in settings.DELIVERY_WINDOWS]
+
+    new_orders = []
+    if orders and bouquet_ids and customer_ids:
+        new_orders = create_in_batches(Order, (
+            Order(
+                customer_id=random.choice(customer_ids),
+                bouquet_id=random.choice(bouquet_ids),
+                courier_id=random.choice(courier_ids),
+                delivery_address=f'{random.choice(STREETS)}, {random.randint(1, 200)}',
+                delivery_time=random.choice(windows),
+                created_at=random_past(days),
+            )
+            for _ in range(orders)
+        ), batch_size, backdate=True)
+    created['orders'] = len(new_orders)
+
+    payments = create_in_batches(Payment, (
+        Payment(
+            order=order,
+            payment_id=str(uuid.uuid4()),
+            status=random.choice(PAYMENT_STATUSES),
+            amount=bouquet_prices[order.bouquet_id],
+            created_at=order.created_at,
+        )
+        for order in new_orders if random.random() < paid
+    ), batch_size, backdate=True)
+    created['payments'] = len(payments)
+
+    new_consultations = []
+    if consultations and customer_ids:
+        new_consultations = create_in_batches(Consultation, (
+            Consultation(
+                customer_id=random.choice(customer_ids),
+                florist_id=random.choice(florist_ids),
+                created_at=random_past(days),
+            )
+            for _ in range(consultations)
+        ), batch_size, backdate=True)
+    created['consultations'] = len(new_consultations)
+    return created
+
+
+def measure(func, repeat):
+    """Return mean seconds and queries per call of ``func``."""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = time.perf_counter() - started
+    return elapsed / repeat, len(queries) / repeat
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+@contextmanager
+def count_writes():
+    """Count INSERT/UPDATE/DELETE statements per table inside the block."""
+    writes = Counter()
+
+    def wrapper(execute, sql, params, many, context):
+        match = WRITE_PATTERN.match(sql)
+        if match:
+            writes[match.group(1)] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield writes
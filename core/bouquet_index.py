@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .fragment_cache import bump_catalog_version, get_catalog_version
+from .models import Bouquet
+
+
+ANY_BUDGET = 'не имеет значения'
+
+
+class BouquetIndex:
+    """In-process map of (occasion, budget) to compact arrays of bouquet ids.
+
+    The ``None`` key holds every id and backs the home page recommendations.
+
+    The index is dropped by the Bouquet signals and rebuilt lazily on the next
+    lookup. Other processes notice the change through the catalog version in
+    the shared cache; BOUQUET_INDEX_TTL bounds staleness when the cache is
+    per-process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.matches = None
+        self.version = None
+        self.built_at = 0
+
+    def is_stale(self, matches):
+        return (
+            matches is None
+            or self.version != get_catalog_version()
+            or time.monotonic() - self.built_at > settings.BOUQUET_INDEX_TTL
+        )
+
+    def build(self):
+        matches = defaultdict(lambda: array('q'))
+        bouquets = Bouquet.objects.values_list('id', 'occasion', 'budget').order_by('id')
+        for bouquet_id, occasion, budget in bouquets.iterator(chunk_size=5000):
+            matches[None].append(bouquet_id)
+            matches[(occasion, budget)].append(bouquet_id)
+            matches[(occasion, ANY_BUDGET)].append(bouquet_id)
+        return dict(matches)
+
+    def get_matches(self):
+        matches = self.matches
+        if self.is_stale(matches):
+            with self.lock:
+                if self.matches is matches:
+                    version = get_catalog_version()
+                    self.matches = self.build()
+                    self.version = version
+                    self.built_at = time.monotonic()
+                matches = self.matches
+        return matches
+
+    def invalidate(self):
+        self.matches = None
+
+    async def aget_matches(self):
+        """get_matches() for async views; a rebuild runs in the ORM's worker thread."""
+        matches = self.matches
+        if self.is_stale(matches):
+            matches = await sync_to_async(self.get_matches)()
+        return matches
+
+    def choice(self, occasion, budget):
+        return pick_one(self.get_matches(), occasion, budget)
+
+    async def achoice(self, occasion, budget):
+        return pick_one(await self.aget_matches(), occasion, budget)
+
+    def count(self):
+        return len(self.get_matches().get(None, ()))
+
+    async def acount(self):
+        return len((await self.aget_matches()).get(None, ()))
+
+    def sample(self, count, exclude=()):
+        return pick_sample(self.get_matches().get(None, ()), count, exclude)
+
+    async def asample(self, count, exclude=()):
+        return pick_sample((await self.aget_matches()).get(None, ()), count, exclude)
+
+
+def pick_one(matches, occasion, budget):
+    ids = matches.get((occasion, budget))
+    return random.choice(ids) if ids else None
+
+
+def pick_sample(ids, count, exclude=()):
+    """Pick ``count`` distinct ids uniformly, skipping recently shown ones.
+
+    ``exclude`` is ordered oldest first; when the catalog is too small to
+    skip all of it, only the most recent ids are skipped.
+    """
+    room = len(ids) - count
+    exclude = set(list(exclude)[-room:]) if room > 0 else set()
+    picked = []
+    seen = set()
+    while len(picked) < min(count, len(ids)):
+        bouquet_id = random.choice(ids)
+        if bouquet_id not in seen and bouquet_id not in exclude:
+            picked.append(bouquet_id)
+        seen.add(bouquet_id)
+    return picked
+
+
+bouquet_index = BouquetIndex()
+
+
+def catalog_changed(using=None):
+    """Drop the index and move the catalog version once the current transaction commits.
+
+    Done earlier, a request could rebuild the index or refill a fragment
+    from the old rows and keep them under the new version.
+    """
+    def invalidate():
+        bouquet_index.invalidate()
+        bump_catalog_version()
+
+    transaction.on_commit(invalidate, using=using)
@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .bouquet_index import catalog_changed
+from .exports import iter_csv
+from .models import Bouquet
+from .search import index_bouquets
+
+
+FIELDS = ['name', 'price', 'description', 'composition', 'occasion', 'budget', 'image']
+FORMATS = ('csv', 'jsonl')
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)
+
+
+def guess_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, format):
+    """Yield ``(line_number, dict)`` pairs from a CSV or JSON Lines text stream."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError('ожидался JSON-объект')
+
+
+def clean_row(row, columns):
+    """Validate one row with the model fields; returns ``(values, errors)``."""
+    values = {}
+    errors = []
+    for name in columns:
+        value = row.get(name)
+        if name == 'image':
+            values[name] = (value or '').strip()
+            continue
+        if value is None:
+            value = ''
+        if isinstance(value, str):
+            value = value.strip()
+        model_field = Bouquet._meta.get_field(name)
+        if value == '' and model_field.has_default():
+            value = model_field.get_default()
+        try:
+            values[name] = model_field.clean(value, None)
+        except ValidationError as e:
+            errors.append(f'{name}: {" ".join(e.messages)}')
+    return values, errors
+
+
+class ImageAttacher:
+    """Copy image files from ``images_dir`` into media storage, once per file name."""
+
+    def __init__(self, images_dir):
+        self.images_dir = images_dir
+        self.stored = {}
+
+    def attach(self, name):
+        if not name or self.images_dir is None:
+            return name
+        if name not in self.stored:
+            source = os.path.join(self.images_dir, os.path.basename(name))
+            if not os.path.isfile(source):
+                raise FileNotFoundError(f'image: нет файла {source}')
+            target = Bouquet._meta.get_field('image').generate_filename(None, os.path.basename(name))
+            if default_storage.exists(target) and default_storage.size(target) == os.path.getsize(source):
+                self.stored[name] = target
+            else:
+                with open(source, 'rb') as f:
+                    self.stored[name] = default_storage.save(target, File(f))
+        return self.stored[name]
+
+
+def import_bouquets(stream, format='csv', images_dir=None, batch_size=2000, dry_run=False):
+    """Upsert bouquets by name from a CSV or JSON Lines stream.
+
+    Rows are validated against the model fields (so occasion and budget
+    must be one of Bouquet.OCCASIONS/BUDGETS) and written with one
+    INSERT ... ON CONFLICT (name) DO UPDATE per batch. Invalid rows are
+    reported in ``result.errors`` as ``(line, message)`` and skipped; only
+    the CSV columns, or the keys of each JSON object, present in the input
+    are overwritten on existing bouquets.
+    """
+    result = ImportResult()
+    attacher = ImageAttacher(images_dir)
+    # Pending rows grouped by the columns they carry: a JSON Lines row only
+    # overwrites the keys it has, and one statement takes one update_fields.
+    batches = {}
+
+    def flush(columns):
+        batch = batches.pop(columns, None)
+        if not batch:
+            return
+        update_fields = [name for name in columns if name != 'name']
+        if 'image' in columns:
+            # Derivatives of the old image no longer apply; generate_bouquet_images fills them in.
+            update_fields.append('image_widths')
+        existing = Bouquet.objects.filter(name__in=batch).count()
+        result.created += len(batch) - existing
+        result.updated += existing
+        if dry_run:
+            return
+        with transaction.atomic():
+            if update_fields:
+                Bouquet.objects.bulk_create(
+                    [Bouquet(**values) for values in batch.values()],
+                    update_conflicts=True,
+                    unique_fields=['name'],
+                    update_fields=update_fields,
+                )
+            else:
+                Bouquet.objects.bulk_create(
+                    [Bouquet(**values) for values in batch.values()], ignore_conflicts=True
+                )
+            # bulk_create returns no ids for the updated rows, so reread the batch by name.
+            index_bouquets(Bouquet.objects.filter(name__in=list(batch)))
+
+    for line_number, row in read_rows(stream, format):
+        result.rows += 1
+        if isinstance(row, Exception):
+            result.errors.append((line_number, str(row)))
+            continue
+        columns = tuple(name for name in FIELDS if name in row)
+        if 'name' not in columns:
+            if format == 'csv':
+                result.errors.append((line_number, 'нет колонки name'))
+                return result
+            result.errors.append((line_number, 'нет поля name'))
+            continue
+        values, errors = clean_row(row, columns)
+        if 'image' in values and not errors:
+            try:
+                values['image'] = values['image'] if dry_run else attacher.attach(values['image'])
+            except (OSError, ValueError) as e:
+                errors.append(str(e))
+        if errors:
+            result.errors.append((line_number, '; '.join(errors)))
+            continue
+        # A name repeated inside one batch would hit the same row twice in one
+        # statement, which Postgres rejects; the last occurrence wins. If it
+        # is pending with other columns, write that first to keep the order.
+        for pending_columns, batch in list(batches.items()):
+            if values['name'] in batch and pending_columns != columns:
+                flush(pending_columns)
+        batch = batches.setdefault(columns, {})
+        batch.pop(values['name'], None)
+        batch[values['name']] = values
+        if len(batch) >= batch_size:
+            flush(columns)
+    for columns in list(batches):
+        flush(columns)
+
+    if not dry_run and result.created + result.updated:
+        # bulk_create sends no post_save, so the receivers in signals.py never run.
+        catalog_changed()
+    return result
+
+
+def iter_bouquet_records(chunk_size=2000):
+    bouquets = Bouquet.objects.order_by('id').values_list(*FIELDS)
+    for values in bouquets.iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS, values))
+
+
+def iter_export(format='csv', chunk_size=2000):
+    """Yield the whole catalog as UTF-8 encoded CSV or JSON Lines chunks."""
+    records = iter_bouquet_records(chunk_size)
+    if format == 'csv':
+        rows = ([record[name] for name in FIELDS] for record in records)
+        yield from iter_csv(chain([FIELDS], rows))
+        return
+    buffer = io.StringIO()
+    for i, record in enumerate(records, 1):
+        buffer.write(json.dumps(record, ensure_ascii=False))
+        buffer.write('\n')
+        if i % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer = io.StringIO()
+    yield buffer.getvalue().encode('utf-8')
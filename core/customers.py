@@ -0,0 +1,109 @@
+import re
+from collections import Counter
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from phonenumber_field.phonenumber import to_python
+
+from .models import Customer
+
+
+def normalize_phone(value):
+    """Return the lookup key for a phone number: E.164 when it parses, bare digits otherwise."""
+    number = to_python(value)
+    if number and number.is_valid():
+        return number.as_e164
+    return re.sub(r'[^\d+]', '', str(value or '')) or None
+
+
+def upsert_customer(phone_number, first_name, last_name=''):
+    """Return the customer for ``phone_number``, creating it or refreshing the names."""
+    defaults = {'first_name': first_name, 'phone_number': phone_number}
+    if last_name:
+        defaults['last_name'] = last_name
+    customer, _ = Customer.objects.update_or_create(
+        phone_key=normalize_phone(phone_number), defaults=defaults
+    )
+    return customer
+
+
+def repoint(model, field, survivors):
+    model.objects.filter(**{f'{field}__in': survivors}).update(**{field: Case(
+        *[When(**{field: old}, then=Value(new)) for old, new in survivors.items()],
+        output_field=IntegerField(),
+    )})
+
+
+def merge_customers(apps, survivors):
+    """Move orders, consultations and daily stats per ``{duplicate_id: survivor_id}`` and drop the duplicates."""
+    Customer = apps.get_model('core', 'Customer')
+    Order = apps.get_model('core', 'Order')
+    Consultation = apps.get_model('core', 'Consultation')
+    DailyCustomerStats = apps.get_model('core', 'DailyCustomerStats')
+
+    repoint(Order, 'customer_id', survivors)
+    repoint(Consultation, 'customer_id', survivors)
+
+    stats = Counter()
+    moved = DailyCustomerStats.objects.filter(customer_id__in=survivors)
+    for date, customer_id, orders_count in moved.values_list('date', 'customer_id', 'orders_count'):
+        stats[date, survivors[customer_id]] += orders_count
+    moved.delete()
+    for (date, customer_id), orders_count in stats.items():
+        added = DailyCustomerStats.objects.filter(date=date, customer_id=customer_id).update(
+            orders_count=F('orders_count') + orders_count
+        )
+        if not added:
+            DailyCustomerStats.objects.create(date=date, customer_id=customer_id, orders_count=orders_count)
+
+    Customer.objects.filter(id__in=survivors).delete()
+
+
+def dedupe_customers(apps=global_apps, batch_size=500):
+    """Fill phone keys and fold customers that share one into the oldest row.
+
+    Walks customers without a key in id order, ``batch_size`` rows per
+    transaction. The first row seen for a phone keeps it; later rows are
+    merged into that one, which takes their names since they are newer.
+    Returns ``(filled, removed)``.
+    """
+    Customer = apps.get_model('core', 'Customer')
+    filled = removed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            customers = list(
+                Customer.objects.filter(id__gt=last_id, phone_key__isnull=True).order_by('id')[:batch_size]
+            )
+            if not customers:
+                return filled, removed
+            last_id = customers[-1].id
+            keys = {customer.id: normalize_phone(customer.phone_number) for customer in customers}
+            owners = {
+                customer.phone_key: customer
+                for customer in Customer.objects.filter(phone_key__in=set(keys.values()) - {None})
+            }
+            keyed = []
+            renamed = {}
+            survivors = {}
+            for customer in customers:
+                key = keys[customer.id]
+                owner = owners.get(key) if key else None
+                if owner is None:
+                    customer.phone_key = key
+                    keyed.append(customer)
+                    if key:
+                        owners[key] = customer
+                    continue
+                survivors[customer.id] = owner.id
+                if customer.id > owner.id:
+                    owner.first_name = customer.first_name
+                    owner.phone_number = customer.phone_number
+                    owner.last_name = customer.last_name or owner.last_name
+                    renamed[owner.id] = owner
+            merge_customers(apps, survivors)
+            Customer.objects.bulk_update(keyed, ['phone_key'])
+            Customer.objects.bulk_update(renamed.values(), ['first_name', 'last_name', 'phone_number'])
+            filled += len(keyed)
+            removed += len(survivors)
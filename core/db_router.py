@@ -0,0 +1,152 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import StreamingHttpResponse
+from django.urls import Resolver404, resolve
+
+from .fragment_cache import get_catalog_version
+
+
+STICKY_COOKIE = 'primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_sync_key(alias):
+    return f'replica:{alias}:synced'
+
+
+def mark_replica_synced(alias, version, synced_at=None):
+    """Record that ``alias`` holds everything written up to catalog ``version`` and up to ``synced_at``.
+
+    ``synced_at`` is when the copy started, defaulting to now.
+    """
+    cache.set(replica_sync_key(alias), (version, synced_at or time.time()), None)
+
+
+def pick_replica():
+    """Return a replica that has caught up with the current catalog and is recent enough, or None.
+
+    Fragments and the bouquet index are cached under the catalog version, so
+    a replica that has not seen the latest bouquet change must not serve the
+    reads that fill them. Orders and stats do not bump the version, so a
+    replica that has not been synced for REPLICA_MAX_LAG seconds (say,
+    replicate_sqlite has stopped) is skipped as well.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    version = get_catalog_version()
+    oldest = time.time() - settings.REPLICA_MAX_LAG
+    synced = cache.get_many([replica_sync_key(alias) for alias in replicas])
+    fresh = [
+        alias for alias in replicas
+        if synced.get(replica_sync_key(alias), (0, 0))[0] >= version
+        and synced[replica_sync_key(alias)][1] >= oldest
+    ]
+    return random.choice(fresh) if fresh else None
+
+
+def use_primary(view):
+    """Keep a view's reads on the primary, e.g. pages showing a payment status set by the webhook."""
+    view.primary_reads = True
+    return view
+
+
+@contextmanager
+def replica_reads():
+    token = read_alias.set(pick_replica())
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+def iter_with_alias(alias, iterator):
+    iterator = iter(iterator)
+    while True:
+        token = read_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            read_alias.reset(token)
+        yield chunk
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current request; everything else uses default."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Serve safe requests from a replica, except for clients that have just written.
+
+    A POST sets a short-lived cookie that keeps the client on the primary for
+    REPLICA_STICKY_SECONDS, so the redirect after checkout sees its own order.
+    Views marked with use_primary and the admin always read from the primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def uses_replica(self, request):
+        if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return True
+        # The admin shows payment and order state that staff act on.
+        return not getattr(match.func, 'primary_reads', False) and 'admin' not in match.namespaces
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.uses_replica(request):
+            return self.finish(request, self.get_response(request), None)
+        with replica_reads():
+            alias = read_alias.get()
+            response = self.get_response(request)
+        return self.finish(request, response, alias)
+
+    async def __acall__(self, request):
+        if not self.uses_replica(request):
+            return self.finish(request, await self.get_response(request), None)
+        with replica_reads():
+            alias = read_alias.get()
+            response = await self.get_response(request)
+        return self.finish(request, response, alias)
+
+    def finish(self, request, response, alias):
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+            )
+        if alias and isinstance(response, StreamingHttpResponse) and not response.is_async:
+            response.streaming_content = iter_with_alias(alias, response.streaming_content)
+        return response
@@ -0,0 +1,146 @@
+import copy
+import re
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Courier, CourierSlot, DeliverySlot, Order
+from .rollups import move_order
+
+
+ASAP = 'Как можно скорее'
+WINDOW_PATTERN = re.compile(r'(\d{1,2})(?:[:.](\d{2}))?\s*[-–—]\s*(\d{1,2})(?:[:.](\d{2}))?')
+
+
+class SlotFull(Exception):
+    pass
+
+
+def parse_delivery_time(value, now=None):
+    """Turn a delivery_time string into ``(date, start_time, end_time)``.
+
+    Windows that have already ended today move to tomorrow; ASAP takes the
+    first standard window that has not ended yet. Returns None for strings
+    that do not name a window.
+    """
+    now = timezone.localtime(now)
+    value = (value or '').strip()
+    if value.lower() == ASAP.lower():
+        for start_hour, end_hour in settings.DELIVERY_WINDOWS:
+            if now.time() < time(end_hour):
+                return now.date(), time(start_hour), time(end_hour)
+        start_hour, end_hour = settings.DELIVERY_WINDOWS[0]
+        return now.date() + timedelta(days=1), time(start_hour), time(end_hour)
+    match = WINDOW_PATTERN.search(value)
+    if not match:
+        return None
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    try:
+        start = time(int(start_hour), int(start_minute or 0))
+        end = time(int(end_hour), int(end_minute or 0))
+    except ValueError:
+        return None
+    if end <= start:
+        return None
+    date = now.date() if now.time() < end else now.date() + timedelta(days=1)
+    return date, start, end
+
+
+def get_delivery_slot(date, start, end):
+    slot, created = DeliverySlot.objects.get_or_create(date=date, start_time=start, end_time=end)
+    if created:
+        open_courier_slots(slot, Courier.objects.all())
+    return slot
+
+
+def open_courier_slots(slot, couriers):
+    CourierSlot.objects.bulk_create(
+        [CourierSlot(courier=courier, slot=slot, capacity=courier.slot_capacity) for courier in couriers],
+        ignore_conflicts=True,
+    )
+
+
+def dispatch_courier(slot):
+    """Book the least loaded courier with free capacity in ``slot``.
+
+    Returns None when there are no couriers at all and raises SlotFull when
+    every courier in the slot is at capacity.
+    """
+    for _ in range(settings.COURIER_DISPATCH_ATTEMPTS):
+        courier_slot = (
+            CourierSlot.objects.filter(slot=slot, booked__lt=F('capacity'))
+            .select_related('courier')
+            .order_by('booked', 'id')
+            .first()
+        )
+        if courier_slot is None:
+            break
+        updated = CourierSlot.objects.filter(
+            id=courier_slot.id, booked=courier_slot.booked
+        ).update(booked=F('booked') + 1)
+        if updated:
+            return courier_slot.courier
+    if CourierSlot.objects.filter(slot=slot).exists():
+        raise SlotFull(slot)
+    return None
+
+
+def release_courier(order):
+    if order.courier_id and order.delivery_slot_id:
+        CourierSlot.objects.filter(
+            courier_id=order.courier_id, slot_id=order.delivery_slot_id, booked__gt=0
+        ).update(booked=F('booked') - 1)
+
+
+def book_courier(order):
+    """Count ``order`` against its courier in its slot; capacity is not checked."""
+    if order.courier_id and order.delivery_slot_id:
+        courier_slot, _ = CourierSlot.objects.get_or_create(
+            courier_id=order.courier_id,
+            slot_id=order.delivery_slot_id,
+            defaults={'capacity': order.courier.slot_capacity},
+        )
+        CourierSlot.objects.filter(id=courier_slot.id).update(booked=F('booked') + 1)
+
+
+def reassign_courier(order, courier):
+    """Move ``order`` to ``courier`` by hand, freeing the old courier's place in the slot."""
+    previous = copy.copy(order)
+    with transaction.atomic():
+        release_courier(order)
+        order.courier = courier
+        order.save(update_fields=['courier'])
+        book_courier(order)
+        move_order(previous, order)
+
+
+def rebuild_courier_load():
+    """Reset ``booked`` of today's and future courier slots to the number of orders in them."""
+    counts = {
+        (courier_id, slot_id): count
+        for courier_id, slot_id, count in Order.objects.filter(
+            courier__isnull=False, delivery_slot__date__gte=timezone.localdate()
+        ).values_list('courier', 'delivery_slot').annotate(count=Count('id')).values_list(
+            'courier', 'delivery_slot', 'count'
+        )
+    }
+    changed = []
+    courier_slots = CourierSlot.objects.filter(slot__date__gte=timezone.localdate()).only('id', 'courier', 'slot', 'booked')
+    for courier_slot in courier_slots:
+        booked = counts.get((courier_slot.courier_id, courier_slot.slot_id), 0)
+        if courier_slot.booked != booked:
+            courier_slot.booked = booked
+            changed.append(courier_slot)
+    CourierSlot.objects.bulk_update(changed, ['booked'], batch_size=500)
+    return len(changed)
+
+
+def open_future_slots(courier):
+    slots = DeliverySlot.objects.filter(date__gte=timezone.localdate())
+    CourierSlot.objects.bulk_create(
+        [CourierSlot(courier=courier, slot=slot, capacity=courier.slot_capacity) for slot in slots],
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,39 @@
+import codecs
+import csv
+import zlib
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object for csv.writer that hands each row back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, bom=True):
+    """Encode rows as UTF-8 CSV in chunks of about CHUNK_SIZE bytes."""
+    writer = csv.writer(Echo())
+    buffer = [codecs.BOM_UTF8] if bom else []
+    size = 0
+    for row in rows:
+        line = writer.writerow(row).encode('utf-8')
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,4 +1,5 @@
 from django import forms
+from .delivery import parse_delivery_time
 from .models import Customer, Order
 from phonenumber_field.formfields import PhoneNumberField
 
@@ -26,4 +27,16 @@ class OrderForm(forms.ModelForm):
         widgets = {
             'delivery_address': forms.TextInput(attrs={'placeholder': 'Адрес доставки', 'class': 'order__form_input'}),
             'delivery_time': forms.TextInput(attrs={'class': 'order__form_input'}),
-        }
\ No newline at end of file
+        }
+
+    def clean_delivery_time(self):
+        delivery_time = self.cleaned_data['delivery_time']
+        window = parse_delivery_time(delivery_time)
+        if window is None:
+            raise forms.ValidationError('Выберите время доставки.')
+        self.cleaned_data['delivery_window'] = window
+        return delivery_time
+
+class StatsFilterForm(forms.Form):
+    start = forms.DateField(label='С', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(label='По', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
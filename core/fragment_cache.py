@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+FRAGMENTS = ('catalog_page', 'bouquet_card', 'bouquet_result')
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, 2, None)
+        return cache.get(CATALOG_VERSION_KEY, 2)
+
+
+def make_key(name, *vary_on):
+    digest = hashlib.md5(':'.join(str(part) for part in vary_on).encode(), usedforsecurity=False)
+    return f'fragment:{name}:v{get_catalog_version()}:{digest.hexdigest()}'
+
+
+def count(name, outcome):
+    key = f'fragment:{outcome}:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_fragment(name, *vary_on):
+    content = cache.get(make_key(name, *vary_on))
+    count(name, 'miss' if content is None else 'hit')
+    return content
+
+
+def set_fragment(name, content, *vary_on):
+    cache.set(make_key(name, *vary_on), content, settings.FRAGMENT_CACHE_TIMEOUT)
+
+
+def get_fragment_stats():
+    counters = cache.get_many(
+        [f'fragment:{outcome}:{name}' for name in FRAGMENTS for outcome in ('hit', 'miss')]
+    )
+    stats = []
+    for name in FRAGMENTS:
+        hits = counters.get(f'fragment:hit:{name}', 0)
+        misses = counters.get(f'fragment:miss:{name}', 0)
+        total = hits + misses
+        stats.append({
+            'name': name,
+            'hits': hits,
+            'misses': misses,
+            'ratio': hits / total if total else 0,
+        })
+    return stats
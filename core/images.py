@@ -0,0 +1,66 @@
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, width, extension):
+    """'bouquets/rose.png' -> 'bouquets/derivatives/rose.png-320w.webp'.
+
+    The source extension stays in the name, so rose.jpg and rose.png do not
+    overwrite each other's copies.
+    """
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'derivatives', f'{filename}-{width}w.{extension}')
+
+
+def derivative_url(name, width, extension):
+    return default_storage.url(derivative_name(name, width, extension))
+
+
+def flatten(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_derivatives(name, storage=default_storage):
+    """Write a WebP and a JPEG copy of the image for each configured width.
+
+    Widths larger than the original are replaced by the original width, so
+    images are never upscaled and the widest copy keeps full resolution.
+    Returns the list of widths written, narrowest first.
+    """
+    with storage.open(name, 'rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original = flatten(original)
+    widths = sorted(settings.BOUQUET_IMAGE_WIDTHS)
+    if original.width < widths[-1]:
+        widths = [width for width in widths if width < original.width] + [original.width]
+    for width in widths:
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        for extension, (format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, format, **options)
+            target = derivative_name(name, width, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+    return widths
+
+
+def get_srcset(name, widths, extension):
+    return ', '.join(f'{derivative_url(name, width, extension)} {width}w' for width in widths)
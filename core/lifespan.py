@@ -0,0 +1,23 @@
+"""ASGI lifespan events, which Django's own handler does not accept.
+
+The server sends them on the event loop that serves the requests, so on
+shutdown the connections opened on that loop can be closed cleanly.
+"""
+from .payments import get_payment_gateway
+
+
+class Lifespan:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await self.app(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await get_payment_gateway().aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import percentile
+from core.models import Bouquet
+from core.yookassa_stub import FakeYooKassaServer
+
+
+CSRF_PATTERN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+SERVERS = {
+    # Django's threaded server: one thread per connection, sync views.
+    'wsgi': (['manage.py', 'runserver', '--noreload', '127.0.0.1:{port}'], '0'),
+    # uvicorn with the sync views: Django runs each one in its single sync thread.
+    'asgi-sync': (['-m', 'uvicorn', 'project_prime_flower_shop.asgi:application', '--port', '{port}'], '0'),
+    'asgi': (['-m', 'uvicorn', 'project_prime_flower_shop.asgi:application', '--port', '{port}'], '1'),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def read_rss(pid):
+    """Resident memory of ``pid`` in bytes, from /proc; None where that is unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+class Server:
+    def __init__(self, name, env):
+        args, async_views = SERVERS[name]
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.process = subprocess.Popen(
+            [sys.executable] + [arg.format(port=self.port) for arg in args],
+            cwd=settings.BASE_DIR,
+            env={**env, 'ASYNC_VIEWS': async_views},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def wait(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'Сервер завершился с кодом {self.process.returncode}')
+            try:
+                if httpx.get(self.url + '/quiz/', timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise CommandError('Сервер не поднялся')
+
+    def rss(self):
+        return read_rss(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def open_client(base_url):
+    client = httpx.AsyncClient(base_url=base_url, timeout=60)
+    match = CSRF_PATTERN.search((await client.get('/quiz/')).text)
+    client.headers['X-CSRFToken'] = match.group(1) if match else ''
+    return client
+
+
+async def run_level(server, scenario, bouquet_ids, concurrency, seconds):
+    """Keep ``concurrency`` connections busy for ``seconds`` while sampling the server's memory."""
+    clients = await asyncio.gather(*(open_client(server.url) for _ in range(concurrency)))
+    latencies, errors, peak = [], 0, server.rss()
+    deadline = time.monotonic() + seconds
+
+    async def user(client, number):
+        nonlocal errors
+        i = 0
+        while time.monotonic() < deadline:
+            bouquet_id = bouquet_ids[(number + i) % len(bouquet_ids)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                if scenario == 'card':
+                    response = await client.get(f'/card/{bouquet_id}/')
+                else:
+                    start_hour, end_hour = settings.DELIVERY_WINDOWS[i % len(settings.DELIVERY_WINDOWS)]
+                    response = await client.post(f'/order/{bouquet_id}/', data={
+                        'first_name': 'Нагрузка',
+                        'phone_number': f'+7905{number:03d}{i % 10000:04d}',
+                        'delivery_address': 'ул. Пушкинская, 69',
+                        'delivery_time': f'{start_hour}:00-{end_hour}:00',
+                    })
+                ok = response.status_code in (200, 302)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    async def sample_memory():
+        nonlocal peak
+        while time.monotonic() < deadline:
+            peak = max(peak or 0, server.rss() or 0) or None
+            await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await asyncio.gather(sample_memory(), *(user(client, n) for n, client in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*(client.aclose() for client in clients))
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'peak_rss': peak,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI (runserver), ASGI с синхронными и ASGI с асинхронными представлениями: '
+        'запросы в секунду и память на одно одновременное соединение. Сценарий order пишет в базу — '
+        'запускайте на копии'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument('--scenario', choices=['card', 'order'], nargs='+', default=['card', 'order'])
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200])
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--latency', type=float, default=0.2, help='Задержка заглушки ЮKassa, секунды')
+        parser.add_argument('--json', dest='json_path', help='Записать отчёт в JSON-файл')
+
+    def handle(self, *args, **options):
+        bouquet_ids = list(Bouquet.objects.values_list('id', flat=True)[:100])
+        if not bouquet_ids:
+            raise CommandError('В базе нет букетов: сначала выполните generate_fake_data')
+        yookassa = FakeYooKassaServer(('127.0.0.1', 0), latency=options['latency'], jitter=options['latency'] / 4)
+        yookassa.start()
+        env = {
+            **os.environ,
+            'PAYMENT_BACKEND': 'core.payments.YooKassaGateway',
+            'YOOKASSA_API_URL': yookassa.url,
+            'YOOKASSA_SHOP_ID': 'bench',
+            'YOOKASSA_SECRET_KEY': 'bench',
+            'PERF_SAMPLE_RATE': '0',
+            'PERF_SLOW_REQUEST_MS': str(10 ** 9),
+        }
+        # Concurrent checkouts need WAL and BEGIN IMMEDIATE, or the database becomes the bottleneck.
+        env.setdefault('SQLITE_PRODUCTION', '1')
+        report = {}
+        try:
+            for name in options['servers']:
+                report[name] = self.bench_server(name, env, bouquet_ids, options)
+        finally:
+            yookassa.shutdown()
+            yookassa.server_close()
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def bench_server(self, name, env, bouquet_ids, options):
+        server = Server(name, env)
+        results = {}
+        try:
+            server.wait()
+            # Warm up every scenario first, so template and connection caches
+            # are not counted as memory per connection.
+            for scenario in options['scenario']:
+                asyncio.run(run_level(server, scenario, bouquet_ids, 4, 1))
+            idle = server.rss()
+            for scenario in options['scenario']:
+                for concurrency in options['concurrency']:
+                    result = asyncio.run(run_level(server, scenario, bouquet_ids, concurrency, options['seconds']))
+                    result['idle_rss'] = idle
+                    result['rss_per_connection'] = (
+                        round(max(0, result['peak_rss'] - idle) / concurrency) if idle and result['peak_rss'] else None
+                    )
+                    results[f'{scenario}@{concurrency}'] = result
+                    per_connection = result['rss_per_connection']
+                    self.stdout.write(
+                        f"{name} {scenario} x{concurrency}: {result['rps']} запросов/с, "
+                        f"p50 {result['p50_ms']} мс, p99 {result['p99_ms']} мс, ошибок {result['errors']}, "
+                        f"память на соединение "
+                        f"{'—' if per_connection is None else f'{per_connection / 1024:.0f} КБ'}"
+                    )
+        finally:
+            server.stop()
+        return results
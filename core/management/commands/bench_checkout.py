@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.benchmarks import percentile
+from core.payments import PaymentError, YooKassaGateway
+from core.yookassa_stub import FakeYooKassaServer
+
+
+class Command(BaseCommand):
+    help = 'Измеряет пропускную способность создания платежей на локальной заглушке ЮKassa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--latency', type=float, default=0.05)
+        parser.add_argument('--failure-rate', type=float, default=0.02)
+        parser.add_argument('--hang-rate', type=float, default=0.01)
+        parser.add_argument('--read-timeout', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        server = FakeYooKassaServer(
+            ('127.0.0.1', 0),
+            latency=options['latency'],
+            jitter=options['latency'] / 4,
+            failure_rate=options['failure_rate'],
+            hang_rate=options['hang_rate'],
+            hang=options['read_timeout'] * 2,
+        )
+        server.start()
+        overrides = {
+            'YOOKASSA_API_URL': server.url,
+            'YOOKASSA_SHOP_ID': 'bench',
+            'YOOKASSA_SECRET_KEY': 'bench',
+            'PAYMENT_TIMEOUT': (1.0, options['read_timeout']),
+        }
+        try:
+            with override_settings(**overrides):
+                for concurrency in options['concurrency']:
+                    self.run(YooKassaGateway(), options['requests'], concurrency)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def run(self, gateway, total, concurrency):
+        def create(i):
+            started = time.perf_counter()
+            try:
+                gateway.create_payment(1200, f'Заказ {i}', 'http://localhost/order_complete/1/', {'order_id': i})
+                ok = True
+            except PaymentError:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(create, range(total)))
+        elapsed = time.perf_counter() - started
+        latencies = [latency for _, latency in results]
+        errors = sum(1 for ok, _ in results if not ok)
+        self.stdout.write(
+            f'потоков {concurrency}: {total / elapsed:.1f} платежей/с, '
+            f'p50 {percentile(latencies, 0.5) * 1000:.0f} мс, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.0f} мс, '
+            f'p99 {percentile(latencies, 0.99) * 1000:.0f} мс, ошибок {errors}'
+        )
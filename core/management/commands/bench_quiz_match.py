@@ -0,0 +1,49 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import create_bouquets, measure, rolled_back
+from core.bouquet_index import ANY_BUDGET, bouquet_index
+from core.models import Bouquet
+
+
+def pick_with_queryset(occasion, budget):
+    bouquets = Bouquet.objects.filter(occasion=occasion)
+    if budget != ANY_BUDGET:
+        bouquets = bouquets.filter(budget=budget)
+    if bouquets.exists():
+        return random.choice(bouquets).id
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает подбор букета в quiz_step через запрос к БД и через индекс в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bouquets', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        occasions = [value for value, _ in Bouquet.OCCASIONS]
+        budgets = [value for value, _ in Bouquet.BUDGETS] + [ANY_BUDGET]
+        answers = [(random.choice(occasions), random.choice(budgets)) for _ in range(options['repeat'])]
+
+        with rolled_back():
+            create_bouquets(options['bouquets'])
+            bouquet_index.invalidate()
+            self.stdout.write(f'Букетов в каталоге: {Bouquet.objects.count()}')
+
+            answers_iter = iter(answers)
+            queryset_time, queryset_queries = measure(
+                lambda: pick_with_queryset(*next(answers_iter)), len(answers)
+            )
+            build_time, _ = measure(bouquet_index.get_matches, 1)
+            answers_iter = iter(answers)
+            index_time, index_queries = measure(
+                lambda: bouquet_index.choice(*next(answers_iter)), len(answers)
+            )
+
+        bouquet_index.invalidate()
+        self.stdout.write(f'Запрос к БД: {queryset_time * 1000:.2f} мс, запросов {queryset_queries:.0f}')
+        self.stdout.write(f'Построение индекса: {build_time * 1000:.2f} мс')
+        self.stdout.write(f'Индекс: {index_time * 1000:.4f} мс, запросов {index_queries:.0f}')
@@ -0,0 +1,44 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from core.benchmarks import count_writes, rolled_back
+from core.bouquet_index import bouquet_index
+from core.models import Bouquet
+
+
+class Command(BaseCommand):
+    help = 'Считает записи в БД по таблицам за один проход квиза анонимным посетителем'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=20)
+
+    def handle(self, *args, **options):
+        visitors = options['visitors']
+        with rolled_back():
+            bouquet = Bouquet.objects.create(name='Бенчмарк квиза', price=1200, occasion='Свадьба', budget='от 5000')
+            bouquet_index.invalidate()
+            completion = Counter()
+            with count_writes() as writes:
+                for i in range(visitors):
+                    client = Client(HTTP_HOST='localhost')
+                    client.get(reverse('index'))
+                    client.get(reverse('catalog'))
+                    client.get(reverse('quiz'))
+                    client.post(reverse('quiz'), {'occasion': bouquet.occasion})
+                    client.get(reverse('quiz_step'))
+                    client.post(reverse('quiz_step'), {'budget': bouquet.budget})
+                    client.get(reverse('result', args=[bouquet.id]))
+                    before = writes.copy()
+                    client.post(reverse('result', args=[bouquet.id]), {'name': 'Анна', 'phone': f'+7999{i:07d}'})
+                    completion += writes - before
+            browsing = writes - completion
+        bouquet_index.invalidate()
+
+        for title, writes in (('Просмотр и ответы квиза', browsing), ('Отправка заявки', completion)):
+            total = sum(writes.values())
+            self.stdout.write(f'{title}: {total / visitors:.1f} записей на посетителя')
+            for table, count in writes.most_common():
+                self.stdout.write(f'  {table}: {count / visitors:.1f}')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import create_bouquets, measure, rolled_back
+from core.bouquet_index import bouquet_index
+from core.models import Bouquet
+
+
+def recommend_order_by_random():
+    return list(Bouquet.objects.order_by('?')[:3])
+
+
+def recommend_from_index():
+    ids = bouquet_index.sample(3)
+    return list(Bouquet.objects.in_bulk(ids).values())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает ORDER BY RANDOM() и выборку из индекса id для рекомендаций на главной'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            created = Bouquet.objects.count()
+            for size in sorted(options['sizes']):
+                if size > created:
+                    create_bouquets(size - created, prefix=f'Бенчмарк {created}-')
+                    created = size
+                bouquet_index.invalidate()
+                random_time, _ = measure(recommend_order_by_random, options['repeat'])
+                build_time, _ = measure(bouquet_index.get_matches, 1)
+                index_time, queries = measure(recommend_from_index, options['repeat'])
+                self.stdout.write(
+                    f'{size} букетов: ORDER BY RANDOM() {random_time * 1000:.2f} мс, '
+                    f'индекс {index_time * 1000:.3f} мс ({queries:.0f} запрос), '
+                    f'построение индекса {build_time * 1000:.0f} мс'
+                )
+        bouquet_index.invalidate()
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import create_bouquets, percentile, rolled_back
+from core.models import Bouquet
+from core.search import icontains_filter, rebuild_search_index, search_bouquets
+
+
+QUERIES = ['розы', 'розами', 'пионы и розы', 'букет с тюльпанами', 'нежный букет', 'гортензи', 'ирисы герберы', 'лилия']
+
+
+def search_with_icontains(text, limit):
+    bouquets = Bouquet.objects.filter(icontains_filter(text)).order_by('name', 'id')
+    return list(bouquets.values_list('id', flat=True)[:limit])
+
+
+def time_calls(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        for text in QUERIES:
+            started = time.perf_counter()
+            func(text, settings.SEARCH_RESULTS_LIMIT)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск по каталогу через полнотекстовый индекс и через icontains, как в админке'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bouquets', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            create_bouquets(options['bouquets'])
+            started = time.perf_counter()
+            rebuild_search_index()
+            build_time = time.perf_counter() - started
+            self.stdout.write(f'Букетов в каталоге: {Bouquet.objects.count()}')
+            results = {
+                'icontains': time_calls(search_with_icontains, options['repeat']),
+                'индекс': time_calls(search_bouquets, options['repeat']),
+            }
+
+        self.stdout.write(f'Построение индекса: {build_time:.1f} с')
+        for name, timings in results.items():
+            self.stdout.write(
+                f'{name}: p50 {percentile(timings, 0.5) * 1000:.2f} мс, p99 {percentile(timings, 0.99) * 1000:.2f} мс'
+            )
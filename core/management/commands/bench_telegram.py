@@ -0,0 +1,88 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.notifications import RateLimiter, coalesce, post_message
+from core.telegram_stub import FakeTelegramServer
+
+
+TOKEN = 'bench-token'
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает отправку пиковой нагрузки по одному сообщению и с объединением в дайджесты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=300)
+        parser.add_argument('--chats', type=int, default=10)
+        parser.add_argument('--hot-share', type=float, default=0.7, help='Доля сообщений в общий чат флористов')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        messages = []
+        for i in range(options['messages']):
+            if random.random() < options['hot_share']:
+                chat_id = 'florists'
+            else:
+                chat_id = f'florist-{random.randrange(options["chats"])}'
+            text = (
+                f'<b>Новая заявка на консультацию:</b>\nИмя: Покупатель {i}\n'
+                f'Телефон: +7999{i:07d}\n<b>Результат опроса:</b>\nПовод: Свадьба\nБюджет: 1000-5000'
+            )
+            messages.append(SimpleNamespace(id=i, bot='florist', chat_id=chat_id, text=text))
+
+        for name, method in [('по одному', self.send_one_by_one), ('дайджесты', self.send_coalesced)]:
+            server = FakeTelegramServer(('127.0.0.1', 0), latency=options['latency'])
+            server.start()
+            with override_settings(TELEGRAM_API_URL=server.url):
+                started = time.perf_counter()
+                method(messages, options['workers'])
+                elapsed = time.perf_counter() - started
+            server.shutdown()
+            server.server_close()
+            delivered = sum(server.delivered.values())
+            self.stdout.write(
+                f'{name}: {delivered} сообщений за {elapsed:.2f} с '
+                f'({delivered / elapsed:.1f} сообщ./с), запросов {server.stats["accepted"]}, '
+                f'ответов 429: {server.stats["throttled"]}'
+            )
+
+    def send_one_by_one(self, messages, workers):
+        def send(message):
+            while True:
+                ok, retry_after, _ = post_message(TOKEN, message.chat_id, message.text)
+                if ok or retry_after is None:
+                    return
+                time.sleep(retry_after)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(send, messages))
+
+    def send_coalesced(self, messages, workers):
+        limiter = RateLimiter()
+        pending = list(messages)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending:
+                ready, waiting, delays = [], [], []
+                for digest in coalesce(pending):
+                    delay = limiter.reserve(TOKEN, digest.chat_id)
+                    if delay > 0:
+                        waiting.extend(digest.messages)
+                        delays.append(delay)
+                    else:
+                        ready.append(digest)
+                results = executor.map(lambda digest: post_message(TOKEN, digest.chat_id, digest.text), ready)
+                for digest, (ok, retry_after, _) in zip(ready, results):
+                    if not ok:
+                        if retry_after:
+                            limiter.block(TOKEN, digest.chat_id, retry_after)
+                        waiting.extend(digest.messages)
+                pending = sorted(waiting, key=lambda message: message.id)
+                if pending and not ready:
+                    time.sleep(min(delays or [0.05]))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.query_plans import explain, find_full_scans, get_critical_queries
+
+
+class Command(BaseCommand):
+    help = 'Проверяет через EXPLAIN, что критичные запросы используют индексы, а не полный просмотр таблиц'
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset in get_critical_queries().items():
+            plan = explain(queryset)
+            scans = find_full_scans(plan)
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: полный просмотр {", ".join(scans)}'))
+            else:
+                self.stdout.write(f'{name}: OK')
+            if scans or options['verbosity'] > 1:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(f'Запросы без индекса: {", ".join(failed)}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.customers import dedupe_customers
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ключи телефонов и объединяет покупателей с одинаковым номером'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        filled, removed = dedupe_customers(batch_size=options['batch_size'])
+        self.stdout.write(f'Заполнено ключей: {filled}, объединено дублей: {removed}')
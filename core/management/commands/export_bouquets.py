@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.bouquet_io import FORMATS, guess_format, iter_export
+from core.db_router import replica_reads
+
+
+class Command(BaseCommand):
+    help = 'Выгружает каталог букетов в CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию определяется по расширению')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or guess_format(path)
+        output = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        try:
+            with replica_reads():
+                for chunk in iter_export(format):
+                    output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
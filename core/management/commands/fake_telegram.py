@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.telegram_stub import FakeTelegramServer
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку Telegram Bot API (TELEGRAM_API_URL=http://127.0.0.1:8081)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8081)
+        parser.add_argument('--chat-rate', type=int, default=1, help='Сообщений в секунду на чат')
+        parser.add_argument('--bot-rate', type=int, default=30, help='Сообщений в секунду на бота')
+        parser.add_argument('--latency', type=float, default=0.05, help='Задержка ответа, секунды')
+
+    def handle(self, *args, **options):
+        server = FakeTelegramServer(
+            (options['host'], options['port']),
+            chat_rate=options['chat_rate'],
+            bot_rate=options['bot_rate'],
+            latency=options['latency'],
+        )
+        self.stdout.write(f'Заглушка Telegram слушает {server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Статистика: {dict(server.stats)}')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core.yookassa_stub import FakeYooKassaServer
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку API ЮKassa (YOOKASSA_API_URL=http://127.0.0.1:8082/v3)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8082)
+        parser.add_argument('--latency', type=float, default=0.2, help='Средняя задержка ответа, секунды')
+        parser.add_argument('--jitter', type=float, default=0.05)
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Доля ответов 500')
+        parser.add_argument('--hang-rate', type=float, default=0.0, help='Доля зависающих запросов')
+        parser.add_argument('--hang', type=float, default=30.0, help='Сколько висит зависший запрос, секунды')
+
+    def handle(self, *args, **options):
+        server = FakeYooKassaServer(
+            (options['host'], options['port']),
+            latency=options['latency'],
+            jitter=options['jitter'],
+            failure_rate=options['failure_rate'],
+            hang_rate=options['hang_rate'],
+            hang=options['hang'],
+        )
+        self.stdout.write(f'Заглушка ЮKassa слушает {server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Статистика: {dict(server.stats)}')
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.bouquet_index import catalog_changed
+from core.images import generate_derivatives
+from core.models import Bouquet
+
+
+def process(bouquet_id, name):
+    try:
+        return bouquet_id, generate_derivatives(name), None
+    except OSError as e:
+        return bouquet_id, [], str(e)
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии WebP и JPEG для изображений букетов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересоздать и для букетов, у которых копии уже есть')
+        parser.add_argument('--workers', type=int, default=None, help='Число процессов, по умолчанию по числу ядер')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        bouquets = Bouquet.objects.exclude(image='')
+        if not options['all']:
+            bouquets = bouquets.filter(image_widths=[])
+        jobs = list(bouquets.values_list('id', 'image'))
+        if not jobs:
+            self.stdout.write('Нечего обрабатывать')
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        batch = []
+        # Forked workers must not inherit the parent's open database connection.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+            futures = [executor.submit(process, bouquet_id, name) for bouquet_id, name in jobs]
+            for future in as_completed(futures):
+                bouquet_id, widths, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'Букет {bouquet_id}: {error}')
+                    continue
+                batch.append(Bouquet(id=bouquet_id, image_widths=widths))
+                done += 1
+                if len(batch) >= options['batch_size']:
+                    Bouquet.objects.bulk_update(batch, ['image_widths'])
+                    batch = []
+        Bouquet.objects.bulk_update(batch, ['image_widths'])
+        if done:
+            catalog_changed()
+        self.stdout.write(f'Обработано {done}, с ошибками {failed} за {time.perf_counter() - started:.1f} с')
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.assignment import rebuild_florist_load
+from core.benchmarks import create_shop_data
+from core.bouquet_index import catalog_changed
+from core.delivery import open_future_slots
+from core.models import Courier
+from core.rollups import rebuild_rollups
+from core.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу случайными букетами, покупателями, заказами, платежами и заявками для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bouquets', type=int, default=500)
+        parser.add_argument('--customers', type=int, default=20000)
+        parser.add_argument('--couriers', type=int, default=20)
+        parser.add_argument('--florists', type=int, default=10)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--consultations', type=int, default=20000)
+        parser.add_argument('--paid', type=float, default=0.9, help='Доля заказов с платежом')
+        parser.add_argument('--days', type=int, default=90, help='За сколько дней раскидать даты создания')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            created = create_shop_data(
+                bouquets=options['bouquets'],
+                customers=options['customers'],
+                couriers=options['couriers'],
+                florists=options['florists'],
+                orders=options['orders'],
+                consultations=options['consultations'],
+                paid=options['paid'],
+                days=options['days'],
+                batch_size=options['batch_size'],
+            )
+        # bulk_create does not send signals, so redo what the receivers would have done.
+        catalog_changed()
+        rebuild_search_index()
+        for courier in Courier.objects.filter(slots__isnull=True):
+            open_future_slots(courier)
+        rebuild_rollups(batch_size=options['batch_size'])
+        rebuild_florist_load()
+        summary = ', '.join(f'{name}: {count}' for name, count in created.items())
+        self.stdout.write(f'Создано {summary} за {time.perf_counter() - started:.1f} с')
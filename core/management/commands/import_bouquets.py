@@ -0,0 +1,50 @@
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bouquet_io import FORMATS, guess_format, import_bouquets
+
+
+class Command(BaseCommand):
+    help = 'Загружает букеты из CSV или JSON Lines, обновляя существующие по названию'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с букетами или - для stdin')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию определяется по расширению')
+        parser.add_argument('--images-dir', help='Папка с картинками, указанными в колонке image')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or guess_format(path)
+        started = time.perf_counter()
+        if path == '-':
+            # Files saved by Excel start with a BOM, which would end up in the first column name.
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            stream = open(path, encoding='utf-8-sig', newline='')
+        try:
+            result = import_bouquets(
+                stream,
+                format=format,
+                images_dir=options['images_dir'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        finally:
+            if path == '-':
+                # Closing the wrapper would close stdin itself.
+                stream.detach()
+            else:
+                stream.close()
+        for line_number, message in result.errors:
+            self.stderr.write(f'строка {line_number}: {message}')
+        self.stdout.write(
+            f'Строк: {result.rows}, новых: {result.created}, обновлено: {result.updated}, '
+            f'с ошибками: {len(result.errors)} за {time.perf_counter() - started:.1f} с'
+        )
+        if result.errors and not result.created + result.updated:
+            raise CommandError('Ни одна строка не загружена')
@@ -0,0 +1,250 @@
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.benchmarks import percentile
+from core.models import Bouquet, Order, Payment
+
+
+CSRF_PATTERN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+DEFAULT_MIX = 'index=3,catalog=3,card=2,quiz_step=2,order=1,webhook=1'
+
+
+class QueryCountingApp:
+    """WSGI wrapper that reports the number of SQL queries in an X-Query-Count header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            return start_response(status, headers + [('X-Query-Count', str(queries))], exc_info)
+
+        with connection.execute_wrapper(count):
+            return self.app(environ, start)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class VirtualUser:
+    def __init__(self, base_url, bouquet_ids, payment_ids):
+        self.base_url = base_url
+        self.bouquet_ids = bouquet_ids
+        self.payment_ids = payment_ids
+        self.session = requests.Session()
+        self.csrf_token = None
+
+    def get(self, path, **kwargs):
+        return self.session.get(self.base_url + path, allow_redirects=False, timeout=30, **kwargs)
+
+    def post(self, path, data=None, **kwargs):
+        if self.csrf_token is None:
+            match = CSRF_PATTERN.search(self.get('/quiz/').text)
+            self.csrf_token = match.group(1) if match else ''
+        if data is not None:
+            data = {'csrfmiddlewaretoken': self.csrf_token, **data}
+        return self.session.post(self.base_url + path, data=data, allow_redirects=False, timeout=30, **kwargs)
+
+    def index(self):
+        return self.get('/'), (200,)
+
+    def catalog(self):
+        return self.get('/catalog/', params={'page': random.randint(1, 5)}), (200,)
+
+    def card(self):
+        return self.get(f'/card/{random.choice(self.bouquet_ids)}/'), (200,)
+
+    def quiz_step(self):
+        occasion = random.choice(Bouquet.OCCASIONS)[0]
+        self.post('/quiz/', {'occasion': occasion})
+        budget = random.choice(Bouquet.BUDGETS)[0]
+        return self.post('/quiz/step/', {'budget': budget}), (200, 302)
+
+    def order(self):
+        start_hour, end_hour = random.choice(settings.DELIVERY_WINDOWS)
+        response = self.post(f'/order/{random.choice(self.bouquet_ids)}/', {
+            'first_name': 'Нагрузка',
+            'last_name': 'Тестовая',
+            'phone_number': f'+7902{random.randint(0, 999):07d}',
+            'delivery_address': 'ул. Пушкинская, 69',
+            'delivery_time': f'{start_hour}:00-{end_hour}:00',
+        })
+        # 200 means the slot was full and the form came back with a message.
+        return response, (200, 302)
+
+    def webhook(self):
+        body = {
+            'type': 'notification',
+            'event': 'payment.succeeded',
+            'object': {'id': random.choice(self.payment_ids), 'status': 'succeeded'},
+        }
+        return self.session.post(self.base_url + '/webhook/yookassa/', json=body, timeout=30), (200,)
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if not hasattr(VirtualUser, name):
+            raise CommandError(f'Неизвестный сценарий: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(results, elapsed):
+    by_scenario = defaultdict(list)
+    for result in results:
+        by_scenario[result[0]].append(result)
+    scenarios = {}
+    for name, rows in sorted(by_scenario.items()):
+        latencies = [latency for _, latency, _, _ in rows]
+        queries = [count for _, _, _, count in rows if count is not None]
+        scenarios[name] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, _, ok, _ in rows if not ok),
+            'throughput': round(len(rows) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'queries_mean': round(sum(queries) / len(queries), 1) if queries else None,
+            'queries_max': max(queries, default=None),
+        }
+    latencies = [latency for _, latency, _, _ in results]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, _, ok, _ in results if not ok),
+        'duration_s': round(elapsed, 2),
+        'throughput': round(len(results) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'scenarios': scenarios,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: поднимает сайт в процессе с заглушкой оплаты и гоняет сценарии в несколько потоков. '
+        'Заказы и уведомления пишутся в текущую базу, запускать на копии с данными от generate_fake_data'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Запросов на каждый уровень параллельности')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='Веса сценариев, например index=3,order=1')
+        parser.add_argument('--output', default='loadtest.json')
+        parser.add_argument('--warmup', type=int, default=50)
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        bouquet_ids = list(Bouquet.objects.values_list('id', flat=True)[:1000])
+        payment_ids = list(Payment.objects.values_list('payment_id', flat=True)[:1000])
+        if not bouquet_ids:
+            raise CommandError('В базе нет букетов, сначала запустите generate_fake_data')
+        if not payment_ids:
+            mix.pop('webhook', None)
+
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+        server.set_app(QueryCountingApp(get_wsgi_application()))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = 'http://127.0.0.1:%d' % server.server_address[1]
+        report = {
+            'commit': get_commit(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'data': {
+                'bouquets': Bouquet.objects.count(),
+                'orders': Order.objects.count(),
+                'payments': Payment.objects.count(),
+            },
+            'mix': mix,
+            'levels': [],
+        }
+        try:
+            with override_settings(PAYMENT_BACKEND='core.payments.DummyGateway'):
+                self.run(base_url, bouquet_ids, payment_ids, mix, options['warmup'], 1)
+                for concurrency in options['concurrency']:
+                    results, elapsed = self.run(
+                        base_url, bouquet_ids, payment_ids, mix, options['requests'], concurrency
+                    )
+                    level = {'concurrency': concurrency, **summarize(results, elapsed)}
+                    report['levels'].append(level)
+                    self.stdout.write(
+                        f"потоков {concurrency}: {level['throughput']} запросов/с, "
+                        f"p50 {level['p50_ms']} мс, p95 {level['p95_ms']} мс, "
+                        f"p99 {level['p99_ms']} мс, ошибок {level['errors']}"
+                    )
+                    for name, row in level['scenarios'].items():
+                        self.stdout.write(
+                            f"  {name}: p50 {row['p50_ms']} мс, p95 {row['p95_ms']} мс, "
+                            f"запросов к БД {row['queries_mean']} (макс. {row['queries_max']}), ошибок {row['errors']}"
+                        )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        self.stdout.write(f"Отчёт записан в {options['output']}")
+
+    def run(self, base_url, bouquet_ids, payment_ids, mix, total, concurrency):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        remaining = iter(range(total))
+        lock = threading.Lock()
+
+        def worker():
+            user = VirtualUser(base_url, bouquet_ids, payment_ids)
+            results = []
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return results
+                name = random.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response, expected = getattr(user, name)()
+                    ok = response.status_code in expected
+                    queries = int(response.headers.get('X-Query-Count', 0))
+                except requests.RequestException:
+                    ok, queries = False, None
+                results.append((name, time.perf_counter() - started, ok, queries))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(worker) for _ in range(concurrency)]
+            results = [row for future in futures for row in future.result()]
+        return results, time.perf_counter() - started
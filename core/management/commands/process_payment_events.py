@@ -0,0 +1,26 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.payment_events import claim_events, process_event
+
+
+class Command(BaseCommand):
+    help = 'Применяет сохранённые уведомления ЮKassa к платежам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и выйти')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        while True:
+            events = claim_events(options['batch_size'])
+            if events:
+                results = Counter(process_event(event) for event in events)
+                self.stdout.write(f'Событий: {len(events)}, {dict(results)}')
+            if options['once']:
+                break
+            if not events:
+                time.sleep(options['poll_interval'])
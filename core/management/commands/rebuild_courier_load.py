@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.delivery import rebuild_courier_load
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает занятость курьеров в сегодняшних и будущих слотах по заказам (запускать по cron)'
+
+    def handle(self, *args, **options):
+        changed = rebuild_courier_load()
+        self.stdout.write(f'Обновлено слотов курьеров: {changed}')
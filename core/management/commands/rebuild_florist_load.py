@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.assignment import rebuild_florist_load
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает нагрузку флористов по заявкам за активное окно (запускать по cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-hours', type=int, default=settings.FLORIST_LOAD_WINDOW_HOURS)
+
+    def handle(self, *args, **options):
+        changed = rebuild_florist_load(options['window_hours'])
+        self.stdout.write(f'Обновлено флористов: {changed}')
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные сводки заказов по букетам, покупателям и курьерам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='Дата начала, ГГГГ-ММ-ДД')
+        parser.add_argument('--end', type=date.fromisoformat, help='Дата окончания, ГГГГ-ММ-ДД')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(options['start'], options['end'], options['batch_size'])
+        self.stdout.write(f'Записано строк сводок: {rows}')
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.db_router import mark_replica_synced
+from core.fragment_cache import get_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в файлы реплик через backup API — замена репликации для локальной проверки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Повторять каждые N секунд; 0 — один раз')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда копирует только SQLite; для PostgreSQL настройте потоковую репликацию')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: задайте SQLITE_REPLICAS')
+        while True:
+            started = time.perf_counter()
+            self.sync()
+            self.stdout.write(f'Реплики обновлены за {(time.perf_counter() - started) * 1000:.0f} мс')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self):
+        # Read the version before copying: the copy then contains at least
+        # every bouquet change that version stands for.
+        version = get_catalog_version()
+        synced_at = time.time()
+        connection.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'], timeout=30)
+            try:
+                connection.connection.backup(target)
+            finally:
+                target.close()
+            mark_replica_synced(alias, version, synced_at)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.notifications import (
+    RateLimiter, adeliver, claim_due_messages, coalesce, deliver, get_async_client, schedule
+)
+
+
+class Command(BaseCommand):
+    help = 'Отправляет накопленные Telegram-уведомления с повторными попытками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и выйти')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=settings.TELEGRAM_WORKERS)
+        parser.add_argument('--poll-interval', type=float, default=0.5)
+        parser.add_argument(
+            '--async', dest='use_async', action='store_true',
+            help='Отправлять через httpx в одном потоке; --workers задаёт число одновременных запросов',
+        )
+
+    def handle(self, *args, **options):
+        limiter = RateLimiter()
+        if options['use_async']:
+            asyncio.run(self.run_async(limiter, options))
+            return
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                messages = claim_due_messages(options['batch_size'])
+                digests = schedule(coalesce(messages), limiter)
+                if digests:
+                    results = list(executor.map(lambda digest: self.deliver(digest, limiter), digests))
+                    self.stdout.write(
+                        f'Сообщений: {len(messages)}, запросов: {len(digests)}, '
+                        f'успешно: {sum(results)}'
+                    )
+                if options['once']:
+                    break
+                if not digests:
+                    time.sleep(options['poll_interval'])
+
+    def deliver(self, digest, limiter):
+        try:
+            return deliver(digest, limiter)
+        finally:
+            close_old_connections()
+
+    async def run_async(self, limiter, options):
+        semaphore = asyncio.Semaphore(options['workers'])
+
+        async def send(digest):
+            async with semaphore:
+                return await adeliver(digest, limiter, client)
+
+        async with get_async_client() as client:
+            while True:
+                messages = await sync_to_async(claim_due_messages)(options['batch_size'])
+                digests = await sync_to_async(schedule)(coalesce(messages), limiter)
+                if digests:
+                    results = await asyncio.gather(*(send(digest) for digest in digests))
+                    self.stdout.write(
+                        f'Сообщений: {len(messages)}, запросов: {len(digests)}, '
+                        f'успешно: {sum(results)}'
+                    )
+                await sync_to_async(close_old_connections)()
+                if options['once']:
+                    break
+                if not digests:
+                    await asyncio.sleep(options['poll_interval'])
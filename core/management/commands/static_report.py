@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from functools import cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from core.models import Bouquet
+from core.static_files import COMPRESSIBLE, compress
+
+
+ASSET_PATTERN = re.compile(r'(?:src|href)="(%s[^"]+)"' % re.escape(settings.STATIC_URL))
+CSS_URL_PATTERN = re.compile(r'url\([\'"]?([^\'")]+)[\'"]?\)')
+
+
+@cache
+def find_asset(url):
+    name = url[len(settings.STATIC_URL):].split('?')[0].split('#')[0]
+    path = finders.find(name)
+    if path is None and settings.STATIC_ROOT:
+        path = os.path.join(settings.STATIC_ROOT, name)
+    return path if path and os.path.isfile(path) else None
+
+
+@cache
+def asset_sizes(path):
+    """Return ``(plain, best)`` sizes: as served today and with the smallest precompressed variant."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    best = len(data)
+    if path.endswith(COMPRESSIBLE):
+        best = min([best] + [len(body) for body in compress(data).values()])
+    return len(data), best
+
+
+def collect_assets(html):
+    assets = set(ASSET_PATTERN.findall(html))
+    for url in list(assets):
+        path = find_asset(url)
+        if path and path.endswith('.css'):
+            with open(path, encoding='utf-8') as f:
+                for reference in CSS_URL_PATTERN.findall(f.read()):
+                    if not reference.startswith(('data:', 'http:', 'https:', '//')):
+                        assets.add(os.path.normpath(os.path.join(os.path.dirname(url), reference)).replace(os.sep, '/'))
+    return sorted(assets)
+
+
+class Command(BaseCommand):
+    help = 'Считает байты, которые браузер скачивает для страниц сайта, без предсжатия и кэша и с ними'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', dest='json_path', help='Записать отчёт в JSON-файл')
+
+    def handle(self, *args, **options):
+        pages = {
+            'index': reverse('index'),
+            'catalog': reverse('catalog'),
+            'quiz': reverse('quiz'),
+            'consultation': reverse('consultation'),
+        }
+        bouquet = Bouquet.objects.order_by('id').first()
+        if bouquet:
+            pages['card'] = reverse('card', args=[bouquet.id])
+            pages['order'] = reverse('order', args=[bouquet.id])
+
+        client = Client(HTTP_HOST='localhost')
+        report = {}
+        for name, url in pages.items():
+            html = client.get(url).content
+            html_size = len(html)
+            html_best = min([html_size] + [len(body) for body in compress(html).values()])
+            before = after = 0
+            assets = []
+            for asset in collect_assets(html.decode('utf-8')):
+                path = find_asset(asset)
+                if path is None:
+                    continue
+                plain, best = asset_sizes(path)
+                before += plain
+                after += best
+                assets.append({'url': asset, 'bytes': plain, 'compressed_bytes': best})
+            report[name] = {
+                'url': url,
+                'html_bytes': html_size,
+                'html_compressed_bytes': html_best,
+                'assets': assets,
+                'first_visit_before': html_size + before,
+                'first_visit_after': html_size + after,
+                # Unhashed names are revalidated on every visit; hashed immutable ones are not requested at all.
+                'repeat_visit_requests_before': len(assets),
+                'repeat_visit_requests_after': 0,
+            }
+            self.stdout.write(
+                f"{name}: первый визит {report[name]['first_visit_before'] / 1024:.0f} КБ -> "
+                f"{report[name]['first_visit_after'] / 1024:.0f} КБ, повторный визит "
+                f"{len(assets)} запросов на проверку -> 0; HTML {html_size / 1024:.1f} КБ "
+                f"(сжатый {html_best / 1024:.1f} КБ)"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
@@ -0,0 +1,148 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.benchmarks import percentile
+from core.models import Bouquet, Payment
+
+
+PROFILES = {
+    'default': {},
+    'production': settings.SQLITE_PRODUCTION_OPTIONS,
+}
+
+
+def run_worker(path, options, rate, seconds, bouquet_ids, payment_ids, seed, results):
+    """Send write requests at ``rate`` per second for ``seconds`` and report latencies and lock errors."""
+    random.seed(seed)
+    connection.settings_dict['NAME'] = path
+    connection.settings_dict['OPTIONS'] = options
+    connection.close()
+    override_settings(
+        PAYMENT_BACKEND='core.payments.DummyGateway', PERF_SAMPLE_RATE=0, PERF_SLOW_REQUEST_MS=float('inf')
+    ).enable()
+    # Lock errors are counted below; the tracebacks django.request would log add nothing.
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    client = Client(HTTP_HOST='localhost')
+    writes = {
+        'consultation': lambda: client.post('/consultation/', {
+            'name': 'Нагрузка',
+            'phone': f'+7903{random.randint(0, 9999999):07d}',
+        }),
+        'order': lambda: client.post(f'/order/{random.choice(bouquet_ids)}/', {
+            'first_name': 'Нагрузка',
+            'phone_number': f'+7904{random.randint(0, 9999999):07d}',
+            'delivery_address': 'ул. Пушкинская, 69',
+            'delivery_time': 'Как можно скорее',
+        }),
+        'webhook': lambda: client.post('/webhook/yookassa/', {
+            'type': 'notification',
+            'event': random.choice(['payment.succeeded', 'payment.waiting_for_capture']),
+            'object': {'id': random.choice(payment_ids), 'status': 'succeeded'},
+        }, content_type='application/json'),
+    }
+    names = list(writes)
+    latencies, locked, failed = [], 0, 0
+    started = time.perf_counter()
+    for i in range(int(rate * seconds)):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        name = random.choice(names)
+        began = time.perf_counter()
+        try:
+            status = writes[name]().status_code
+            if status >= 400:
+                failed += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+        latencies.append(time.perf_counter() - began)
+    results.put({'latencies': latencies, 'locked': locked, 'failed': failed, 'elapsed': time.perf_counter() - started})
+
+
+def copy_database(path, journal_mode):
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    with target:
+        connection.connection.backup(target)
+    target.execute(f'PRAGMA journal_mode={journal_mode}')
+    target.close()
+
+
+class Command(BaseCommand):
+    help = 'Проверяет SQLite под конкурентной записью из нескольких процессов: заявки, заказы и вебхуки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=sorted(PROFILES), nargs='+', default=['default', 'production'])
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--rate', type=float, default=100, help='Целевое число записей в секунду на все процессы')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--json', dest='json_path', help='Записать отчёт в JSON-файл')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда проверяет только SQLite')
+        bouquet_ids = list(Bouquet.objects.values_list('id', flat=True)[:100])
+        payment_ids = list(Payment.objects.values_list('payment_id', flat=True)[:100])
+        if not bouquet_ids or not payment_ids:
+            raise CommandError('Нужны букеты и платежи: сначала выполните generate_fake_data')
+
+        report = {}
+        for profile in options['profile']:
+            with tempfile.TemporaryDirectory() as directory:
+                # Each profile writes to its own copy, so the runs start from the same data.
+                path = os.path.join(directory, 'stress.sqlite3')
+                copy_database(path, 'wal' if profile == 'production' else 'delete')
+                connections.close_all()
+                report[profile] = self.run(path, PROFILES[profile], options, bouquet_ids, payment_ids)
+            self.stdout.write(
+                f"{profile}: {report[profile]['writes_per_second']} записей/с из {options['rate']:g}, "
+                f"p50 {report[profile]['p50_ms']} мс, p99 {report[profile]['p99_ms']} мс, "
+                f"database is locked: {report[profile]['locked']}, прочих ошибок: {report[profile]['failed']}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        if 'production' in report and report['production']['locked']:
+            raise CommandError('В профиле production были ошибки database is locked')
+
+    def run(self, path, profile_options, options, bouquet_ids, payment_ids):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        rate = options['rate'] / options['processes']
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(path, profile_options, rate, options['seconds'], bouquet_ids, payment_ids, seed, results),
+            )
+            for seed in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        rows = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        latencies = [latency for row in rows for latency in row['latencies']]
+        elapsed = max(row['elapsed'] for row in rows)
+        return {
+            'writes': len(latencies),
+            'writes_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'locked': sum(row['locked'] for row in rows),
+            'failed': sum(row['failed'] for row in rows),
+        }
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_florist_remove_bouquet_height_remove_bouquet_width_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bot', models.CharField(choices=[('florist', 'Бот флористов'), ('courier', 'Бот курьеров')], max_length=20, verbose_name='Бот')),
+                ('chat_id', models.CharField(max_length=50, verbose_name='Telegram Chat ID')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('claim_token', models.UUIDField(blank=True, editable=False, null=True, verbose_name='Токен обработчика')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки')),
+            ],
+            options={
+                'verbose_name': 'Telegram-уведомление',
+                'verbose_name_plural': 'Telegram-уведомления',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='telegram_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:55
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def fill_consultation_load(apps, schema_editor):
+    Consultation = apps.get_model('core', 'Consultation')
+    Florist = apps.get_model('core', 'Florist')
+    since = timezone.now() - timedelta(hours=24)
+    counts = (
+        Consultation.objects.filter(created_at__gte=since, florist__isnull=False)
+        .values_list('florist')
+        .annotate(count=Count('id'))
+    )
+    for florist_id, count in counts:
+        Florist.objects.filter(id=florist_id).update(consultation_load=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_telegrammessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='florist',
+            name='consultation_load',
+            field=models.PositiveIntegerField(default=0, help_text='Заявок за последние FLORIST_LOAD_WINDOW_HOURS часов', verbose_name='Текущая нагрузка'),
+        ),
+        migrations.AddIndex(
+            model_name='florist',
+            index=models.Index(fields=['consultation_load', 'id'], name='florist_load_idx'),
+        ),
+        migrations.RunPython(fill_consultation_load, migrations.RunPython.noop),
+    ]
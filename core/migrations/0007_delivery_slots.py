@@ -0,0 +1,135 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:56
+
+import re
+from collections import Counter
+from datetime import time, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Frozen copies of core.delivery as of this migration, so later edits to
+# the parser or to settings.DELIVERY_WINDOWS do not change what it does.
+ASAP = 'Как можно скорее'
+DELIVERY_WINDOWS = [(10, 12), (12, 14), (14, 16), (16, 18), (18, 20)]
+WINDOW_PATTERN = re.compile(r'(\d{1,2})(?:[:.](\d{2}))?\s*[-–—]\s*(\d{1,2})(?:[:.](\d{2}))?')
+
+
+def parse_delivery_time(value, now):
+    now = timezone.localtime(now)
+    value = (value or '').strip()
+    if value.lower() == ASAP.lower():
+        for start_hour, end_hour in DELIVERY_WINDOWS:
+            if now.time() < time(end_hour):
+                return now.date(), time(start_hour), time(end_hour)
+        start_hour, end_hour = DELIVERY_WINDOWS[0]
+        return now.date() + timedelta(days=1), time(start_hour), time(end_hour)
+    match = WINDOW_PATTERN.search(value)
+    if not match:
+        return None
+    start_hour, start_minute, end_hour, end_minute = match.groups()
+    try:
+        start = time(int(start_hour), int(start_minute or 0))
+        end = time(int(end_hour), int(end_minute or 0))
+    except ValueError:
+        return None
+    if end <= start:
+        return None
+    date = now.date() if now.time() < end else now.date() + timedelta(days=1)
+    return date, start, end
+
+
+def link_delivery_slots(apps, schema_editor):
+    Courier = apps.get_model('core', 'Courier')
+    CourierSlot = apps.get_model('core', 'CourierSlot')
+    DeliverySlot = apps.get_model('core', 'DeliverySlot')
+    Order = apps.get_model('core', 'Order')
+
+    slots = {}
+    booked = Counter()
+    batch = []
+    orders = Order.objects.filter(delivery_slot__isnull=True).only('id', 'courier', 'delivery_time', 'created_at')
+    for order in orders.iterator(chunk_size=2000):
+        window = parse_delivery_time(order.delivery_time, order.created_at)
+        if window is None:
+            continue
+        if window not in slots:
+            slots[window], _ = DeliverySlot.objects.get_or_create(
+                date=window[0], start_time=window[1], end_time=window[2]
+            )
+        order.delivery_slot = slots[window]
+        batch.append(order)
+        if order.courier_id:
+            booked[(order.courier_id, slots[window].id)] += 1
+        if len(batch) >= 2000:
+            Order.objects.bulk_update(batch, ['delivery_slot'])
+            batch = []
+    Order.objects.bulk_update(batch, ['delivery_slot'])
+
+    capacities = dict(Courier.objects.values_list('id', 'slot_capacity'))
+    CourierSlot.objects.bulk_create(
+        [
+            CourierSlot(
+                courier_id=courier_id,
+                slot_id=slot_id,
+                capacity=max(capacities[courier_id], count),
+                booked=count,
+            )
+            for (courier_id, slot_id), count in booked.items()
+        ],
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_florist_consultation_load'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courier',
+            name='slot_capacity',
+            field=models.PositiveSmallIntegerField(default=4, help_text='Сколько заказов курьер может доставить в одно окно', verbose_name='Заказов на слот'),
+        ),
+        migrations.CreateModel(
+            name='DeliverySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('start_time', models.TimeField(verbose_name='Начало')),
+                ('end_time', models.TimeField(verbose_name='Конец')),
+            ],
+            options={
+                'verbose_name': 'Слот доставки',
+                'verbose_name_plural': 'Слоты доставки',
+                'ordering': ('date', 'start_time'),
+                'constraints': [models.UniqueConstraint(fields=('date', 'start_time', 'end_time'), name='unique_delivery_slot')],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='delivery_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.deliveryslot', verbose_name='Слот доставки'),
+        ),
+        migrations.CreateModel(
+            name='CourierSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capacity', models.PositiveSmallIntegerField(verbose_name='Вместимость')),
+                ('booked', models.PositiveSmallIntegerField(default=0, verbose_name='Занято')),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='core.courier', verbose_name='Курьер')),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='courier_slots', to='core.deliveryslot', verbose_name='Слот доставки')),
+            ],
+            options={
+                'verbose_name': 'Загрузка курьера',
+                'verbose_name_plural': 'Загрузка курьеров',
+                'indexes': [models.Index(fields=['slot', 'booked', 'id'], name='courier_slot_load_idx')],
+                'constraints': [models.UniqueConstraint(fields=('courier', 'slot'), name='unique_courier_slot')],
+            },
+        ),
+        migrations.RunPython(link_delivery_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_delivery_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBouquetStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('bouquet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.bouquet', verbose_name='Букет')),
+            ],
+            options={
+                'verbose_name': 'Заказы букета за день',
+                'verbose_name_plural': 'Заказы букетов по дням',
+                'constraints': [models.UniqueConstraint(fields=('date', 'bouquet'), name='unique_daily_bouquet_stats')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCourierStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('courier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.courier', verbose_name='Курьер')),
+            ],
+            options={
+                'verbose_name': 'Заказы курьера за день',
+                'verbose_name_plural': 'Заказы курьеров по дням',
+                'constraints': [models.UniqueConstraint(fields=('date', 'courier'), name='unique_daily_courier_stats')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCustomerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.customer', verbose_name='Покупатель')),
+            ],
+            options={
+                'verbose_name': 'Заказы покупателя за день',
+                'verbose_name_plural': 'Заказы покупателей по дням',
+                'constraints': [models.UniqueConstraint(fields=('date', 'customer'), name='unique_daily_customer_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:01
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_key', models.CharField(max_length=120, unique=True, verbose_name='Ключ события')),
+                ('event_type', models.CharField(max_length=50, verbose_name='Тип события')),
+                ('payload', models.JSONField(verbose_name='Тело уведомления')),
+                ('status', models.CharField(choices=[('new', 'Новое'), ('processing', 'Обрабатывается'), ('processed', 'Обработано'), ('ignored', 'Пропущено'), ('failed', 'Ошибка')], default='new', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('claim_token', models.UUIDField(blank=True, editable=False, null=True, verbose_name='Токен обработчика')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+            ],
+            options={
+                'verbose_name': 'Событие ЮKassa',
+                'verbose_name_plural': 'События ЮKassa',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='payment_event_due_idx'), models.Index(fields=['claim_token'], name='payment_event_claim_idx')],
+            },
+        ),
+    ]
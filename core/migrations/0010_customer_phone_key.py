@@ -0,0 +1,103 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:40
+
+import re
+from collections import Counter
+
+from django.db import migrations, models, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from phonenumber_field.phonenumber import to_python
+
+
+# Frozen copies of core.customers as of this migration, so later edits to
+# the normalization or the merge rules do not change what it does.
+def normalize_phone(value):
+    number = to_python(value)
+    if number and number.is_valid():
+        return number.as_e164
+    return re.sub(r'[^\d+]', '', str(value or '')) or None
+
+
+def repoint(model, field, survivors):
+    model.objects.filter(**{f'{field}__in': survivors}).update(**{field: Case(
+        *[When(**{field: old}, then=Value(new)) for old, new in survivors.items()],
+        output_field=IntegerField(),
+    )})
+
+
+def merge_customers(apps, survivors):
+    Customer = apps.get_model('core', 'Customer')
+    Order = apps.get_model('core', 'Order')
+    Consultation = apps.get_model('core', 'Consultation')
+    DailyCustomerStats = apps.get_model('core', 'DailyCustomerStats')
+
+    repoint(Order, 'customer_id', survivors)
+    repoint(Consultation, 'customer_id', survivors)
+
+    stats = Counter()
+    moved = DailyCustomerStats.objects.filter(customer_id__in=survivors)
+    for date, customer_id, orders_count in moved.values_list('date', 'customer_id', 'orders_count'):
+        stats[date, survivors[customer_id]] += orders_count
+    moved.delete()
+    for (date, customer_id), orders_count in stats.items():
+        added = DailyCustomerStats.objects.filter(date=date, customer_id=customer_id).update(
+            orders_count=F('orders_count') + orders_count
+        )
+        if not added:
+            DailyCustomerStats.objects.create(date=date, customer_id=customer_id, orders_count=orders_count)
+
+    Customer.objects.filter(id__in=survivors).delete()
+
+
+def fill_phone_keys(apps, schema_editor, batch_size=500):
+    Customer = apps.get_model('core', 'Customer')
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            customers = list(
+                Customer.objects.filter(id__gt=last_id, phone_key__isnull=True).order_by('id')[:batch_size]
+            )
+            if not customers:
+                return
+            last_id = customers[-1].id
+            keys = {customer.id: normalize_phone(customer.phone_number) for customer in customers}
+            owners = {
+                customer.phone_key: customer
+                for customer in Customer.objects.filter(phone_key__in=set(keys.values()) - {None})
+            }
+            keyed = []
+            renamed = {}
+            survivors = {}
+            for customer in customers:
+                key = keys[customer.id]
+                owner = owners.get(key) if key else None
+                if owner is None:
+                    customer.phone_key = key
+                    keyed.append(customer)
+                    if key:
+                        owners[key] = customer
+                    continue
+                survivors[customer.id] = owner.id
+                if customer.id > owner.id:
+                    owner.first_name = customer.first_name
+                    owner.phone_number = customer.phone_number
+                    owner.last_name = customer.last_name or owner.last_name
+                    renamed[owner.id] = owner
+            merge_customers(apps, survivors)
+            Customer.objects.bulk_update(keyed, ['phone_key'])
+            Customer.objects.bulk_update(renamed.values(), ['first_name', 'last_name', 'phone_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_key',
+            field=models.CharField(editable=False, max_length=32, null=True, verbose_name='Ключ телефона'),
+        ),
+        migrations.RunPython(fill_phone_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_customer_phone_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='phone_key',
+            field=models.CharField(editable=False, max_length=32, null=True, unique=True, verbose_name='Ключ телефона'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_customer_phone_key_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bouquet',
+            index=models.Index(fields=['occasion', 'budget'], name='bouquet_match_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bouquet',
+            index=models.Index(fields=['price', 'id'], name='bouquet_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bouquet',
+            index=models.Index(fields=['name', 'id'], name='bouquet_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='consultation',
+            index=models.Index(fields=['created_at'], name='consultation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_number'], name='customer_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payment_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['created_at'], name='payment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegrammessage',
+            index=models.Index(fields=['claim_token'], name='telegram_claim_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bouquet',
+            name='image_widths',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Ширины превью'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+
+# Frozen copies of core.search as of this migration, so later changes to
+# the index layout or the stemming do not change what it creates.
+SQLITE_TABLE = 'core_bouquet_search'
+SQLITE_CREATE = (
+    f'CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5('
+    "name, composition, description, tokenize = 'unicode61 remove_diacritics 2')"
+)
+POSTGRES_CREATE = (
+    'CREATE INDEX bouquet_search_idx ON core_bouquet USING gin (('
+    "setweight(to_tsvector('russian', name), 'A') || "
+    "setweight(to_tsvector('russian', composition), 'B') || "
+    "setweight(to_tsvector('russian', description), 'C')))"
+)
+FIELDS = ('name', 'composition', 'description')
+WORD = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'а без в во для до за и из или к ко на над не но о об от по под при с со у'.split()
+)
+
+
+def search_document(stemmer, texts):
+    return [
+        ' '.join(
+            stemmer.stemWord(word)
+            for word in WORD.findall(text.lower().replace('ё', 'е'))
+            if word not in STOP_WORDS
+        )
+        for text in texts
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CREATE)
+    if vendor != 'sqlite':
+        return
+    schema_editor.execute(SQLITE_CREATE)
+    Bouquet = apps.get_model('core', 'Bouquet')
+    rows = Bouquet.objects.using(schema_editor.connection.alias).values_list('id', *FIELDS)
+    stemmer = snowballstemmer.stemmer('russian')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {SQLITE_TABLE}(rowid, name, composition, description) VALUES (%s, %s, %s, %s)',
+            [(bouquet_id, *search_document(stemmer, texts)) for bouquet_id, *texts in rows],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS bouquet_search_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_bouquet_image_widths'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
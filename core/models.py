@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 from django.core.validators import MinValueValidator
 
@@ -17,6 +18,7 @@ class Bouquet(models.Model):
     ]
     name = models.CharField(verbose_name='Название букета', max_length=50, unique=True)
     image = models.ImageField(verbose_name='Изображение букета', upload_to='bouquets/', blank=True)
+    image_widths = models.JSONField(verbose_name='Ширины превью', default=list, blank=True, editable=False)
     price = models.PositiveIntegerField(verbose_name='Цена', default=0, validators=[MinValueValidator(1)])
     description = models.TextField(verbose_name='Описание', blank=True)
     composition = models.TextField(verbose_name='Состав', blank=True)
@@ -29,12 +31,20 @@ class Bouquet(models.Model):
     class Meta:
         verbose_name = 'Букет'
         verbose_name_plural = 'Букеты'
+        indexes = [
+            models.Index(fields=['occasion', 'budget'], name='bouquet_match_idx'),
+            models.Index(fields=['price', 'id'], name='bouquet_price_idx'),
+            models.Index(fields=['name', 'id'], name='bouquet_name_idx'),
+        ]
 
 
 class Customer(models.Model):
     first_name = models.CharField(verbose_name='Имя', max_length=50)
     last_name = models.CharField(verbose_name='Фамилия', max_length=50, blank=True)
     phone_number = PhoneNumberField(verbose_name='Номер телефона')
+    phone_key = models.CharField(
+        verbose_name='Ключ телефона', max_length=32, unique=True, null=True, editable=False
+    )
 
     def __str__(self):
         return f'{self.first_name} {self.last_name or ""}'.strip()
@@ -42,12 +52,16 @@ class Customer(models.Model):
     class Meta:
         verbose_name = 'Покупатель'
         verbose_name_plural = 'Покупатели'
+        indexes = [
+            models.Index(fields=['phone_number'], name='customer_phone_idx'),
+        ]
 
 
 class Florist(models.Model):
     name = models.CharField(verbose_name='Имя флориста', max_length=100)
     phone_number = PhoneNumberField(verbose_name='Номер телефона', blank=True)
     telegram_chat_id = models.CharField(verbose_name='Telegram Chat ID', max_length=50, blank=True, help_text='Для уведомлений о заявках')
+    consultation_load = models.PositiveIntegerField(verbose_name='Текущая нагрузка', default=0, help_text='Заявок за последние FLORIST_LOAD_WINDOW_HOURS часов')
 
     def __str__(self):
         return self.name
@@ -55,12 +69,16 @@ class Florist(models.Model):
     class Meta:
         verbose_name = 'Флорист'
         verbose_name_plural = 'Флористы'
+        indexes = [
+            models.Index(fields=['consultation_load', 'id'], name='florist_load_idx'),
+        ]
 
 
 class Courier(models.Model):
     name = models.CharField(verbose_name='Имя курьера', max_length=100)
     phone_number = PhoneNumberField(verbose_name='Номер телефона', blank=True)
     telegram_chat_id = models.CharField(verbose_name='Telegram Chat ID', max_length=50, blank=True, help_text='Для уведомлений о заказах')
+    slot_capacity = models.PositiveSmallIntegerField(verbose_name='Заказов на слот', default=4, help_text='Сколько заказов курьер может доставить в одно окно')
 
     def __str__(self):
         return self.name
@@ -70,12 +88,50 @@ class Courier(models.Model):
         verbose_name_plural = 'Курьеры'
 
 
+class DeliverySlot(models.Model):
+    date = models.DateField(verbose_name='Дата')
+    start_time = models.TimeField(verbose_name='Начало')
+    end_time = models.TimeField(verbose_name='Конец')
+
+    def __str__(self):
+        return f'{self.date:%d.%m.%Y} {self.start_time:%H:%M}-{self.end_time:%H:%M}'
+
+    class Meta:
+        verbose_name = 'Слот доставки'
+        verbose_name_plural = 'Слоты доставки'
+        ordering = ('date', 'start_time')
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'start_time', 'end_time'], name='unique_delivery_slot'),
+        ]
+
+
+class CourierSlot(models.Model):
+    courier = models.ForeignKey(Courier, verbose_name='Курьер', related_name='slots', on_delete=models.CASCADE)
+    slot = models.ForeignKey(DeliverySlot, verbose_name='Слот доставки', related_name='courier_slots', on_delete=models.CASCADE)
+    capacity = models.PositiveSmallIntegerField(verbose_name='Вместимость')
+    booked = models.PositiveSmallIntegerField(verbose_name='Занято', default=0)
+
+    def __str__(self):
+        return f'{self.courier} — {self.slot} ({self.booked}/{self.capacity})'
+
+    class Meta:
+        verbose_name = 'Загрузка курьера'
+        verbose_name_plural = 'Загрузка курьеров'
+        constraints = [
+            models.UniqueConstraint(fields=['courier', 'slot'], name='unique_courier_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['slot', 'booked', 'id'], name='courier_slot_load_idx'),
+        ]
+
+
 class Order(models.Model):
     customer = models.ForeignKey(Customer, verbose_name='Покупатель', on_delete=models.CASCADE)
     bouquet = models.ForeignKey(Bouquet, verbose_name='Букет', related_name='orders', on_delete=models.CASCADE)
     courier = models.ForeignKey(Courier, verbose_name='Курьер', on_delete=models.SET_NULL, null=True, blank=True)
     delivery_address = models.CharField(verbose_name='Адрес доставки', max_length=256)
     delivery_time = models.CharField(verbose_name='Время доставки', max_length=30)
+    delivery_slot = models.ForeignKey(DeliverySlot, verbose_name='Слот доставки', on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(verbose_name='Дата создания', auto_now_add=True)
 
     def __str__(self):
@@ -84,6 +140,9 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
 
 class Consultation(models.Model):
@@ -97,6 +156,9 @@ class Consultation(models.Model):
     class Meta:
         verbose_name = 'Заявка на консультацию'
         verbose_name_plural = 'Заявки на консультацию'
+        indexes = [
+            models.Index(fields=['created_at'], name='consultation_created_idx'),
+        ]
 
 
 class Payment(models.Model):
@@ -111,4 +173,111 @@ class Payment(models.Model):
 
     class Meta:
         verbose_name = 'Платёж'
-        verbose_name_plural = 'Платежи'
\ No newline at end of file
+        verbose_name_plural = 'Платежи'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='payment_status_idx'),
+            models.Index(fields=['created_at'], name='payment_created_idx'),
+        ]
+
+class TelegramMessage(models.Model):
+    BOTS = [
+        ('florist', 'Бот флористов'),
+        ('courier', 'Бот курьеров'),
+    ]
+    STATUSES = [
+        ('pending', 'В очереди'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+    bot = models.CharField(verbose_name='Бот', max_length=20, choices=BOTS)
+    chat_id = models.CharField(verbose_name='Telegram Chat ID', max_length=50)
+    text = models.TextField(verbose_name='Текст')
+    status = models.CharField(verbose_name='Статус', max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попыток', default=0)
+    next_attempt_at = models.DateTimeField(verbose_name='Следующая попытка', default=timezone.now)
+    claim_token = models.UUIDField(verbose_name='Токен обработчика', null=True, blank=True, editable=False)
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+    created_at = models.DateTimeField(verbose_name='Дата создания', auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name='Дата отправки', null=True, blank=True)
+
+    def __str__(self):
+        return f'Сообщение в {self.chat_id} ({self.status})'
+
+    class Meta:
+        verbose_name = 'Telegram-уведомление'
+        verbose_name_plural = 'Telegram-уведомления'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='telegram_due_idx'),
+            models.Index(fields=['claim_token'], name='telegram_claim_idx'),
+        ]
+
+
+class DailyBouquetStats(models.Model):
+    date = models.DateField(verbose_name='Дата')
+    bouquet = models.ForeignKey(Bouquet, verbose_name='Букет', on_delete=models.CASCADE)
+    orders_count = models.PositiveIntegerField(verbose_name='Заказов', default=0)
+
+    class Meta:
+        verbose_name = 'Заказы букета за день'
+        verbose_name_plural = 'Заказы букетов по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'bouquet'], name='unique_daily_bouquet_stats'),
+        ]
+
+
+class DailyCustomerStats(models.Model):
+    date = models.DateField(verbose_name='Дата')
+    customer = models.ForeignKey(Customer, verbose_name='Покупатель', on_delete=models.CASCADE)
+    orders_count = models.PositiveIntegerField(verbose_name='Заказов', default=0)
+
+    class Meta:
+        verbose_name = 'Заказы покупателя за день'
+        verbose_name_plural = 'Заказы покупателей по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'customer'], name='unique_daily_customer_stats'),
+        ]
+
+
+class DailyCourierStats(models.Model):
+    date = models.DateField(verbose_name='Дата')
+    courier = models.ForeignKey(Courier, verbose_name='Курьер', on_delete=models.CASCADE)
+    orders_count = models.PositiveIntegerField(verbose_name='Заказов', default=0)
+
+    class Meta:
+        verbose_name = 'Заказы курьера за день'
+        verbose_name_plural = 'Заказы курьеров по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'courier'], name='unique_daily_courier_stats'),
+        ]
+
+
+class PaymentEvent(models.Model):
+    STATUSES = [
+        ('new', 'Новое'),
+        ('processing', 'Обрабатывается'),
+        ('processed', 'Обработано'),
+        ('ignored', 'Пропущено'),
+        ('failed', 'Ошибка'),
+    ]
+    event_key = models.CharField(verbose_name='Ключ события', max_length=120, unique=True)
+    event_type = models.CharField(verbose_name='Тип события', max_length=50)
+    payload = models.JSONField(verbose_name='Тело уведомления')
+    status = models.CharField(verbose_name='Статус', max_length=20, choices=STATUSES, default='new')
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попыток', default=0)
+    next_attempt_at = models.DateTimeField(verbose_name='Следующая попытка', default=timezone.now)
+    claim_token = models.UUIDField(verbose_name='Токен обработчика', null=True, blank=True, editable=False)
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+    received_at = models.DateTimeField(verbose_name='Получено', auto_now_add=True)
+    processed_at = models.DateTimeField(verbose_name='Обработано', null=True, blank=True)
+
+    def __str__(self):
+        return self.event_key
+
+    class Meta:
+        verbose_name = 'Событие ЮKassa'
+        verbose_name_plural = 'События ЮKassa'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='payment_event_due_idx'),
+            models.Index(fields=['claim_token'], name='payment_event_claim_idx'),
+        ]
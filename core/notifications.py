@@ -0,0 +1,339 @@
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_http_date
+
+from .models import TelegramMessage
+from .perf import timing
+
+
+BOT_TOKEN_SETTINGS = {
+    'florist': 'TELEGRAM_BOT_TOKEN',
+    'courier': 'TELEGRAM_COURIER_BOT_TOKEN',
+}
+DIGEST_SEPARATOR = '\n\n— — —\n\n'
+
+_local = threading.local()
+
+
+def enqueue_telegram_message(bot, chat_id, text):
+    return TelegramMessage.objects.create(bot=bot, chat_id=str(chat_id), text=text)
+
+
+def get_bot_token(bot):
+    return getattr(settings, BOT_TOKEN_SETTINGS[bot])
+
+
+def get_session():
+    # requests.Session is not thread-safe, so every worker thread keeps its own
+    # keep-alive pool to api.telegram.org.
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.TELEGRAM_WORKERS)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+
+def get_retry_delay(attempts):
+    delay = settings.TELEGRAM_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    delay = min(delay, settings.TELEGRAM_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        self.refill(now)
+        wait = 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """Token buckets per chat and per bot token, shared by the worker threads."""
+
+    def __init__(self, chat_rate=None, chat_burst=None, bot_rate=None):
+        self.chat_rate = chat_rate or settings.TELEGRAM_CHAT_RATE
+        self.chat_burst = chat_burst or settings.TELEGRAM_CHAT_BURST
+        self.bot_rate = bot_rate or settings.TELEGRAM_BOT_RATE
+        self.chats = {}
+        self.bots = {}
+        self.lock = threading.Lock()
+
+    def buckets(self, token, chat_id, now):
+        chat = self.chats.get((token, chat_id))
+        if chat is None:
+            chat = self.chats[(token, chat_id)] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        bot = self.bots.get(token)
+        if bot is None:
+            bot = self.bots[token] = TokenBucket(self.bot_rate, self.bot_rate, now)
+        return chat, bot
+
+    def reserve(self, token, chat_id):
+        """Take a token for one request, or return how many seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            chat, bot = self.buckets(token, chat_id, now)
+            delay = max(chat.delay(now), bot.delay(now))
+            if delay <= 0:
+                chat.consume()
+                bot.consume()
+            return delay
+
+    def block(self, token, chat_id, seconds):
+        with self.lock:
+            now = time.monotonic()
+            chat, _ = self.buckets(token, chat_id, now)
+            chat.block(seconds, now)
+
+
+@dataclass
+class Digest:
+    bot: str
+    chat_id: str
+    messages: list = field(default_factory=list)
+    length: int = 0
+
+    def add(self, message):
+        if self.messages:
+            self.length += len(DIGEST_SEPARATOR)
+        self.length += len(message.text)
+        self.messages.append(message)
+
+    @property
+    def text(self):
+        return DIGEST_SEPARATOR.join(message.text for message in self.messages)
+
+    @property
+    def ids(self):
+        return [message.id for message in self.messages]
+
+    @property
+    def claim_token(self):
+        # Digests are built from one claim_due_messages() batch.
+        return self.messages[0].claim_token
+
+
+def coalesce(messages, limit=None):
+    """Merge messages for the same chat into digests no longer than ``limit``."""
+    limit = limit or settings.TELEGRAM_MESSAGE_LIMIT
+    digests = []
+    open_digests = {}
+    for message in messages:
+        key = (message.bot, message.chat_id)
+        digest = open_digests.get(key)
+        if digest is not None and digest.length + len(DIGEST_SEPARATOR) + len(message.text) > limit:
+            digest = None
+        if digest is None:
+            digest = open_digests[key] = Digest(message.bot, message.chat_id)
+            digests.append(digest)
+        digest.add(message)
+    return digests
+
+
+def build_message_request(token, chat_id, text):
+    url = f'{settings.TELEGRAM_API_URL}/bot{token}/sendMessage'
+    payload = {
+        'chat_id': chat_id,
+        'text': text,
+        'parse_mode': 'HTML',
+    }
+    return url, payload
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header, which holds a number or an HTTP date; 1 if absent or malformed."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(parse_http_date(value) - int(time.time()), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def read_response(response):
+    if response.status_code == 429:
+        try:
+            retry_after = response.json()['parameters']['retry_after']
+        except (ValueError, KeyError, TypeError):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        return False, retry_after, response.text
+    if response.status_code >= 400:
+        return False, None, f'{response.status_code}: {response.text}'
+    return True, None, None
+
+
+def describe_error(error, token):
+    # Exceptions from requests quote the URL, and the URL holds the bot token.
+    return f'{type(error).__name__}: {error}'.replace(token, '<token>')
+
+
+def post_message(token, chat_id, text):
+    """Send one sendMessage request and return ``(ok, retry_after, error)``."""
+    url, payload = build_message_request(token, chat_id, text)
+    try:
+        with timing('http'):
+            response = get_session().post(url, json=payload, timeout=settings.TELEGRAM_TIMEOUT)
+    except RequestException as e:
+        return False, None, describe_error(e, token)
+    return read_response(response)
+
+
+def get_async_client():
+    connect, read = settings.TELEGRAM_TIMEOUT
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read, connect=connect),
+        limits=httpx.Limits(max_connections=settings.TELEGRAM_WORKERS),
+    )
+
+
+async def apost_message(client, token, chat_id, text):
+    """post_message() over an httpx.AsyncClient."""
+    url, payload = build_message_request(token, chat_id, text)
+    try:
+        with timing('http'):
+            response = await client.post(url, json=payload)
+    except httpx.HTTPError as e:
+        return False, None, describe_error(e, token)
+    return read_response(response)
+
+
+def claim_due_messages(limit):
+    now = timezone.now()
+    due = TelegramMessage.objects.filter(
+        status__in=['pending', 'sending'],
+        next_attempt_at__lte=now,
+    ).order_by('next_attempt_at', 'id')
+    ids = list(due.values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    # Rows left in 'sending' by a crashed worker become due again once the
+    # lease expires; the conditional update keeps two workers from claiming
+    # the same row.
+    TelegramMessage.objects.filter(
+        id__in=ids,
+        status__in=['pending', 'sending'],
+        next_attempt_at__lte=now,
+    ).update(
+        status='sending',
+        claim_token=token,
+        next_attempt_at=now + timedelta(seconds=settings.TELEGRAM_CLAIM_LEASE),
+    )
+    return list(TelegramMessage.objects.filter(claim_token=token, status='sending').order_by('id'))
+
+
+def release(ids, claim_token, delay):
+    """Put claimed messages back in the queue without counting an attempt.
+
+    Like mark_sent() and mark_failed(), this only touches rows still held
+    under ``claim_token``: once the lease runs out another worker may have
+    claimed them.
+    """
+    TelegramMessage.objects.filter(id__in=ids, claim_token=claim_token).update(
+        status='pending',
+        claim_token=None,
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def mark_sent(ids, claim_token):
+    TelegramMessage.objects.filter(id__in=ids, claim_token=claim_token).update(
+        status='sent',
+        sent_at=timezone.now(),
+        attempts=F('attempts') + 1,
+        last_error='',
+        claim_token=None,
+    )
+
+
+def mark_failed(message, error, delay=None):
+    attempts = message.attempts + 1
+    fields = {'attempts': attempts, 'last_error': str(error)[:1000], 'claim_token': None}
+    if attempts >= settings.TELEGRAM_MAX_ATTEMPTS:
+        fields['status'] = 'failed'
+    else:
+        if delay is None:
+            delay = get_retry_delay(attempts)
+        fields['status'] = 'pending'
+        fields['next_attempt_at'] = timezone.now() + timedelta(seconds=delay)
+    TelegramMessage.objects.filter(id=message.id, claim_token=message.claim_token).update(**fields)
+
+
+def fail_digest(digest, error):
+    for message in digest.messages:
+        mark_failed(message, error)
+
+
+def finish_delivery(digest, token, limiter, ok, retry_after, error):
+    if ok:
+        mark_sent(digest.ids, digest.claim_token)
+        return True
+    if retry_after is not None:
+        limiter.block(token, digest.chat_id, retry_after)
+        release(digest.ids, digest.claim_token, retry_after)
+        return False
+    fail_digest(digest, error)
+    return False
+
+
+def deliver(digest, limiter):
+    token = get_bot_token(digest.bot)
+    if not token:
+        fail_digest(digest, f'Не задан токен бота {digest.bot}')
+        return False
+    return finish_delivery(digest, token, limiter, *post_message(token, digest.chat_id, digest.text))
+
+
+async def adeliver(digest, limiter, client):
+    token = get_bot_token(digest.bot)
+    if not token:
+        await sync_to_async(fail_digest)(digest, f'Не задан токен бота {digest.bot}')
+        return False
+    result = await apost_message(client, token, digest.chat_id, digest.text)
+    return await sync_to_async(finish_delivery)(digest, token, limiter, *result)
+
+
+def schedule(digests, limiter):
+    """Split digests into those allowed to go now and release the rest."""
+    ready = []
+    for digest in digests:
+        token = get_bot_token(digest.bot) or ''
+        delay = limiter.reserve(token, digest.chat_id)
+        if delay > 0:
+            release(digest.ids, digest.claim_token, delay)
+        else:
+            ready.append(digest)
+    return ready
@@ -0,0 +1,104 @@
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Cursor pagination over a unique ordering such as ('price', 'id').
+
+    Pages are fetched with ``WHERE (price, id) > (...) LIMIT n + 1``, so there
+    is no COUNT(*) and no OFFSET scan. Cursors are signed, opaque tokens.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+
+    def encode(self, direction, obj):
+        values = [getattr(obj, field) for field in self.ordering]
+        return signing.dumps([direction, self.ordering, values], salt=CURSOR_SALT, compress=True)
+
+    def decode(self, cursor):
+        try:
+            direction, ordering, values = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+        if direction not in ('next', 'prev') or list(ordering) != list(self.ordering):
+            return None
+        return direction, values
+
+    def seek(self, values, lookup):
+        condition = Q()
+        for i in reversed(range(len(self.ordering))):
+            field = self.ordering[i]
+            equal = {self.ordering[j]: values[j] for j in range(i)}
+            condition = Q(**equal, **{f'{field}__{lookup}': values[i]}) | condition
+        return condition
+
+    def page_query(self, cursor):
+        """Return ``(direction, queryset)`` for the rows of the page after ``cursor``."""
+        decoded = self.decode(cursor) if cursor else None
+        if decoded is None:
+            return None, self.queryset.order_by(*self.ordering)[:self.per_page + 1]
+        direction, values = decoded
+        if direction == 'next':
+            queryset = self.queryset.filter(self.seek(values, 'gt')).order_by(*self.ordering)
+        else:
+            descending = [f'-{field}' for field in self.ordering]
+            queryset = self.queryset.filter(self.seek(values, 'lt')).order_by(*descending)
+        return direction, queryset[:self.per_page + 1]
+
+    def make_page(self, direction, rows):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction is None:
+            return KeysetPage(rows, self.encode('next', rows[-1]) if has_more else None)
+        if direction == 'prev':
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows)
+        if direction == 'next':
+            next_cursor = self.encode('next', rows[-1]) if has_more else None
+            previous_cursor = self.encode('prev', rows[0])
+        else:
+            next_cursor = self.encode('next', rows[-1])
+            previous_cursor = self.encode('prev', rows[0]) if has_more else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        direction, queryset = self.page_query(cursor)
+        return self.make_page(direction, list(queryset))
+
+    async def aget_page(self, cursor=None):
+        direction, queryset = self.page_query(cursor)
+        return self.make_page(direction, [obj async for obj in queryset])
+
+
+async def aget_offset_page(paginator, number):
+    """Paginator.get_page() for async views: the count and the rows come from the async ORM."""
+    paginator.count = await paginator.object_list.acount()
+    page = paginator.get_page(number)
+    page.object_list = [obj async for obj in page.object_list]
+    return page
@@ -0,0 +1,167 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Payment, PaymentEvent
+from .notifications import enqueue_telegram_message
+
+
+EVENT_STATUSES = {
+    'payment.waiting_for_capture': 'waiting_for_capture',
+    'payment.succeeded': 'succeeded',
+    'payment.canceled': 'canceled',
+    'refund.succeeded': 'refunded',
+}
+ALLOWED_TRANSITIONS = {
+    'pending': {'waiting_for_capture', 'succeeded', 'canceled'},
+    'waiting_for_capture': {'succeeded', 'canceled'},
+    'succeeded': {'refunded'},
+}
+
+
+class PaymentNotFound(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def build_event(event_json):
+    """Unsaved PaymentEvent for a webhook body; raises KeyError or TypeError on a malformed one."""
+    event_type = event_json['event']
+    object_id = event_json['object']['id']
+    return PaymentEvent(event_key=f'{event_type}:{object_id}', event_type=event_type, payload=event_json)
+
+
+def record_event(event_json):
+    """Store a webhook body once per (event, object id); repeated deliveries are dropped."""
+    PaymentEvent.objects.bulk_create([build_event(event_json)], ignore_conflicts=True)
+
+
+async def arecord_event(event_json):
+    await PaymentEvent.objects.abulk_create([build_event(event_json)], ignore_conflicts=True)
+
+
+def get_payment_id(event):
+    obj = event.payload['object']
+    if event.event_type.startswith('refund.'):
+        return obj['payment_id']
+    return obj['id']
+
+
+def notify_courier(payment):
+    order = payment.order
+    courier_chat_id = (
+        order.courier.telegram_chat_id
+        if order.courier and order.courier.telegram_chat_id
+        else settings.TELEGRAM_COURIER_CHAT_ID
+    )
+    if not courier_chat_id:
+        return
+    message = (
+        f"<b>Заказ оплачен:</b>\n"
+        f"Букет: {order.bouquet.name}\n"
+        f"Адрес: {order.delivery_address}\n"
+        f"Время: {order.delivery_time}\n"
+        f"Клиент: {order.customer.first_name} {order.customer.last_name or ''}\n"
+        f"Телефон: {order.customer.phone_number}\n"
+        f"Сумма: {payment.amount} руб"
+    )
+    enqueue_telegram_message('courier', courier_chat_id, message)
+
+
+def apply_event(event):
+    """Apply one event and return True if it changed the payment status."""
+    new_status = EVENT_STATUSES.get(event.event_type)
+    if new_status is None:
+        return False
+    payment = (
+        Payment.objects.select_related('order__courier', 'order__bouquet', 'order__customer')
+        .filter(payment_id=get_payment_id(event))
+        .first()
+    )
+    if payment is None:
+        raise PaymentNotFound(get_payment_id(event))
+    if new_status not in ALLOWED_TRANSITIONS.get(payment.status, ()):
+        return False
+    # Compare-and-set on the old status: if another worker got here first the
+    # update touches no rows and the courier is not notified twice.
+    updated = Payment.objects.filter(id=payment.id, status=payment.status).update(status=new_status)
+    if not updated:
+        return False
+    payment.status = new_status
+    if new_status == 'succeeded':
+        notify_courier(payment)
+    return True
+
+
+def claim_events(limit):
+    """Lease up to ``limit`` due events to this worker for PAYMENT_EVENT_CLAIM_LEASE seconds.
+
+    Events left in 'processing' by a crashed worker become due again when the
+    lease expires. Each claim counts as an attempt, so an event that keeps
+    killing its worker ends up failed after PAYMENT_EVENT_MAX_ATTEMPTS.
+    """
+    now = timezone.now()
+    PaymentEvent.objects.filter(
+        status='processing',
+        next_attempt_at__lte=now,
+        attempts__gte=settings.PAYMENT_EVENT_MAX_ATTEMPTS,
+    ).update(status='failed', claim_token=None, error='Обработчик не завершил событие', processed_at=now)
+    due = PaymentEvent.objects.filter(
+        status__in=['new', 'processing'],
+        next_attempt_at__lte=now,
+    ).order_by('next_attempt_at', 'id')
+    ids = list(due.values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    PaymentEvent.objects.filter(
+        id__in=ids,
+        status__in=['new', 'processing'],
+        next_attempt_at__lte=now,
+    ).update(
+        status='processing',
+        claim_token=token,
+        attempts=F('attempts') + 1,
+        next_attempt_at=now + timedelta(seconds=settings.PAYMENT_EVENT_CLAIM_LEASE),
+    )
+    return list(PaymentEvent.objects.filter(claim_token=token, status='processing').order_by('id'))
+
+
+def finish_event(event, status, error=''):
+    """Record the outcome; False if the lease expired and another worker took the event over."""
+    fields = {'status': status, 'error': error, 'claim_token': None}
+    if status == 'new':
+        delay = settings.PAYMENT_EVENT_RETRY_DELAY * 2 ** (event.attempts - 1)
+        fields['next_attempt_at'] = timezone.now() + timedelta(seconds=delay)
+    else:
+        fields['processed_at'] = timezone.now()
+    if not PaymentEvent.objects.filter(id=event.id, claim_token=event.claim_token).update(**fields):
+        return False
+    for name, value in fields.items():
+        setattr(event, name, value)
+    return True
+
+
+def process_event(event):
+    try:
+        with transaction.atomic():
+            changed = apply_event(event)
+            if not finish_event(event, 'processed' if changed else 'ignored'):
+                # Roll the payment change back and leave the event to its new owner.
+                raise LeaseLost(event.id)
+    except LeaseLost:
+        pass
+    except (PaymentNotFound, KeyError, TypeError) as e:
+        finish_event(event, 'failed', f'{type(e).__name__}: {e}')
+    except Exception as e:
+        # Database errors and the like: retry with backoff until the attempts run out.
+        status = 'failed' if event.attempts >= settings.PAYMENT_EVENT_MAX_ATTEMPTS else 'new'
+        finish_event(event, status, f'{type(e).__name__}: {e}')
+    return event.status
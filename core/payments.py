@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import uuid
+import weakref
+from dataclasses import dataclass
+from functools import cache
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .perf import timing
+
+
+class PaymentError(Exception):
+    pass
+
+
+@dataclass
+class CreatedPayment:
+    id: str
+    status: str
+    confirmation_url: str
+
+
+class BaseGateway:
+    def create_payment(self, amount, description, return_url, metadata=None, idempotence_key=None):
+        raise NotImplementedError
+
+    async def acreate_payment(self, amount, description, return_url, metadata=None, idempotence_key=None):
+        # Off the shared sync thread, so a slow gateway does not stall other requests' ORM calls.
+        return await sync_to_async(self.create_payment, thread_sensitive=False)(
+            amount, description, return_url, metadata, idempotence_key
+        )
+
+    async def aclose(self):
+        """Close the connections the gateway keeps for the running event loop."""
+
+
+class YooKassaGateway(BaseGateway):
+    """Client for the YooKassa v3 API with pooled connections and bounded timeouts.
+
+    ``create_payment`` uses a requests session per thread; ``acreate_payment``
+    uses an httpx.AsyncClient per event loop.
+    """
+
+    def __init__(self):
+        self.api_url = settings.YOOKASSA_API_URL
+        self.auth = (settings.YOOKASSA_SHOP_ID or '', settings.YOOKASSA_SECRET_KEY or '')
+        self.local = threading.local()
+        self.async_clients = weakref.WeakKeyDictionary()
+
+    def get_session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.auth = self.auth
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.PAYMENT_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self.local.session = session
+        return session
+
+    def get_async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self.async_clients.get(loop)
+        if client is None:
+            connect, read = settings.PAYMENT_TIMEOUT
+            client = httpx.AsyncClient(
+                auth=self.auth,
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=settings.PAYMENT_POOL_SIZE),
+            )
+            self.async_clients[loop] = client
+        return client
+
+    def build_request(self, amount, description, return_url, metadata, idempotence_key):
+        if not all(self.auth):
+            raise PaymentError('Не заданы YOOKASSA_SHOP_ID и YOOKASSA_SECRET_KEY')
+        payload = {
+            'amount': {'value': str(amount), 'currency': 'RUB'},
+            'confirmation': {'type': 'redirect', 'return_url': return_url},
+            'capture': True,
+            'description': description,
+            'metadata': metadata or {},
+        }
+        headers = {'Idempotence-Key': idempotence_key or str(uuid.uuid4())}
+        return payload, headers
+
+    def parse_payment(self, data):
+        return CreatedPayment(
+            id=data['id'],
+            status=data['status'],
+            confirmation_url=data['confirmation']['confirmation_url'],
+        )
+
+    def create_payment(self, amount, description, return_url, metadata=None, idempotence_key=None):
+        payload, headers = self.build_request(amount, description, return_url, metadata, idempotence_key)
+        try:
+            with timing('http'):
+                response = self.get_session().post(
+                    f'{self.api_url}/payments',
+                    json=payload,
+                    headers=headers,
+                    timeout=settings.PAYMENT_TIMEOUT,
+                )
+            response.raise_for_status()
+            return self.parse_payment(response.json())
+        except (RequestException, ValueError, KeyError) as e:
+            raise PaymentError(e) from e
+
+    async def acreate_payment(self, amount, description, return_url, metadata=None, idempotence_key=None):
+        payload, headers = self.build_request(amount, description, return_url, metadata, idempotence_key)
+        try:
+            with timing('http'):
+                response = await self.get_async_client().post(
+                    f'{self.api_url}/payments', json=payload, headers=headers
+                )
+            response.raise_for_status()
+            return self.parse_payment(response.json())
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            raise PaymentError(e) from e
+
+    async def aclose(self):
+        client = self.async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class DummyGateway(BaseGateway):
+    """Accepts every payment without leaving the process; for tests and load runs."""
+
+    def create_payment(self, amount, description, return_url, metadata=None, idempotence_key=None):
+        return CreatedPayment(id=str(uuid.uuid4()), status='pending', confirmation_url=return_url)
+
+    async def acreate_payment(self, amount, description, return_url, metadata=None, idempotence_key=None):
+        return self.create_payment(amount, description, return_url, metadata, idempotence_key)
+
+
+@cache
+def load_gateway(path):
+    return import_string(path)()
+
+
+def get_payment_gateway():
+    return load_gateway(settings.PAYMENT_BACKEND)
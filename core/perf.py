@@ -0,0 +1,152 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger('core.perf')
+current = ContextVar('perf_timings', default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {}
+        self.counts = {}
+        self.queries = []
+
+    def add(self, name, duration):
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        parts = [
+            f'{name};dur={self.totals[name] * 1000:.1f};desc="{self.counts[name]}"'
+            for name in sorted(self.totals)
+        ]
+        parts.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def timing(name):
+    """Add the time spent in the block to the current request under ``name``; no-op outside requests."""
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection by signals.time_queries; async views run
+    # their queries in a worker thread that still sees the request's context.
+    timings = current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timings is not None:
+            duration = time.perf_counter() - started
+            timings.add('db', duration)
+            if len(timings.queries) < settings.PERF_QUERY_LOG_LIMIT:
+                timings.queries.append((sql, duration))
+
+
+class PerformanceMiddleware:
+    """Time the DB, templates and outbound HTTP for each request.
+
+    Totals go out as a Server-Timing header; a PERF_SAMPLE_RATE share of
+    requests, and every request slower than PERF_SLOW_REQUEST_MS, is also
+    logged to ``core.perf`` as one JSON line, the slow ones with their SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = Timings()
+        token = current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = Timings()
+        token = current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing()
+        self.log(request, response, timings)
+        return response
+
+    def log(self, request, response, timings):
+        elapsed = timings.elapsed()
+        slow = elapsed * 1000 >= settings.PERF_SLOW_REQUEST_MS
+        if not slow and random.random() >= settings.PERF_SAMPLE_RATE:
+            return
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 1),
+            'slow': slow,
+        }
+        for name, total in timings.totals.items():
+            entry[f'{name}_ms'] = round(total * 1000, 1)
+            entry[f'{name}_count'] = timings.counts[name]
+        if slow:
+            entry['queries'] = [{'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in timings.queries]
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(entry, ensure_ascii=False))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        with timing('tpl'):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose top-level renders are timed; includes count toward their parent."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,75 @@
+import re
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import (
+    Bouquet, Consultation, Courier, CourierSlot, Customer, DeliverySlot, Florist, Order, Payment,
+    PaymentEvent, TelegramMessage
+)
+from .pagination import KeysetPaginator
+
+
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?!.*\bUSING (?:COVERING )?INDEX\b)(\S+)')
+POSTGRES_FULL_SCAN = re.compile(r'\bSeq Scan on (\S+)')
+
+
+def catalog_next_page(ordering):
+    paginator = KeysetPaginator(Bouquet.objects.all(), 3, ordering)
+    return paginator.queryset.filter(paginator.seek([1000, 1], 'gt')).order_by(*ordering)[:4]
+
+
+def get_critical_queries():
+    """Querysets on request and worker paths that must be served by an index."""
+    now = timezone.now()
+    today = timezone.localdate()
+    week_ago = today - timedelta(days=7)
+    return {
+        'quiz_match': Bouquet.objects.filter(occasion='Свадьба', budget='1000-5000'),
+        'catalog_by_price': Bouquet.objects.order_by('price', 'id')[:4],
+        'catalog_by_price_next': catalog_next_page(('price', 'id')),
+        'catalog_by_name': Bouquet.objects.order_by('name', 'id')[:4],
+        'customer_by_phone': Customer.objects.filter(phone_number='+79990000000'),
+        'customer_by_phone_key': Customer.objects.filter(phone_key='+79990000000'),
+        'order_changelist': Order.objects.order_by('-created_at')[:100],
+        'orders_by_period': Order.objects.filter(created_at__gte=now - timedelta(days=7), created_at__lt=now),
+        'consultation_window': Consultation.objects.filter(created_at__gte=now - timedelta(hours=24)),
+        'consultation_changelist': Consultation.objects.order_by('-created_at')[:100],
+        'payments_by_status': Payment.objects.filter(status='pending').order_by('-created_at')[:100],
+        'payment_by_id': Payment.objects.filter(payment_id='00000000-0000-0000-0000-000000000000'),
+        'payment_changelist': Payment.objects.order_by('-created_at')[:100],
+        'least_loaded_florist': Florist.objects.order_by('consultation_load', 'id')[:1],
+        'courier_dispatch': CourierSlot.objects.filter(slot_id=1).order_by('booked', 'id')[:1],
+        'courier_future_slots': DeliverySlot.objects.filter(date__gte=today),
+        'courier_slots': CourierSlot.objects.filter(courier=Courier(id=1)),
+        'telegram_due': TelegramMessage.objects.filter(
+            status__in=['pending', 'sending'], next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id')[:100],
+        'telegram_claimed': TelegramMessage.objects.filter(
+            claim_token='00000000-0000-0000-0000-000000000000', status='sending'
+        ),
+        'payment_events_due': PaymentEvent.objects.filter(
+            status__in=['new', 'processing'], next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id')[:100],
+        'payment_events_claimed': PaymentEvent.objects.filter(
+            claim_token='00000000-0000-0000-0000-000000000000', status='processing'
+        ),
+        'stats_by_date': rollups.filter_dates(rollups.orders_by_date(), week_ago, today),
+    }
+
+
+def explain(queryset):
+    if connection.vendor == 'postgresql':
+        # Tiny development tables make a sequential scan the cheapest plan,
+        # so ask which index the planner would reach for instead.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def find_full_scans(plan):
+    pattern = POSTGRES_FULL_SCAN if connection.vendor == 'postgresql' else SQLITE_FULL_SCAN
+    return pattern.findall(plan)
@@ -0,0 +1,129 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyBouquetStats, DailyCourierStats, DailyCustomerStats, Order
+
+
+ROLLUPS = [
+    (DailyBouquetStats, 'bouquet'),
+    (DailyCustomerStats, 'customer'),
+    (DailyCourierStats, 'courier'),
+]
+
+
+def add(model, delta, **keys):
+    updated = model.objects.filter(**keys).update(orders_count=F('orders_count') + delta)
+    if delta < 0:
+        # A courier or bouquet that no longer has orders that day drops off the stats page.
+        model.objects.filter(orders_count__lte=0, **keys).delete()
+        return
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(orders_count=delta, **keys)
+    except IntegrityError:
+        model.objects.filter(**keys).update(orders_count=F('orders_count') + delta)
+
+
+def apply_order(order, delta):
+    date = timezone.localdate(order.created_at)
+    for model, field in ROLLUPS:
+        value = getattr(order, f'{field}_id')
+        if value is not None:
+            add(model, delta, date=date, **{f'{field}_id': value})
+
+
+def record_order(order):
+    apply_order(order, 1)
+
+
+def forget_order(order):
+    apply_order(order, -1)
+
+
+def move_order(old, new):
+    """Move the counts of an edited order from its ``old`` state to the ``new`` one."""
+    old_date = timezone.localdate(old.created_at)
+    new_date = timezone.localdate(new.created_at)
+    for model, field in ROLLUPS:
+        old_value = getattr(old, f'{field}_id')
+        new_value = getattr(new, f'{field}_id')
+        if (old_date, old_value) == (new_date, new_value):
+            continue
+        if old_value is not None:
+            add(model, -1, date=old_date, **{f'{field}_id': old_value})
+        if new_value is not None:
+            add(model, 1, date=new_date, **{f'{field}_id': new_value})
+
+
+def filter_dates(queryset, start=None, end=None, field='date'):
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def rebuild_rollups(start=None, end=None, batch_size=2000):
+    """Recompute the rollups for a date range from the Order table."""
+    orders = filter_dates(Order.objects.all(), start, end, field='created_at__date')
+    rows = 0
+    for model, field in ROLLUPS:
+        totals = (
+            orders.filter(**{f'{field}__isnull': False})
+            .annotate(date=TruncDate('created_at'))
+            .values_list('date', field)
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            filter_dates(model.objects.all(), start, end).delete()
+            batch = []
+            for date, value, count in totals.iterator(chunk_size=batch_size):
+                batch.append(model(date=date, orders_count=count, **{f'{field}_id': value}))
+                if len(batch) >= batch_size:
+                    model.objects.bulk_create(batch)
+                    rows += len(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+            rows += len(batch)
+    return rows
+
+
+def orders_by_bouquet(start=None, end=None):
+    return (
+        filter_dates(DailyBouquetStats.objects.all(), start, end)
+        .values('bouquet__name')
+        .annotate(count=Sum('orders_count'))
+        .order_by('-count')
+    )
+
+
+def orders_by_date(start=None, end=None):
+    return (
+        filter_dates(DailyBouquetStats.objects.all(), start, end)
+        .values('date')
+        .annotate(count=Sum('orders_count'))
+        .order_by('date')
+    )
+
+
+def orders_by_customer(start=None, end=None):
+    return (
+        filter_dates(DailyCustomerStats.objects.all(), start, end)
+        .values('customer', 'customer__first_name', 'customer__last_name')
+        .annotate(count=Sum('orders_count'))
+        .order_by('-count')
+    )
+
+
+def orders_by_courier(start=None, end=None):
+    return (
+        filter_dates(DailyCourierStats.objects.all(), start, end)
+        .values('courier__name')
+        .annotate(count=Sum('orders_count'))
+        .order_by('-count')
+    )
@@ -0,0 +1,189 @@
+"""Full-text search over bouquet names, compositions and descriptions.
+
+SQLite keeps a separate FTS5 table of Snowball-stemmed text, keyed by the
+bouquet id and updated from the Bouquet signals; Postgres indexes a
+weighted ``tsvector`` expression with GIN and stems with its own
+``russian`` configuration, so it needs no upkeep. Other backends fall
+back to ``icontains``.
+"""
+import functools
+import re
+import threading
+
+import snowballstemmer
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Bouquet
+
+
+SQLITE_TABLE = 'core_bouquet_search'
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('russian', name), 'A') || "
+    "setweight(to_tsvector('russian', composition), 'B') || "
+    "setweight(to_tsvector('russian', description), 'C')"
+)
+# bm25 weights of name, composition and description.
+SQLITE_WEIGHTS = '10.0, 4.0, 1.0'
+FIELDS = ('name', 'composition', 'description')
+MAX_WORDS = 8
+WORD = re.compile(r'\w+')
+# Postgres' russian configuration drops these itself; for FTS5 they are
+# removed from both the documents and the queries.
+STOP_WORDS = frozenset(
+    'а без в во для до за и из или к ко на над не но о об от по под при с со у'.split()
+)
+
+stemmers = threading.local()
+
+
+def split_words(text):
+    return [word for word in WORD.findall(text.lower().replace('ё', 'е')) if word not in STOP_WORDS]
+
+
+@functools.lru_cache(maxsize=100000)
+def stem(word):
+    # A catalog has a small vocabulary, and the pure-Python stemmer is what
+    # makes a full rebuild slow. Snowball stemmers keep state between calls,
+    # so each thread gets its own.
+    stemmer = getattr(stemmers, 'russian', None)
+    if stemmer is None:
+        stemmer = stemmers.russian = snowballstemmer.stemmer('russian')
+    return stemmer.stemWord(word)
+
+
+def search_document(name, composition, description):
+    """Stemmed text of each indexed field, as stored in the FTS5 table."""
+    return [' '.join(map(stem, split_words(text))) for text in (name, composition, description)]
+
+
+def build_query(text, vendor, name_only=False):
+    """Turn user input into a MATCH / to_tsquery expression; None if it has no words.
+
+    Every word must match, in any field or, with ``name_only``, in the name.
+    Only ``\\w`` characters get through, so the input cannot inject query
+    syntax.
+    """
+    words = split_words(text)[:MAX_WORDS]
+    if not words:
+        return None
+    if vendor == 'sqlite':
+        query = ' '.join(f'"{stem(word)}"' for word in words)
+        return f'name : ({query})' if name_only else query
+    # The name has weight A in the index.
+    return ' & '.join(f'{word}:A' if name_only else word for word in words)
+
+
+def get_vendor(using):
+    return connections[using].vendor
+
+
+def search_bouquets(text, limit):
+    """Ids of the bouquets matching ``text``, best match first.
+
+    Scoring costs about a microsecond per match, so only the
+    SEARCH_RANK_CANDIDATES newest matches are ranked, plus as many newest
+    matches by name: exact for specific queries, the current assortment
+    first for broad ones like "розы", and a bouquet named after the query
+    is never cut for being old.
+    """
+    using = router.db_for_read(Bouquet)
+    vendor = get_vendor(using)
+    query = build_query(text, vendor)
+    if query is None:
+        return []
+    name_query = build_query(text, vendor, name_only=True)
+    candidates = settings.SEARCH_RANK_CANDIDATES
+    if vendor == 'sqlite':
+        # One pass over the matches with a cheap filter: looking candidates
+        # up by rowid would re-run the MATCH for each of them.
+        sql = (
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s AND ('
+            f'rowid >= (SELECT min(rowid) FROM ('
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s)) '
+            f'OR rowid IN ('
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s)'
+            f') ORDER BY bm25({SQLITE_TABLE}, {SQLITE_WEIGHTS}), rowid LIMIT %s'
+        )
+        params = [query, query, candidates, name_query, candidates, limit]
+    elif vendor == 'postgresql':
+        # The GIN index holds no vectors, so ts_rank recomputes them: rank the candidates only.
+        sql = (
+            f'SELECT id FROM core_bouquet WHERE id IN ('
+            f"(SELECT id FROM core_bouquet WHERE {POSTGRES_VECTOR} @@ to_tsquery('russian', %s) ORDER BY id DESC LIMIT %s) "
+            f"UNION (SELECT id FROM core_bouquet WHERE {POSTGRES_VECTOR} @@ to_tsquery('russian', %s) ORDER BY id DESC LIMIT %s)"
+            f") ORDER BY ts_rank({POSTGRES_VECTOR}, to_tsquery('russian', %s)) DESC, id LIMIT %s"
+        )
+        params = [query, candidates, name_query, candidates, query, limit]
+    else:
+        bouquets = Bouquet.objects.using(using).filter(icontains_filter(text)).order_by('name', 'id')
+        return list(bouquets.values_list('id', flat=True)[:limit])
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def icontains_filter(text):
+    condition = Q()
+    for word in split_words(text)[:MAX_WORDS]:
+        condition &= Q(name__icontains=word) | Q(composition__icontains=word) | Q(description__icontains=word)
+    return condition
+
+
+def filter_bouquets(queryset, text):
+    """Narrow a Bouquet queryset to the rows matching ``text``, keeping its ordering."""
+    vendor = get_vendor(queryset.db)
+    query = build_query(text, vendor)
+    if query is None:
+        return queryset
+    if vendor == 'sqlite':
+        ids = RawSQL(f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [query])
+    elif vendor == 'postgresql':
+        ids = RawSQL(f"SELECT id FROM core_bouquet WHERE {POSTGRES_VECTOR} @@ to_tsquery('russian', %s)", [query])
+    else:
+        return queryset.filter(icontains_filter(text))
+    return queryset.filter(id__in=ids)
+
+
+def write_documents(cursor, rows):
+    cursor.executemany(
+        f'INSERT OR REPLACE INTO {SQLITE_TABLE}(rowid, name, composition, description) VALUES (%s, %s, %s, %s)',
+        [(bouquet_id, *search_document(*texts)) for bouquet_id, *texts in rows],
+    )
+
+
+def index_bouquets(bouquets):
+    """Add or refresh the FTS5 rows of ``bouquets`` (instances or a queryset)."""
+    using = router.db_for_write(Bouquet)
+    if get_vendor(using) != 'sqlite':
+        return
+    rows = [(bouquet.id, *(getattr(bouquet, name) for name in FIELDS)) for bouquet in bouquets]
+    with connections[using].cursor() as cursor:
+        write_documents(cursor, rows)
+
+
+def unindex_bouquets(ids):
+    using = router.db_for_write(Bouquet)
+    if get_vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [(bouquet_id,) for bouquet_id in ids])
+
+
+def rebuild_search_index(batch_size=5000):
+    """Refill the FTS5 table from scratch, e.g. after bulk_create, which sends no signals."""
+    using = router.db_for_write(Bouquet)
+    if get_vendor(using) != 'sqlite':
+        return
+    rows = Bouquet.objects.using(using).order_by('id').values_list('id', *FIELDS)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                write_documents(cursor, batch)
+                batch = []
+        write_documents(cursor, batch)
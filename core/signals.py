@@ -0,0 +1,93 @@
+from django.db.backends.signals import connection_created
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .bouquet_index import catalog_changed
+from .customers import normalize_phone
+from .delivery import open_future_slots, release_courier
+from .images import generate_derivatives
+from .models import Bouquet, Courier, Customer, Order
+from .payments import load_gateway
+from .perf import record_query
+from .rollups import forget_order, record_order
+from .search import index_bouquets, unindex_bouquets
+
+
+@receiver(pre_save, sender=Bouquet)
+def reset_image_widths(sender, instance, **kwargs):
+    # An uncommitted FieldFile is a fresh upload that FileField.pre_save is about to store.
+    if not instance.image or not instance.image._committed:
+        instance.image_widths = []
+    instance.image_uploaded = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=Bouquet)
+def make_image_derivatives(sender, instance, **kwargs):
+    # Connected before invalidate_catalog so the new widths are in place
+    # when the catalog version changes.
+    if not getattr(instance, 'image_uploaded', False):
+        return
+    instance.image_uploaded = False
+    try:
+        instance.image_widths = generate_derivatives(instance.image.name)
+    except OSError:
+        return
+    Bouquet.objects.filter(id=instance.id).update(image_widths=instance.image_widths)
+
+
+@receiver([post_save, post_delete], sender=Bouquet)
+def invalidate_catalog(sender, using, **kwargs):
+    # Admin list_editable edits go through Model.save() and end up here too.
+    catalog_changed(using)
+
+
+@receiver(post_save, sender=Bouquet)
+def index_bouquet(sender, instance, **kwargs):
+    index_bouquets([instance])
+
+
+@receiver(post_delete, sender=Bouquet)
+def unindex_bouquet(sender, instance, **kwargs):
+    unindex_bouquets([instance.id])
+
+
+@receiver(pre_save, sender=Customer)
+def set_phone_key(sender, instance, **kwargs):
+    instance.phone_key = normalize_phone(instance.phone_number)
+
+
+@receiver(post_save, sender=Courier)
+def open_courier_slots(sender, instance, created, **kwargs):
+    if created:
+        open_future_slots(instance)
+
+
+@receiver(post_delete, sender=Order)
+def release_order_slot(sender, instance, **kwargs):
+    release_courier(instance)
+
+
+@receiver(post_save, sender=Order)
+def record_order_stats(sender, instance, created, **kwargs):
+    if created:
+        record_order(instance)
+
+
+@receiver(post_delete, sender=Order)
+def forget_order_stats(sender, instance, **kwargs):
+    forget_order(instance)
+
+
+@receiver(setting_changed)
+def reset_payment_gateway(setting, **kwargs):
+    # The gateway is built once and reads its settings in __init__, so an
+    # override_settings() in tests or benchmarks has to drop it.
+    if setting.startswith(('PAYMENT_', 'YOOKASSA_')):
+        load_gateway.cache_clear()
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core import signing
+
+
+QUIZ_COOKIE = 'quiz'
+SEEN_COOKIE = 'seen'
+
+
+def read_state(request, name, default=None):
+    """Load a value written by ``write_state``; a missing, forged or expired cookie gives ``default``."""
+    value = request.COOKIES.get(name)
+    if value is None:
+        return default
+    try:
+        return signing.loads(value, salt=f'core.{name}', max_age=settings.SIGNED_STATE_MAX_AGE)
+    except signing.BadSignature:
+        return default
+
+
+def write_state(response, name, value):
+    response.set_cookie(
+        name,
+        signing.dumps(value, salt=f'core.{name}', compress=True),
+        max_age=settings.SIGNED_STATE_MAX_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def clear_state(response, name):
+    response.delete_cookie(name, samesite='Lax')
@@ -0,0 +1,184 @@
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotAllowed
+from django.templatetags.static import static
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.map', '.ico')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+def compress(data):
+    """Return ``{extension: bytes}`` for the encodings that actually shrink ``data``."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {extension: body for extension, body in variants.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest-hashed storage that also writes .gz and .br next to text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE) or not self.exists(name):
+                continue
+            with self.open(name) as f:
+                data = f.read()
+            for extension, body in compress(data).items():
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self.save(name + extension, ContentFile(body))
+                yield name, name + extension, True
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, available):
+    """Pick 'br', 'gzip' or None for the Accept-Encoding ``header``."""
+    accepted = parse_accept_encoding(header or '')
+    best, best_quality = None, 0.0
+    for coding in ('br', 'gzip'):
+        if coding not in available:
+            continue
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class StaticFile:
+    ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = {}
+        for coding, extension in self.ENCODINGS.items():
+            if os.path.isfile(path + extension):
+                self.variants[coding] = (path + extension, os.path.getsize(path + extension))
+
+
+def scan_static_root(root):
+    """Map every collected file under ``root`` to a StaticFile, keyed by its URL path."""
+    files = {}
+    if not root or not os.path.isdir(root):
+        return files
+    hashed = set()
+    manifest = os.path.join(root, 'staticfiles.json')
+    if os.path.isfile(manifest):
+        with open(manifest, encoding='utf-8') as f:
+            hashed = set(json.load(f).get('paths', {}).values())
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            files[name] = StaticFile(path, name in hashed)
+    return files
+
+
+class PrecompressedStaticMiddleware:
+    """Serve STATIC_ROOT with precompressed variants and far-future caching for hashed names.
+
+    Files are indexed once per process, since collectstatic only runs on
+    deploy. In development runserver serves static files before any
+    middleware, so this only takes effect under a real WSGI/ASGI server.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.process(request)
+        return self.get_response(request) if response is None else response
+
+    async def __acall__(self, request):
+        response = self.process(request)
+        return await self.get_response(request) if response is None else response
+
+    def process(self, request):
+        if not request.path_info.startswith(self.prefix):
+            return None
+        if self.files is None:
+            self.files = scan_static_root(settings.STATIC_ROOT)
+        static_file = self.files.get(request.path_info[len(self.prefix):])
+        if static_file is None:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return self.serve(request, static_file)
+
+    def serve(self, request, static_file):
+        coding = choose_encoding(request.headers.get('Accept-Encoding'), static_file.variants)
+        etag = static_file.etag if coding is None else f'{static_file.etag[:-1]}-{coding}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=304)
+        else:
+            path, size = static_file.variants[coding] if coding else (static_file.path, static_file.size)
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=static_file.content_type)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+                del response['Content-Disposition']
+            response['Content-Length'] = str(size)
+            if coding:
+                response['Content-Encoding'] = coding
+        response['ETag'] = etag
+        response['Last-Modified'] = static_file.last_modified
+        response['Cache-Control'] = IMMUTABLE if static_file.immutable else REVALIDATE
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def preload_header(assets):
+    """Build a Link header value from ``[(static path, as), ...]``."""
+    return ', '.join(f'<{static(path)}>; rel=preload; as={kind}' for path, kind in assets)
@@ -0,0 +1,106 @@
+"""Local stand-in for the Telegram Bot API used to benchmark the sender offline.
+
+Only ``sendMessage`` is implemented. Requests above the per-chat or per-bot
+rate get a 429 with ``parameters.retry_after``, like the real API.
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .notifications import DIGEST_SEPARATOR
+
+
+SEND_MESSAGE_PATH = re.compile(r'^/bot(?P<token>[^/]+)/sendMessage$')
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, chat_rate=1, bot_rate=30, latency=0.0):
+        super().__init__(address, FakeTelegramHandler)
+        self.chat_rate = chat_rate
+        self.bot_rate = bot_rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.chat_requests = defaultdict(deque)
+        self.bot_requests = defaultdict(deque)
+        self.stats = Counter()
+        self.delivered = Counter()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def throttle(self, token, chat_id):
+        """Return seconds to wait if a sliding one-second window is full."""
+        now = time.monotonic()
+        with self.lock:
+            windows = [
+                (self.chat_requests[(token, chat_id)], self.chat_rate),
+                (self.bot_requests[token], self.bot_rate),
+            ]
+            retry_after = 0
+            for window, rate in windows:
+                while window and now - window[0] >= 1:
+                    window.popleft()
+                if len(window) >= rate:
+                    retry_after = max(retry_after, 1 - (now - window[0]))
+            if retry_after:
+                self.stats['throttled'] += 1
+                return retry_after
+            for window, _ in windows:
+                window.append(now)
+            self.stats['accepted'] += 1
+            return 0
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        match = SEND_MESSAGE_PATH.match(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not match:
+            return self.respond(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+        try:
+            payload = json.loads(body)
+            chat_id, text = str(payload['chat_id']), payload['text']
+        except (ValueError, KeyError):
+            return self.respond(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request'})
+        if len(text) > 4096:
+            return self.respond(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message is too long'})
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        retry_after = self.server.throttle(match['token'], chat_id)
+        if retry_after:
+            retry_after = max(1, round(retry_after))
+            return self.respond(429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            })
+        with self.server.lock:
+            self.server.delivered[chat_id] += text.count(DIGEST_SEPARATOR) + 1
+        self.respond(200, {'ok': True, 'result': {'chat': {'id': chat_id}, 'text': text}})
+
+    def respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,35 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from core.images import derivative_url, get_srcset
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def bouquet_picture(bouquet, css_class='', sizes='100vw', default=None):
+    """
+    Render a bouquet image as <picture> with WebP and JPEG srcsets::
+
+        {% bouquet_picture bouquet 'card__img' '(max-width: 768px) 100vw, 50vw' 'img/cardImg.jpg' %}
+
+    Falls back to a plain <img> with the original file until the derivatives
+    exist, and to the ``default`` static file when there is no image at all.
+    """
+    if not bouquet.image:
+        return format_html('<img src="{}" alt="{}" class="{}">', static(default) if default else '', bouquet.name, css_class)
+    widths = bouquet.image_widths
+    if not widths:
+        return format_html('<img src="{}" alt="{}" class="{}">', bouquet.image.url, bouquet.name, css_class)
+    name = bouquet.image.name
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}">'
+        '</picture>',
+        get_srcset(name, widths, 'webp'), sizes,
+        derivative_url(name, max(widths), 'jpg'), get_srcset(name, widths, 'jpg'), sizes,
+        bouquet.name, css_class,
+    )
@@ -0,0 +1,41 @@
+from django import template
+
+from core.fragment_cache import get_fragment, set_fragment
+
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        content = get_fragment(name, *vary_on)
+        if content is None:
+            content = self.nodelist.render(context)
+            set_fragment(name, content, *vary_on)
+        return content
+
+
+@register.tag('fragmentcache')
+def do_fragmentcache(parser, token):
+    """
+    Cache a block until the next catalog change::
+
+        {% fragmentcache 'bouquet_card' bouquet.id %} ... {% endfragmentcache %}
+    """
+    nodelist = parser.parse(('endfragmentcache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least one argument.")
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -1,3 +1,1110 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import tempfile
+import threading
+import time
+import json
+import tracemalloc
+from datetime import date, datetime, time as datetime_time, timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, models
+from django.template import Context, Template
+from django.templatetags.static import static
+from PIL import Image
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .models import (
+    Bouquet, Consultation, Courier, CourierSlot, Customer, DailyBouquetStats, DailyCustomerStats, DeliverySlot, Florist,
+    Order, Payment, PaymentEvent, TelegramMessage
+)
+from . import rollups
+from .assignment import assign_florist
+from .bouquet_io import import_bouquets, iter_export
+from .bouquet_index import ANY_BUDGET, bouquet_index, pick_sample
+from .customers import dedupe_customers
+from .delivery import (
+    SlotFull, dispatch_courier, get_delivery_slot, parse_delivery_time, reassign_courier, rebuild_courier_load,
+)
+from .db_router import ReplicaRouter, ReplicaRoutingMiddleware, mark_replica_synced
+from .fragment_cache import bump_catalog_version, get_catalog_version, get_fragment_stats, make_key
+from .lifespan import Lifespan
+from .pagination import KeysetPaginator
+from .notifications import (
+    DIGEST_SEPARATOR, RateLimiter, claim_due_messages, coalesce, deliver, enqueue_telegram_message, mark_sent,
+    post_message, read_response, schedule,
+)
+from .payment_events import claim_events, process_event
+from .payments import PaymentError, YooKassaGateway, get_payment_gateway
+from .search import search_bouquets
+from .yookassa_stub import FakeYooKassaServer
+
+
+class StatsDownloadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(self.user)
+
+    def create_customer_stats(self, count):
+        Customer.objects.all().delete()
+        customers = Customer.objects.bulk_create(
+            Customer(first_name=f'Покупатель {i}', phone_number=f'+7999{i:07d}')
+            for i in range(count)
+        )
+        DailyCustomerStats.objects.bulk_create(
+            DailyCustomerStats(date=date(2025, 3, 8), customer=customer, orders_count=1)
+            for customer in customers
+        )
+
+    def download_peak_memory(self):
+        response = self.client.get(reverse('stats_download'))
+        tracemalloc.start()
+        try:
+            for _ in response.streaming_content:
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_csv_is_streamed_with_bom(self):
+        self.create_customer_stats(3)
+        response = self.client.get(reverse('stats_download'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'\xef\xbb\xbf'))
+        self.assertEqual(content.decode('utf-8-sig').count('Клиент,Покупатель'), 3)
+
+    def test_gzip_variant(self):
+        self.create_customer_stats(3)
+        response = self.client.get(reverse('stats_download'), {'gzip': 1})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertTrue(content.startswith(b'\xef\xbb\xbf'))
+        self.assertEqual(content.decode('utf-8-sig').count('Клиент,Покупатель'), 3)
+
+    @override_settings(STATS_EXPORT_CHUNK_SIZE=100)
+    def test_peak_memory_does_not_grow_with_rows(self):
+        self.create_customer_stats(5000)
+        small = self.download_peak_memory()
+        self.create_customer_stats(40000)
+        large = self.download_peak_memory()
+        self.assertLess(large, small * 1.2)
+
+
+class AdminChangelistQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='password')
+        bouquets = Bouquet.objects.bulk_create(
+            Bouquet(name=f'Букет {i}', price=1000 + i) for i in range(30)
+        )
+        customers = Customer.objects.bulk_create(
+            Customer(first_name=f'Покупатель {i}', phone_number=f'+7999{i:07d}') for i in range(30)
+        )
+        couriers = Courier.objects.bulk_create(Courier(name=f'Курьер {i}') for i in range(30))
+        florists = Florist.objects.bulk_create(Florist(name=f'Флорист {i}') for i in range(30))
+        orders = Order.objects.bulk_create(
+            Order(
+                customer=customers[i],
+                bouquet=bouquets[i],
+                courier=couriers[i],
+                delivery_address='ул. Пушкинская, 69',
+                delivery_time='10:00-12:00',
+            )
+            for i in range(30)
+        )
+        Consultation.objects.bulk_create(
+            Consultation(customer=customers[i], florist=florists[i]) for i in range(30)
+        )
+        Payment.objects.bulk_create(
+            Payment(order=order, payment_id=f'payment-{order.id}', amount=1000) for order in orders
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertChangelistQueries(self, model, num):
+        # The session is served from the cache by cached_db, so the first query is auth_user.
+        url = reverse(f'admin:core_{model}_changelist')
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        changelist = response.context['cl']
+        self.assertEqual(len(changelist.result_list), min(30, changelist.list_per_page))
+
+    def test_bouquet_changelist(self):
+        self.assertChangelistQueries('bouquet', 4)
+
+    def test_customer_changelist(self):
+        self.assertChangelistQueries('customer', 5)
+
+    def test_courier_changelist(self):
+        self.assertChangelistQueries('courier', 5)
+
+    def test_florist_changelist(self):
+        self.assertChangelistQueries('florist', 5)
+
+    def test_order_changelist(self):
+        self.assertChangelistQueries('order', 5)
+
+    def test_consultation_changelist(self):
+        self.assertChangelistQueries('consultation', 5)
+
+    def test_payment_changelist(self):
+        self.assertChangelistQueries('payment', 5)
+
+
+class YooKassaWebhookTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(first_name='Анна', phone_number='+79990000001')
+        bouquet = Bouquet.objects.create(name='Букет с розами', price=1200)
+        courier = Courier.objects.create(name='Курьер', telegram_chat_id='100')
+        order = Order.objects.create(
+            customer=customer,
+            bouquet=bouquet,
+            courier=courier,
+            delivery_address='ул. Жукова, 13',
+            delivery_time='10:00-12:00',
+        )
+        self.payment = Payment.objects.create(order=order, payment_id='pay-1', amount=1200)
+
+    def post_event(self, event, obj):
+        return self.client.post(
+            reverse('webhook_yookassa'),
+            data=json.dumps({'type': 'notification', 'event': event, 'object': obj}),
+            content_type='application/json',
+        )
+
+    def process(self):
+        return [process_event(event) for event in claim_events(100)]
+
+    def test_duplicate_deliveries_notify_courier_once(self):
+        for _ in range(3):
+            response = self.post_event('payment.succeeded', {'id': 'pay-1', 'status': 'succeeded'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.assertEqual(self.process(), ['processed'])
+        self.assertEqual(self.process(), [])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'succeeded')
+        self.assertEqual(TelegramMessage.objects.filter(bot='courier', chat_id='100').count(), 1)
+
+    def test_refund_after_success(self):
+        self.post_event('payment.succeeded', {'id': 'pay-1', 'status': 'succeeded'})
+        self.post_event('refund.succeeded', {'id': 'refund-1', 'payment_id': 'pay-1', 'status': 'succeeded'})
+        self.post_event('payment.canceled', {'id': 'pay-1', 'status': 'canceled'})
+        self.assertEqual(self.process(), ['processed', 'processed', 'ignored'])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'refunded')
+
+    def expire_leases(self):
+        PaymentEvent.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_crashed_claim_is_picked_up_again(self):
+        self.post_event('payment.succeeded', {'id': 'pay-1', 'status': 'succeeded'})
+        [stale] = claim_events(100)
+        self.assertEqual(claim_events(100), [])
+        self.expire_leases()
+        self.assertEqual(self.process(), ['processed'])
+        # The first worker wakes up after losing its lease and must not apply the event again.
+        self.assertEqual(process_event(stale), 'processing')
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('processed', 2))
+        self.assertEqual(TelegramMessage.objects.filter(bot='courier').count(), 1)
+
+    @override_settings(PAYMENT_EVENT_MAX_ATTEMPTS=2)
+    def test_unexpected_error_is_retried_then_failed(self):
+        self.post_event('payment.succeeded', {'id': 'pay-1', 'status': 'succeeded'})
+        with mock.patch('core.payment_events.apply_event', side_effect=OperationalError('disk I/O error')):
+            self.assertEqual(self.process(), ['new'])
+            self.assertEqual(self.process(), [])
+            self.expire_leases()
+            self.assertEqual(self.process(), ['failed'])
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.attempts, event.error), (2, 'OperationalError: disk I/O error'))
+
+    def test_invalid_body(self):
+        response = self.client.post(reverse('webhook_yookassa'), data='{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='token')
+class TelegramOutboxTests(TestCase):
+    def setUp(self):
+        self.messages = [enqueue_telegram_message('florist', 42, f'Заявка {i}') for i in range(2)]
+
+    def expire_leases(self):
+        TelegramMessage.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claims_are_leased(self):
+        claimed = claim_due_messages(10)
+        self.assertEqual([message.id for message in claimed], [message.id for message in self.messages])
+        self.assertEqual(claim_due_messages(10), [])
+        # A worker that died holding the claim gives the rows back once its lease runs out.
+        self.expire_leases()
+        reclaimed = claim_due_messages(10)
+        self.assertEqual(len(reclaimed), 2)
+        self.assertNotEqual(reclaimed[0].claim_token, claimed[0].claim_token)
+        ids = [message.id for message in reclaimed]
+        # The first worker finishing late must not touch rows it no longer holds.
+        mark_sent(ids, claimed[0].claim_token)
+        self.assertEqual(TelegramMessage.objects.filter(status='sending').count(), 2)
+        mark_sent(ids, reclaimed[0].claim_token)
+        self.expire_leases()
+        self.assertEqual(claim_due_messages(10), [])
+        self.assertEqual(set(TelegramMessage.objects.values_list('status', 'attempts')), {('sent', 1)})
+
+    @override_settings(TELEGRAM_MAX_ATTEMPTS=2)
+    def test_failed_sends_back_off_then_give_up(self):
+        with mock.patch('core.notifications.post_message', return_value=(False, None, '400: Bad Request')) as post:
+            [digest] = coalesce(claim_due_messages(10))
+            self.assertFalse(deliver(digest, RateLimiter()))
+            self.assertEqual(claim_due_messages(10), [])
+            self.expire_leases()
+            [digest] = coalesce(claim_due_messages(10))
+            self.assertFalse(deliver(digest, RateLimiter()))
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(
+            set(TelegramMessage.objects.values_list('status', 'attempts', 'last_error')),
+            {('failed', 2, '400: Bad Request')},
+        )
+
+
+    def test_connection_errors_do_not_store_the_token(self):
+        error = requests.ConnectionError('Max retries exceeded with url: /bot123456:SECRET/sendMessage')
+        with mock.patch('core.notifications.get_session') as get_session:
+            get_session.return_value.post.side_effect = error
+            ok, _, message = post_message('123456:SECRET', 42, 'Заявка')
+        self.assertFalse(ok)
+        self.assertEqual(message, 'ConnectionError: Max retries exceeded with url: /bot<token>/sendMessage')
+
+
+class TelegramRateLimitTests(TestCase):
+    def test_coalesce_groups_by_chat_within_limit(self):
+        messages = [
+            enqueue_telegram_message('florist', 1, 'а' * 10),
+            enqueue_telegram_message('florist', 2, 'б' * 10),
+            enqueue_telegram_message('florist', 1, 'в' * 10),
+            enqueue_telegram_message('courier', 1, 'г' * 10),
+            enqueue_telegram_message('florist', 1, 'д' * 20),
+        ]
+        digests = coalesce(messages, limit=40)
+        self.assertEqual(
+            [(digest.bot, digest.chat_id, digest.ids) for digest in digests],
+            [
+                ('florist', '1', [messages[0].id, messages[2].id]),
+                ('florist', '2', [messages[1].id]),
+                ('courier', '1', [messages[3].id]),
+                ('florist', '1', [messages[4].id]),
+            ],
+        )
+        self.assertEqual(digests[0].text, 'а' * 10 + DIGEST_SEPARATOR + 'в' * 10)
+        self.assertLessEqual(max(len(digest.text) for digest in digests), 40)
+
+    def test_limiter_holds_chats_and_bots_to_their_rates(self):
+        limiter = RateLimiter(chat_rate=1, chat_burst=1, bot_rate=2)
+        self.assertEqual(limiter.reserve('token', 1), 0)
+        self.assertAlmostEqual(limiter.reserve('token', 1), 1, delta=0.1)
+        self.assertEqual(limiter.reserve('token', 2), 0)
+        # The bot's bucket of two is spent, whichever chat asks next.
+        self.assertAlmostEqual(limiter.reserve('token', 3), 0.5, delta=0.1)
+        self.assertEqual(limiter.reserve('other', 3), 0)
+        limiter.block('other', 3, 30)
+        self.assertAlmostEqual(limiter.reserve('other', 3), 30, delta=0.1)
+
+    def test_retry_after_header(self):
+        def retry_after(**headers):
+            return read_response(httpx.Response(429, headers=headers, text='Too Many Requests'))[1]
+
+        self.assertEqual(retry_after(), 1)
+        self.assertEqual(retry_after(**{'Retry-After': '17'}), 17)
+        self.assertEqual(retry_after(**{'Retry-After': 'soon'}), 1)
+        self.assertAlmostEqual(retry_after(**{'Retry-After': http_date(time.time() + 120)}), 120, delta=2)
+        self.assertEqual(
+            read_response(httpx.Response(429, json={'parameters': {'retry_after': 5}}))[:2], (False, 5)
+        )
+
+    @override_settings(TELEGRAM_BOT_TOKEN='token')
+    def test_schedule_releases_what_cannot_go_now(self):
+        for text in ['Первая', 'Вторая']:
+            enqueue_telegram_message('florist', 1, text)
+            enqueue_telegram_message('florist', 2, text)
+        digests = coalesce(claim_due_messages(10), limit=10)
+        ready = schedule(digests, RateLimiter(chat_rate=1, chat_burst=1, bot_rate=30))
+        self.assertEqual([(digest.chat_id, digest.text) for digest in ready], [('1', 'Первая'), ('2', 'Первая')])
+        self.assertEqual(
+            sorted(TelegramMessage.objects.filter(status='pending').values_list('chat_id', 'text')),
+            [('1', 'Вторая'), ('2', 'Вторая')],
+        )
+        self.assertFalse(TelegramMessage.objects.filter(status='pending', next_attempt_at__lte=timezone.now()).exists())
+
+
+class BouquetIndexTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wedding = Bouquet.objects.create(name='Свадебный', price=6000, occasion='Свадьба', budget='от 5000')
+            self.birthday = Bouquet.objects.create(
+                name='Праздничный', price=900, occasion='День рождения', budget='до 1000'
+            )
+
+    def test_choice_matches_occasion_and_budget(self):
+        self.assertEqual(bouquet_index.choice('Свадьба', 'от 5000'), self.wedding.id)
+        self.assertEqual(bouquet_index.choice('Свадьба', ANY_BUDGET), self.wedding.id)
+        self.assertIsNone(bouquet_index.choice('Свадьба', 'до 1000'))
+        self.assertEqual(bouquet_index.count(), 2)
+
+    def test_rebuilt_after_catalog_changes_commit(self):
+        self.assertIsNone(bouquet_index.choice('Без повода', '1000-5000'))
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Bouquet.objects.create(name='Просто так', price=2000)
+            # Until the commit other requests cannot see the row, so the index must not be rebuilt yet.
+            self.assertIsNone(bouquet_index.choice('Без повода', '1000-5000'))
+        self.assertEqual(bouquet_index.choice('Без повода', '1000-5000'), other.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertIsNone(bouquet_index.choice('Без повода', '1000-5000'))
+
+    def test_other_processes_notice_the_catalog_version(self):
+        self.assertEqual(bouquet_index.choice('День рождения', 'до 1000'), self.birthday.id)
+        # update() sends no signals: this process keeps its index until the
+        # version in the shared cache moves, as another process would see it.
+        Bouquet.objects.filter(id=self.birthday.id).update(budget='1000-5000')
+        self.assertEqual(bouquet_index.choice('День рождения', 'до 1000'), self.birthday.id)
+        bump_catalog_version()
+        self.assertIsNone(bouquet_index.choice('День рождения', 'до 1000'))
+        self.assertEqual(bouquet_index.choice('День рождения', '1000-5000'), self.birthday.id)
+
+    @override_settings(BOUQUET_INDEX_TTL=0)
+    def test_ttl_bounds_staleness_without_a_shared_cache(self):
+        self.assertEqual(bouquet_index.choice('День рождения', 'до 1000'), self.birthday.id)
+        Bouquet.objects.filter(id=self.birthday.id).update(budget='1000-5000')
+        self.assertIsNone(bouquet_index.choice('День рождения', 'до 1000'))
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        bouquets = Bouquet.objects.bulk_create(Bouquet(name=f'Букет {i}', price=1000 + i) for i in range(6))
+        bouquet_index.invalidate()
+        self.ids = [bouquet.id for bouquet in bouquets]
+
+    def test_sample_is_distinct_and_skips_recent_ids(self):
+        for _ in range(20):
+            picked = pick_sample(self.ids, 3, exclude=self.ids[:2])
+            self.assertEqual(len(set(picked)), 3)
+            self.assertFalse(set(picked) & set(self.ids[:2]))
+        # Only three ids can be skipped, so the three most recently shown are.
+        self.assertEqual(
+            set(pick_sample(self.ids, 3, exclude=self.ids[:5])), {self.ids[0], self.ids[1], self.ids[5]}
+        )
+        self.assertEqual(set(pick_sample(self.ids[:2], 3, exclude=self.ids)), set(self.ids[:2]))
+
+    @override_settings(RECOMMENDATIONS_NO_REPEAT=True, RECOMMENDATIONS_COUNT=3)
+    def test_home_page_does_not_repeat_recent_bouquets(self):
+        shown = []
+        for _ in range(2):
+            response = self.client.get(reverse('index'))
+            shown += [bouquet.id for bouquet in response.context['recommended_bouquets']]
+        self.assertEqual(sorted(shown), self.ids)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        # Repeated prices, so the id has to break ties between pages.
+        Bouquet.objects.bulk_create(Bouquet(name=f'Букет {i}', price=1000 + i // 3 * 100) for i in range(8))
+        self.expected = list(Bouquet.objects.order_by('price', 'id').values_list('id', flat=True))
+        self.paginator = KeysetPaginator(Bouquet.objects.all(), 3, ('price', 'id'))
+
+    def test_walks_forward_and_back(self):
+        pages = [self.paginator.get_page()]
+        self.assertFalse(pages[0].has_previous())
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([[bouquet.id for bouquet in page] for page in pages], [
+            self.expected[:3], self.expected[3:6], self.expected[6:],
+        ])
+        previous = self.paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual([bouquet.id for bouquet in previous], self.expected[3:6])
+        first = self.paginator.get_page(previous.previous_cursor)
+        self.assertEqual([bouquet.id for bouquet in first], self.expected[:3])
+        self.assertFalse(first.has_previous())
+        self.assertEqual([bouquet.id for bouquet in self.paginator.get_page(first.next_cursor)], self.expected[3:6])
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        cursor = self.paginator.get_page().next_cursor
+        by_name = KeysetPaginator(Bouquet.objects.all(), 3, ('name', 'id'))
+        for bad in [cursor[:-2] + 'xx', 'garbage', by_name.get_page().next_cursor]:
+            page = self.paginator.get_page(bad)
+            self.assertEqual([bouquet.id for bouquet in page], self.expected[:3])
+        self.assertEqual(self.paginator.decode(cursor)[0], 'next')
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bouquet = Bouquet.objects.create(name='Букет с розами', price=1200)
+
+    def hits(self):
+        return {stats['name']: stats['hits'] for stats in get_fragment_stats()}['catalog_page']
+
+    def test_key_follows_the_catalog_version(self):
+        key = make_key('bouquet_card', self.bouquet.id)
+        self.assertEqual(make_key('bouquet_card', self.bouquet.id), key)
+        self.assertNotEqual(make_key('bouquet_card', self.bouquet.id + 1), key)
+        self.assertContains(self.client.get(reverse('card', args=[self.bouquet.id])), 'Букет с розами')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bouquet.name = 'Букет с пионами'
+            self.bouquet.save()
+        self.assertNotEqual(make_key('bouquet_card', self.bouquet.id), key)
+        self.assertContains(self.client.get(reverse('card', args=[self.bouquet.id])), 'Букет с пионами')
+
+    @override_settings(CATALOG_PAGINATION='offset')
+    def test_junk_page_numbers_share_an_entry(self):
+        hits = self.hits()
+        for page in ['1', 'abc', '999', '-1']:
+            self.assertContains(self.client.get(reverse('catalog'), {'page': page}), 'Букет с розами')
+        self.assertEqual(self.hits(), hits + 3)
+
+    @override_settings(CATALOG_PAGINATION='cursor')
+    def test_junk_cursors_share_an_entry(self):
+        hits = self.hits()
+        for cursor in ['', 'abc', 'def']:
+            self.assertContains(self.client.get(reverse('catalog'), {'cursor': cursor}), 'Букет с розами')
+        self.assertEqual(self.hits(), hits + 2)
+
+
+class CustomerUpsertTests(TestCase):
+    def test_repeat_consultation_reuses_customer(self):
+        for name in ('Анна', 'Анна Петровна'):
+            response = self.client.post(reverse('consultation'), {'name': name, 'phone': '+7 (999) 000 00 01'})
+            self.assertEqual(response.status_code, 302)
+        customer = Customer.objects.get()
+        self.assertEqual(customer.first_name, 'Анна Петровна')
+        self.assertEqual(customer.phone_key, '+79990000001')
+        self.assertEqual(Consultation.objects.filter(customer=customer).count(), 2)
+
+    def test_merge_duplicates(self):
+        customers = Customer.objects.bulk_create(
+            Customer(first_name=name, last_name=last_name, phone_number='+79990000001')
+            for name, last_name in [('Анна', 'Петрова'), ('Аня', ''), ('Анна', '')]
+        )
+        other = Customer.objects.create(first_name='Иван', phone_number='+79990000002')
+        bouquet = Bouquet.objects.create(name='Букет с розами', price=1200)
+        for customer in customers:
+            Order.objects.create(
+                customer=customer, bouquet=bouquet, delivery_address='ул. Жукова, 13', delivery_time='10:00-12:00'
+            )
+            Consultation.objects.create(customer=customer)
+
+        self.assertEqual(dedupe_customers(batch_size=2), (1, 2))
+
+        survivor = Customer.objects.get(phone_key='+79990000001')
+        self.assertEqual(survivor.id, customers[0].id)
+        self.assertEqual((survivor.first_name, survivor.last_name), ('Анна', 'Петрова'))
+        self.assertEqual(Customer.objects.count(), 2)
+        self.assertEqual(Order.objects.filter(customer=survivor).count(), 3)
+        self.assertEqual(Consultation.objects.filter(customer=survivor).count(), 3)
+        self.assertEqual(
+            list(DailyCustomerStats.objects.values_list('customer', 'orders_count')), [(survivor.id, 3)]
+        )
+        self.assertTrue(Customer.objects.filter(id=other.id).exists())
+
+
+class FloristAssignmentTests(TransactionTestCase):
+    # Enough retries that the unconditional fallback, which may overshoot
+    # the balance, never runs.
+    @override_settings(FLORIST_ASSIGN_ATTEMPTS=1000)
+    def test_concurrent_assignments_stay_balanced(self):
+        Florist.objects.bulk_create(Florist(name=f'Флорист {i}') for i in range(3))
+        workers, calls = 6, 10
+        barrier = threading.Barrier(workers)
+        errors = []
+
+        def assign():
+            try:
+                barrier.wait()
+                for _ in range(calls):
+                    assign_florist()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=assign) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        loads = sorted(Florist.objects.values_list('consultation_load', flat=True))
+        self.assertEqual(sum(loads), workers * calls)
+        self.assertLessEqual(loads[-1] - loads[0], 1)
+
+
+class DeliverySlotTests(TestCase):
+    def setUp(self):
+        self.first = Courier.objects.create(name='Первый', slot_capacity=2)
+        self.second = Courier.objects.create(name='Второй', slot_capacity=2)
+        self.slot = get_delivery_slot(date.today() + timedelta(days=1), datetime_time(10), datetime_time(12))
+        self.customer = Customer.objects.create(first_name='Анна', phone_number='+79990000001')
+        self.bouquet = Bouquet.objects.create(name='Букет с розами', price=1200)
+
+    def create_order(self):
+        return Order.objects.create(
+            customer=self.customer,
+            bouquet=self.bouquet,
+            courier=dispatch_courier(self.slot),
+            delivery_address='ул. Жукова, 13',
+            delivery_time='10:00-12:00',
+            delivery_slot=self.slot,
+        )
+
+    def booked(self):
+        return dict(CourierSlot.objects.filter(slot=self.slot).values_list('courier__name', 'booked'))
+
+    def test_dispatch_fills_the_least_loaded_courier_until_full(self):
+        orders = [self.create_order() for _ in range(4)]
+        self.assertEqual([order.courier for order in orders], [self.first, self.second, self.first, self.second])
+        with self.assertRaises(SlotFull):
+            dispatch_courier(self.slot)
+        orders[0].delete()
+        self.assertEqual(self.booked(), {'Первый': 1, 'Второй': 2})
+        self.assertEqual(dispatch_courier(self.slot), self.first)
+        empty = DeliverySlot.objects.create(
+            date=self.slot.date, start_time=datetime_time(18), end_time=datetime_time(20)
+        )
+        self.assertIsNone(dispatch_courier(empty))
+
+    def test_parse_delivery_time(self):
+        evening = timezone.make_aware(datetime(2026, 10, 18, 19, 30))
+        tomorrow = date(2026, 10, 19)
+        self.assertEqual(parse_delivery_time('с 10:00 до 12:00', evening), None)
+        self.assertEqual(parse_delivery_time('10:00-12:00', evening), (tomorrow, datetime_time(10), datetime_time(12)))
+        self.assertEqual(
+            parse_delivery_time('19.00 – 21.00', evening), (evening.date(), datetime_time(19), datetime_time(21))
+        )
+        self.assertEqual(
+            parse_delivery_time('Как можно скорее', evening), (evening.date(), datetime_time(18), datetime_time(20))
+        )
+        self.assertEqual(
+            parse_delivery_time('как можно скорее', evening + timedelta(hours=1)),
+            (tomorrow, datetime_time(10), datetime_time(12)),
+        )
+        self.assertIsNone(parse_delivery_time('12:00-10:00', evening))
+
+    def test_admin_reassignment_moves_the_booking(self):
+        order = self.create_order()
+        self.assertEqual(self.booked(), {'Первый': 1, 'Второй': 0})
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        self.client.post('/admin/core/order/', {
+            'action': 'assign_courier', '_selected_action': [order.id], 'courier': self.second.id,
+        })
+        order.refresh_from_db()
+        self.assertEqual(order.courier, self.second)
+        self.assertEqual(self.booked(), {'Первый': 0, 'Второй': 1})
+
+    def test_rebuild_courier_load(self):
+        self.create_order()
+        CourierSlot.objects.update(booked=2)
+        self.assertEqual(rebuild_courier_load(), 2)
+        self.assertEqual(self.booked(), {'Первый': 1, 'Второй': 0})
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name='Анна', phone_number='+79990000001')
+        self.roses = Bouquet.objects.create(name='Букет с розами', price=1200)
+        self.peonies = Bouquet.objects.create(name='Пионы', price=2500)
+        self.courier = Courier.objects.create(name='Курьер')
+
+    def create_order(self, bouquet, courier=None):
+        return Order.objects.create(
+            customer=self.customer,
+            bouquet=bouquet,
+            courier=courier,
+            delivery_address='ул. Жукова, 13',
+            delivery_time='10:00-12:00',
+        )
+
+    def totals(self):
+        return (
+            {row['bouquet__name']: row['count'] for row in rollups.orders_by_bouquet()},
+            [row['count'] for row in rollups.orders_by_customer()],
+            {row['courier__name']: row['count'] for row in rollups.orders_by_courier()},
+        )
+
+    def test_orders_are_recorded_and_forgotten(self):
+        self.create_order(self.roses, self.courier)
+        second = self.create_order(self.roses)
+        self.create_order(self.peonies)
+        self.assertEqual(self.totals(), ({'Букет с розами': 2, 'Пионы': 1}, [3], {'Курьер': 1}))
+        second.delete()
+        self.assertEqual(self.totals(), ({'Букет с розами': 1, 'Пионы': 1}, [2], {'Курьер': 1}))
+
+    def test_reassignments_move_the_counts(self):
+        order = self.create_order(self.roses, self.courier)
+        reassign_courier(order, Courier.objects.create(name='Другой курьер'))
+        self.assertEqual(self.totals()[2], {'Другой курьер': 1})
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        response = self.client.post(f'/admin/core/order/{order.id}/change/', {
+            'customer': self.customer.id,
+            'bouquet': self.peonies.id,
+            'courier': self.courier.id,
+            'delivery_address': order.delivery_address,
+            'delivery_time': order.delivery_time,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(), ({'Пионы': 1}, [1], {'Курьер': 1}))
+
+    def test_rebuild_restores_a_date_range(self):
+        old = self.create_order(self.roses, self.courier)
+        # update() bypasses the signals, so the rollups have to be rebuilt to match.
+        Order.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=10))
+        self.create_order(self.peonies)
+        self.assertEqual(rollups.rebuild_rollups(), 5)
+        DailyBouquetStats.objects.update(orders_count=99)
+        today = timezone.localdate()
+        rollups.rebuild_rollups(start=today, end=today)
+        self.assertEqual(self.totals()[0], {'Букет с розами': 99, 'Пионы': 1})
+        rollups.rebuild_rollups(start=today - timedelta(days=10))
+        self.assertEqual(self.totals(), ({'Пионы': 1, 'Букет с розами': 1}, [2], {'Курьер': 1}))
+        self.assertEqual(
+            [(row['date'], row['count']) for row in rollups.orders_by_date()],
+            [(today - timedelta(days=10), 1), (today, 1)],
+        )
+
+
+class PaymentGatewayTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeYooKassaServer(('127.0.0.1', 0), latency=0, jitter=0, hang=1)
+        cls.server.start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        self.server.failure_rate = self.server.hang_rate = 0
+        override = override_settings(
+            PAYMENT_BACKEND='core.payments.YooKassaGateway',
+            YOOKASSA_API_URL=self.server.url,
+            YOOKASSA_SHOP_ID='shop',
+            YOOKASSA_SECRET_KEY='secret',
+            PAYMENT_TIMEOUT=(1, 0.2),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def create_payment(self):
+        return get_payment_gateway().create_payment(1200, 'Заказ 1', 'http://testserver/', idempotence_key='key')
+
+    def test_settings_reach_the_gateway(self):
+        self.assertEqual(get_payment_gateway().api_url, self.server.url)
+        payment = self.create_payment()
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(self.create_payment().id, payment.id)
+
+    def test_errors_become_payment_errors(self):
+        self.server.failure_rate = 1
+        with self.assertRaisesMessage(PaymentError, '500'):
+            self.create_payment()
+        self.server.failure_rate, self.server.hang_rate = 0, 1
+        started = time.monotonic()
+        with self.assertRaises(PaymentError):
+            self.create_payment()
+        self.assertLess(time.monotonic() - started, 0.9)
+        with override_settings(YOOKASSA_SECRET_KEY=None), self.assertRaisesMessage(PaymentError, 'YOOKASSA_SHOP_ID'):
+            self.create_payment()
+        with override_settings(YOOKASSA_API_URL='http://127.0.0.1:9/v3'), self.assertRaises(PaymentError):
+            self.create_payment()
+
+    async def test_async_errors_become_payment_errors(self):
+        gateway = YooKassaGateway()
+        self.server.failure_rate = 1
+        with self.assertRaisesMessage(PaymentError, '500'):
+            await gateway.acreate_payment(1200, 'Заказ 1', 'http://testserver/')
+        self.server.failure_rate, self.server.hang_rate = 0, 1
+        with self.assertRaises(PaymentError):
+            await gateway.acreate_payment(1200, 'Заказ 1', 'http://testserver/')
+        await gateway.aclose()
+
+
+class QueryPlanTests(TestCase):
+    def test_critical_queries_use_indexes(self):
+        call_command('check_query_plans', stdout=io.StringIO())
+
+
+class GenerateFakeDataTests(TestCase):
+    def test_generates_consistent_data(self):
+        call_command(
+            'generate_fake_data', bouquets=20, customers=50, couriers=2, florists=2,
+            orders=200, consultations=30, paid=1, stdout=io.StringIO(),
+        )
+        self.assertEqual(Bouquet.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 200)
+        self.assertEqual(Payment.objects.count(), 200)
+        self.assertEqual(Consultation.objects.count(), 30)
+        self.assertEqual(
+            DailyBouquetStats.objects.aggregate(total=models.Sum('orders_count'))['total'], 200
+        )
+        self.assertEqual(Customer.objects.filter(phone_key__isnull=True).count(), 0)
+        self.assertGreater(Order.objects.dates('created_at', 'day').count(), 1)
+        self.assertFalse(Payment.objects.exclude(created_at=models.F('order__created_at')).exists())
+
+
+class BouquetImportTests(TestCase):
+    def test_csv_upsert_with_row_errors(self):
+        Bouquet.objects.create(name='Букет с розами', price=1200, description='Старое описание')
+        stream = io.StringIO(
+            'name,price,occasion,budget\n'
+            'Букет с розами,1500,Свадьба,до 1000\n'
+            'Тюльпаны,900,Праздник,до 1000\n'
+            'Пионы,0,Без повода,от 5000\n'
+            'Ромашки,700,Без повода,\n'
+        )
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_bouquets(stream, batch_size=2)
+        self.assertEqual((result.rows, result.created, result.updated), (4, 1, 1))
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        roses = Bouquet.objects.get(name='Букет с розами')
+        self.assertEqual((roses.price, roses.occasion, roses.description), (1500, 'Свадьба', 'Старое описание'))
+        self.assertEqual(Bouquet.objects.get(name='Ромашки').budget, '1000-5000')
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_jsonl_round_trip(self):
+        Bouquet.objects.create(name='Букет с розами', price=1200, occasion='Свадьба', budget='до 1000')
+        exported = b''.join(iter_export('jsonl')).decode()
+        Bouquet.objects.all().delete()
+        result = import_bouquets(io.StringIO(exported + '{"name": \n'), format='jsonl')
+        self.assertEqual((result.created, len(result.errors)), (1, 1))
+        bouquet = Bouquet.objects.get()
+        self.assertEqual((bouquet.price, bouquet.occasion, bouquet.budget), (1200, 'Свадьба', 'до 1000'))
+
+    def test_jsonl_rows_update_only_their_keys(self):
+        Bouquet.objects.create(name='Букет с розами', price=1200, description='Старое описание')
+        Bouquet.objects.create(name='Тюльпаны', price=900, description='Весенний букет')
+        stream = io.StringIO(
+            '{"name": "Букет с розами", "price": 1500}\n'
+            '{"name": "Тюльпаны", "description": "Новое описание"}\n'
+            '{"price": 700}\n'
+            '{"name": "Букет с розами", "description": "Розы и зелень"}\n'
+        )
+        result = import_bouquets(stream, format='jsonl')
+        self.assertEqual((result.updated, result.errors), (3, [(3, 'нет поля name')]))
+        roses = Bouquet.objects.get(name='Букет с розами')
+        self.assertEqual((roses.price, roses.description), (1500, 'Розы и зелень'))
+        tulips = Bouquet.objects.get(name='Тюльпаны')
+        self.assertEqual((tulips.price, tulips.description), (900, 'Новое описание'))
+
+    def test_command_strips_bom_from_stdin(self):
+        stdin = io.TextIOWrapper(io.BytesIO('\ufeffname,price\nТюльпаны,900\n'.encode()), encoding='utf-8')
+        with mock.patch('sys.stdin', stdin):
+            call_command('import_bouquets', '-', stdout=io.StringIO())
+        self.assertEqual(Bouquet.objects.get().price, 900)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.roses = Bouquet.objects.create(name='Букет из роз', price=1200, composition='Розы, зелень')
+        self.peonies = Bouquet.objects.create(
+            name='Пионы', price=2500, composition='Пионы', description='Нежный букет с пионами и розами'
+        )
+        Bouquet.objects.create(name='Тюльпаны', price=900, composition='Тюльпаны, ирисы')
+
+    def test_stemmed_and_ranked(self):
+        self.assertEqual(search_bouquets('розами', 10), [self.roses.id, self.peonies.id])
+        self.assertEqual(search_bouquets('пион с розой', 10), [self.peonies.id])
+        self.assertEqual(search_bouquets('" OR *', 10), [])
+
+    def test_index_follows_saves_and_imports(self):
+        self.roses.composition = 'Ромашки'
+        self.roses.name = 'Полевой букет'
+        self.roses.save()
+        self.peonies.delete()
+        self.assertEqual(search_bouquets('роза', 10), [])
+        import_bouquets(io.StringIO('name,price,composition\nБелые розы,1500,Розы\n'))
+        self.assertEqual(search_bouquets('ромашками', 10), [self.roses.id])
+        self.assertEqual(search_bouquets('розы', 10), [Bouquet.objects.get(name='Белые розы').id])
+
+    @override_settings(SEARCH_RANK_CANDIDATES=2)
+    def test_name_matches_survive_the_candidate_cut(self):
+        for number in range(3):
+            Bouquet.objects.create(name=f'Букет {number}', price=1000, description='С одной розой')
+        self.assertEqual(search_bouquets('роза', 1), [self.roses.id])
+
+    def test_search_page_and_admin(self):
+        self.assertContains(self.client.get(reverse('search'), {'q': 'ирис'}), 'Тюльпаны')
+        response = self.client.post(
+            f"{reverse('search')}?q=пионы", {'name': 'Анна', 'phone': '+79991234567'}
+        )
+        self.assertRedirects(response, f"{reverse('search')}?q=%D0%BF%D0%B8%D0%BE%D0%BD%D1%8B")
+        response = self.client.post(f"{reverse('search')}?q=пионы", {'name': 'Анна', 'phone': '123'})
+        self.assertContains(response, 'value="Анна"')
+        self.assertContains(response, response.context['consultation_form'].errors['phone'][0])
+        self.client.force_login(User.objects.create_superuser('admin', password='password'))
+        response = self.client.get('/admin/core/bouquet/', {'q': 'розами'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name, BOUQUET_IMAGE_WIDTHS=[160, 320, 640])
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media.name
+
+    def upload(self, width, height, mode='RGB', format='JPEG', color=0):
+        buffer = io.BytesIO()
+        Image.new(mode, (width, height), color).save(buffer, format)
+        return SimpleUploadedFile(f'rose.{format.lower()}', buffer.getvalue())
+
+    def test_upload_generates_derivatives(self):
+        bouquet = Bouquet.objects.create(name='Букет с розами', price=1200, image=self.upload(500, 250, 'RGBA', 'PNG'))
+        bouquet.refresh_from_db()
+        self.assertEqual(bouquet.image_widths, [160, 320, 500])
+        with Image.open(os.path.join(self.media_root, 'bouquets/derivatives/rose.png-320w.webp')) as image:
+            self.assertEqual(image.size, (320, 160))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'bouquets/derivatives/rose.png-500w.jpg')))
+
+        bouquet.price = 1300
+        bouquet.save()
+        bouquet.refresh_from_db()
+        self.assertEqual(bouquet.image_widths, [160, 320, 500])
+
+        html = Template("{% load bouquet_images %}{% bouquet_picture bouquet 'card__img' '602px' %}").render(
+            Context({'bouquet': bouquet})
+        )
+        self.assertIn('rose.png-160w.webp 160w, /media/bouquets/derivatives/rose.png-320w.webp 320w', html)
+        self.assertIn('src="/media/bouquets/derivatives/rose.png-500w.jpg"', html)
+
+    def test_same_stem_keeps_separate_derivatives(self):
+        Bouquet.objects.create(name='Красные розы', price=1200, image=self.upload(200, 100, color=(255, 0, 0)))
+        Bouquet.objects.create(name='Синие розы', price=1200, image=self.upload(200, 100, format='PNG', color=(0, 0, 255)))
+        derivatives = os.path.join(self.media_root, 'bouquets/derivatives')
+        with Image.open(os.path.join(derivatives, 'rose.jpeg-160w.jpg')) as red, \
+                Image.open(os.path.join(derivatives, 'rose.png-160w.jpg')) as blue:
+            self.assertGreater(red.getpixel((80, 50))[0], 200)
+            self.assertGreater(blue.getpixel((80, 50))[2], 200)
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.static_root.cleanup)
+        cls.override = override_settings(
+            STATIC_ROOT=cls.static_root.name,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'core.static_files.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        cls.override.enable()
+        cls.addClassCleanup(cls.override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+
+    def get_css(self, **headers):
+        return self.client.get(static('css/main.css'), headers=headers)
+
+    def test_negotiates_precompressed_variant(self):
+        url = static('css/main.css')
+        self.assertRegex(url, r'^/static/css/main\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.static_root.name, url[len('/static/'):]), 'rb') as f:
+            original = f.read()
+
+        response = self.get_css(accept_encoding='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css')
+
+        response = self.get_css(accept_encoding='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original)
+
+        response = self.get_css()
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), original)
+
+    def test_conditional_request(self):
+        etag = self.get_css(accept_encoding='gzip')['ETag']
+        self.assertEqual(self.get_css(accept_encoding='gzip', if_none_match=etag).status_code, 304)
+
+    def test_unhashed_name_is_revalidated(self):
+        response = self.client.get('/static/css/main.css')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_index_preloads_critical_assets(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(
+            response['Link'],
+            f"<{static('css/main.css')}>; rel=preload; as=style, <{static('img/mainBg.jpg')}>; rel=preload; as=image",
+        )
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='token', TELEGRAM_FLORIST_CHAT_ID='42')
+class SignedQuizStateTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bouquet = Bouquet.objects.create(
+                name='Букет с розами', price=1200, occasion='Свадьба', budget='от 5000'
+            )
+
+    def test_quiz_answers_reach_florist_without_session(self):
+        self.client.post(reverse('quiz'), {'occasion': 'Свадьба'})
+        response = self.client.post(reverse('quiz_step'), {'budget': 'от 5000'})
+        self.assertRedirects(response, reverse('result', args=[self.bouquet.id]))
+        response = self.client.post(
+            reverse('result', args=[self.bouquet.id]), {'name': 'Анна', 'phone': '+79991234567'}
+        )
+        self.assertEqual(response.cookies['quiz']['max-age'], 0)
+        text = TelegramMessage.objects.get().text
+        self.assertIn('Повод: Свадьба', text)
+        self.assertIn('Бюджет: от 5000', text)
+        self.assertFalse(Session.objects.exists())
+
+    def test_forged_state_is_ignored(self):
+        self.client.cookies['quiz'] = 'eyJvY2Nhc2lvbiI6ItCh0LLQsNC00YzQsdCwIn0:forged'
+        response = self.client.post(reverse('quiz_step'), {'budget': 'от 5000'})
+        # The payload names a matching occasion, so only the bad signature
+        # keeps the visitor on the budget step.
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'quiz-step.html')
+        self.assertNotIn('error', response.context)
+        self.assertNotIn('quiz', response.cookies)
+
+
+class OrderTransactionTests(TestCase):
+    def test_full_slot_rolls_back_customer(self):
+        bouquet = Bouquet.objects.create(name='Букет с розами', price=1200)
+        Courier.objects.create(name='Курьер', slot_capacity=0)
+        response = self.client.post(reverse('order', args=[bouquet.id]), {
+            'first_name': 'Анна',
+            'phone_number': '+79991234567',
+            'delivery_address': 'ул. Пушкинская, 69',
+            'delivery_time': '10:00-12:00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Customer.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_MAX_LAG=30)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        mark_replica_synced('replica1', get_catalog_version())
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse(ReplicaRouter().db_for_read(Bouquet)))
+
+    def test_safe_request_reads_from_fresh_replica(self):
+        self.assertEqual(self.middleware(self.factory.get('/catalog/')).content, b'replica1')
+
+    def test_stale_replica_is_skipped(self):
+        bump_catalog_version()
+        self.assertEqual(self.middleware(self.factory.get('/catalog/')).content, b'default')
+
+    def test_lagging_replica_is_skipped(self):
+        mark_replica_synced('replica1', get_catalog_version(), synced_at=time.time() - 31)
+        self.assertEqual(self.middleware(self.factory.get('/catalog/')).content, b'default')
+
+    def test_payment_pages_read_from_primary(self):
+        for path in ['/order_complete/1/', '/admin/core/payment/']:
+            self.assertEqual(self.middleware(self.factory.get(path)).content, b'default')
+
+    def test_reads_stick_to_primary_after_post(self):
+        response = self.middleware(self.factory.post('/order/1/'))
+        self.assertEqual(response.content, b'default')
+        request = self.factory.get('/order_complete/1/')
+        request.COOKIES['primary'] = response.cookies['primary'].value
+        self.assertEqual(self.middleware(request).content, b'default')
+
+
+@override_settings(ROOT_URLCONF='core.async_urls', PAYMENT_BACKEND='core.payments.DummyGateway')
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bouquet = Bouquet.objects.create(
+                name='Букет с розами', price=1200, occasion='Свадьба', budget='от 5000'
+            )
+
+    async def test_pages(self):
+        for url in [
+            '/', '/catalog/', '/catalog/?cursor=', f'/card/{self.bouquet.id}/', f'/result/{self.bouquet.id}/',
+            '/search/?q=розы',
+        ]:
+            response = await self.async_client.get(url)
+            self.assertContains(response, 'Букет с розами')
+
+    async def test_quiz(self):
+        await self.async_client.post('/quiz/', {'occasion': 'Свадьба'})
+        response = await self.async_client.post('/quiz/step/', {'budget': 'от 5000'})
+        self.assertRedirects(response, f'/result/{self.bouquet.id}/', fetch_redirect_response=False)
+
+    async def test_order(self):
+        response = await self.async_client.post(f'/order/{self.bouquet.id}/', {
+            'first_name': 'Анна',
+            'phone_number': '+79991234567',
+            'delivery_address': 'ул. Пушкинская, 69',
+            'delivery_time': '10:00-12:00',
+        })
+        payment = await Payment.objects.select_related('order').aget()
+        self.assertEqual(payment.amount, 1200)
+        self.assertRedirects(
+            response, f'http://testserver/order_complete/{payment.order.id}/', fetch_redirect_response=False
+        )
+
+    async def test_lifespan_shutdown_closes_payment_clients(self):
+        gateway = YooKassaGateway()
+        client = gateway.get_async_client()
+        events = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(events)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        with mock.patch('core.lifespan.get_payment_gateway', return_value=gateway):
+            await Lifespan(None)({'type': 'lifespan'}, receive, send)
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertTrue(client.is_closed)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Bouquet.objects.create(name='Букет с розами', price=1200)
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('catalog'))
+        metrics = {part.split(';')[0] for part in response['Server-Timing'].split(', ')}
+        self.assertEqual(metrics, {'db', 'tpl', 'total'})
+
+    def test_server_timing_is_off_by_default(self):
+        response = self.client.get(reverse('catalog'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_queries(self):
+        with self.assertLogs('core.perf', 'WARNING') as logs:
+            self.client.get(reverse('catalog'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'catalog')
+        self.assertEqual(entry['db_count'], len(entry['queries']))
+        self.assertIn('core_bouquet', ' '.join(query['sql'] for query in entry['queries']))
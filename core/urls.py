@@ -1,18 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('quiz/', views.quiz, name='quiz'),
-    path('quiz/step/', views.quiz_step, name='quiz_step'),
-    path('result/<int:bouquet_id>/', views.result, name='result'),
-    path('catalog/', views.catalog, name='catalog'),
-    path('card/<int:bouquet_id>/', views.card, name='card'),
-    path('consultation/', views.consultation, name='consultation'),
-    path('order/<int:bouquet_id>/', views.order, name='order'),
-    path('order_complete/<int:order_id>/', views.order_complete, name='order_complete'),
-    path('webhook/yookassa/', views.webhook_yookassa, name='webhook_yookassa'),
-    path('stats/', views.stats, name='stats'),
-    path('stats/download/', views.stats_download, name='stats_download'),
-]
\ No newline at end of file
+def get_urlpatterns(public):
+    return [
+        path('', public.index, name='index'),
+        path('quiz/', public.quiz, name='quiz'),
+        path('quiz/step/', public.quiz_step, name='quiz_step'),
+        path('result/<int:bouquet_id>/', public.result, name='result'),
+        path('catalog/', public.catalog, name='catalog'),
+        path('card/<int:bouquet_id>/', public.card, name='card'),
+        path('search/', public.search, name='search'),
+        path('consultation/', public.consultation, name='consultation'),
+        path('order/<int:bouquet_id>/', public.order, name='order'),
+        path('order_complete/<int:order_id>/', public.order_complete, name='order_complete'),
+        path('webhook/yookassa/', public.webhook_yookassa, name='webhook_yookassa'),
+        path('stats/', views.stats, name='stats'),
+        path('stats/download/', views.stats_download, name='stats_download'),
+    ]
+
+
+# Under ASGI the public pages are served by the async views (see asgi.py).
+urlpatterns = get_urlpatterns(async_views if settings.ASYNC_VIEWS else views)
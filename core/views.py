@@ -1,154 +1,186 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.conf import settings
-from django.db.models import Count
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+
+from .models import Bouquet, Consultation, Order, Payment
+from .forms import ConsultationForm, CustomerForm, OrderForm, StatsFilterForm
+from . import rollups
+from .notifications import enqueue_telegram_message
+from .bouquet_index import bouquet_index
+from .pagination import KeysetPaginator
+from .fragment_cache import get_fragment_stats
+from .assignment import assign_florist
+from .customers import upsert_customer
+from .db_router import use_primary
+from .delivery import SlotFull, dispatch_courier, get_delivery_slot
+from .exports import iter_csv, iter_gzip
+from .payment_events import record_event
+from .payments import PaymentError, get_payment_gateway
+from .search import search_bouquets
+from .signed_state import QUIZ_COOKIE, SEEN_COOKIE, clear_state, read_state, write_state
+from .static_files import preload_header
 
-from yookassa import Configuration, Payment as YooPayment
-from .models import Bouquet, Consultation, Customer, Order, Courier, Florist, Payment
-from .forms import ConsultationForm, CustomerForm, OrderForm
-
-import random
-import requests
-import uuid
 import json
-from requests.exceptions import RequestException
 from json.decoder import JSONDecodeError
-import csv
-from io import StringIO
-import codecs
-
-def send_telegram_message(chat_id, message):
-    url = (
-        f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-    )
-    payload = {
-        'chat_id': chat_id,
-        'text': message,
-        'parse_mode': 'HTML'
-    }
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-    except RequestException:
-        pass
-
-def send_courier_telegram_message(chat_id, message):
-    url = (
-        f"https://api.telegram.org/bot"
-        f"{settings.TELEGRAM_COURIER_BOT_TOKEN}/sendMessage"
-    )
-    payload = {
-        'chat_id': str(chat_id),
-        'text': message,
-        'parse_mode': 'HTML'
-    }
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-    except RequestException:
-        pass
 
 def handle_consultation_submission(request, redirect_name, *args, **kwargs):
     form = ConsultationForm(request.POST if request.method == 'POST' else None)
     if request.method == 'POST' and form.is_valid():
-        customer = Customer.objects.create(
-            first_name=form.cleaned_data['name'],
-            phone_number=form.cleaned_data['phone']
-        )
-        florists = Florist.objects.annotate(consultation_count=Count('consultation')).order_by('consultation_count')
-        assigned_florist = florists.first() if florists.exists() else None
-        consultation = Consultation.objects.create(customer=customer, florist=assigned_florist)  
-
-        occasion = request.session.get('occasion', 'Без повода')
-        budget = request.session.get('budget', '1000-5000')
-
-        message = (
-            f"<b>Новая заявка на консультацию:</b>\n"
-            f"Имя: {customer.first_name}\n"
-            f"Телефон: {customer.phone_number}\n"
-            f"<b>Результат опроса:</b>\n"
-            f"Повод: {occasion}\n"
-            f"Бюджет: {budget}"
-        )
-
-        florist_chat_id = assigned_florist.telegram_chat_id if assigned_florist and assigned_florist.telegram_chat_id else None
-        if florist_chat_id:
-            send_telegram_message(florist_chat_id, message)
-        elif settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_FLORIST_CHAT_ID:  
-            send_telegram_message(settings.TELEGRAM_FLORIST_CHAT_ID, message)
+        quiz_state = read_state(request, QUIZ_COOKIE, {})
+        occasion = quiz_state.get('occasion', 'Без повода')
+        budget = quiz_state.get('budget', '1000-5000')
+
+        with transaction.atomic():
+            customer = upsert_customer(
+                phone_number=form.cleaned_data['phone'],
+                first_name=form.cleaned_data['name'],
+            )
+            assigned_florist = assign_florist()
+            Consultation.objects.create(customer=customer, florist=assigned_florist)
+
+            message = (
+                f"<b>Новая заявка на консультацию:</b>\n"
+                f"Имя: {customer.first_name}\n"
+                f"Телефон: {customer.phone_number}\n"
+                f"<b>Результат опроса:</b>\n"
+                f"Повод: {occasion}\n"
+                f"Бюджет: {budget}"
+            )
 
-        request.session.pop('occasion', None)
-        request.session.pop('budget', None)
+            florist_chat_id = assigned_florist.telegram_chat_id if assigned_florist and assigned_florist.telegram_chat_id else None
+            if florist_chat_id:
+                enqueue_telegram_message('florist', florist_chat_id, message)
+            elif settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_FLORIST_CHAT_ID:
+                enqueue_telegram_message('florist', settings.TELEGRAM_FLORIST_CHAT_ID, message)
 
         messages.success(request, 'Заявка отправлена!')
-        return redirect(redirect_name, *args, **kwargs)
+        response = redirect(redirect_name, *args, **kwargs)
+        clear_state(response, QUIZ_COOKIE)
+        return response
     return form
 
 
+# The views below keep their reads in the view itself and leave the rest
+# to helpers that touch neither the database nor the cache, so the async
+# versions in async_views differ from them only in how they load data.
+def read_seen(request):
+    if settings.RECOMMENDATIONS_NO_REPEAT:
+        return read_state(request, SEEN_COOKIE, [])
+    return []
+
+
+def pick_recommended(seen, ids, bouquets):
+    """Return ``(bouquets, seen)``; ``seen`` is the new no-repeat list, or None when it is off."""
+    recommended = [bouquets[bouquet_id] for bouquet_id in ids if bouquet_id in bouquets]
+    if settings.RECOMMENDATIONS_NO_REPEAT:
+        return recommended, (seen + ids)[-settings.RECOMMENDATIONS_SEEN_LIMIT:]
+    return recommended, None
+
+
+def get_recommended_bouquets(request):
+    seen = read_seen(request)
+    ids = bouquet_index.sample(settings.RECOMMENDATIONS_COUNT, exclude=seen)
+    return pick_recommended(seen, ids, Bouquet.objects.in_bulk(ids))
+
+
+# main.css and the hero background it references are on the critical path
+# but the background is only discovered once the stylesheet has loaded.
+INDEX_PRELOAD = [('css/main.css', 'style'), ('img/mainBg.jpg', 'image')]
+
+
 def index(request):
-    recommended_bouquets = Bouquet.objects.order_by('?')[:3]
+    recommended_bouquets, seen = get_recommended_bouquets(request)
     form = handle_consultation_submission(request, 'index')
     if isinstance(form, HttpResponseRedirect):
         return form
-    return render(
+    return index_page(request, recommended_bouquets, seen, form)
+
+
+def index_page(request, recommended_bouquets, seen, form):
+    response = render(
         request,
         'index.html',
         {'recommended_bouquets': recommended_bouquets, 'consultation_form': form}
     )
+    response['Link'] = preload_header(INDEX_PRELOAD)
+    if seen is not None:
+        write_state(response, SEEN_COOKIE, seen)
+    return response
 
 
 def quiz(request):
-    occasions = Bouquet.OCCASIONS
     form = handle_consultation_submission(request, 'quiz')
     if isinstance(form, HttpResponseRedirect):
         return form
+    return quiz_page(request, form)
+
+
+def quiz_page(request, form):
     if request.method == 'POST':
         occasion = request.POST.get('occasion')
         if occasion:
-            request.session['occasion'] = occasion
-            return redirect('quiz_step')
+            response = redirect('quiz_step')
+            write_state(response, QUIZ_COOKIE, {'occasion': occasion})
+            return response
     return render(
         request,
         'quiz.html',
-        {'occasions': occasions, 'consultation_form': form}
+        {'occasions': Bouquet.OCCASIONS, 'consultation_form': form}
     )
 
 
+BUDGETS = [
+    ('до 1000', 'До 1 000 руб'),
+    ('1000-5000', '1 000 - 5 000 руб'),
+    ('от 5000', 'от 5 000 руб'),
+    ('не имеет значения', 'Не имеет значения'),
+]
+
+
+def read_quiz_answers(request):
+    """Return ``(occasion, budget)`` once a POST completes the quiz, else None."""
+    if request.method != 'POST':
+        return None
+    budget = request.POST.get('budget')
+    occasion = read_state(request, QUIZ_COOKIE, {}).get('occasion')
+    if budget and occasion:
+        return occasion, budget
+    return None
+
+
 def quiz_step(request):
-    budgets = [
-        ('до 1000', 'До 1 000 руб'),
-        ('1000-5000', '1 000 - 5 000 руб'),
-        ('от 5000', 'от 5 000 руб'),
-        ('не имеет значения', 'Не имеет значения'),
-    ]
     form = handle_consultation_submission(request, 'quiz_step')
     if isinstance(form, HttpResponseRedirect):
         return form
-    if request.method == 'POST':
-        budget = request.POST.get('budget')
-        occasion = request.session.get('occasion')
-        if budget and occasion:
-            request.session['budget'] = budget
-            bouquets = Bouquet.objects.filter(occasion=occasion)
-            if budget != 'не имеет значения':
-                bouquets = bouquets.filter(budget=budget)
-            if bouquets.exists():
-                bouquet = random.choice(bouquets)
-                return redirect('result', bouquet_id=bouquet.id)
-            return render(
-                request,
-                'quiz-step.html',
-                {'error': 'Нет подходящих букетов.', 'budgets': budgets, 'consultation_form': form}
-            )
+    answers = read_quiz_answers(request)
+    bouquet_id = bouquet_index.choice(*answers) if answers else None
+    return quiz_step_page(request, form, answers, bouquet_id)
+
+
+def quiz_step_page(request, form, answers, bouquet_id):
+    if bouquet_id:
+        occasion, budget = answers
+        response = redirect('result', bouquet_id=bouquet_id)
+        write_state(response, QUIZ_COOKIE, {'occasion': occasion, 'budget': budget})
+        return response
+    if answers:
+        return render(
+            request,
+            'quiz-step.html',
+            {'error': 'Нет подходящих букетов.', 'budgets': BUDGETS, 'consultation_form': form}
+        )
     return render(
         request,
         'quiz-step.html',
-        {'budgets': budgets, 'consultation_form': form}
+        {'budgets': BUDGETS, 'consultation_form': form}
     )
 
 
@@ -164,18 +196,60 @@ def result(request, bouquet_id):
     )
 
 
-def catalog(request):
+CATALOG_ORDERINGS = {
+    'price': ('price', 'id'),
+    'name': ('name', 'id'),
+}
+
+
+def use_cursor_pagination(request):
+    mode = settings.CATALOG_PAGINATION
+    if mode == 'auto':
+        return 'cursor' in request.GET or bouquet_index.count() > settings.CATALOG_CURSOR_THRESHOLD
+    return mode == 'cursor'
+
+
+def get_catalog_sort(request):
+    sort = request.GET.get('sort')
+    if sort not in CATALOG_ORDERINGS:
+        sort = 'price'
+    return sort
+
+
+def get_catalog_paginator(sort, cursor_pagination):
+    ordering = CATALOG_ORDERINGS[sort]
     bouquets = Bouquet.objects.all()
-    paginator = Paginator(bouquets, 3)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if cursor_pagination:
+        return KeysetPaginator(bouquets, settings.CATALOG_PER_PAGE, ordering)
+    return Paginator(bouquets.order_by(*ordering), settings.CATALOG_PER_PAGE)
+
+
+def catalog(request):
+    sort = get_catalog_sort(request)
+    cursor_pagination = use_cursor_pagination(request)
+    paginator = get_catalog_paginator(sort, cursor_pagination)
+    page = request.GET.get('cursor' if cursor_pagination else 'page')
+    page_obj = SimpleLazyObject(lambda: paginator.get_page(page))
     form = handle_consultation_submission(request, 'catalog')
     if isinstance(form, HttpResponseRedirect):
         return form
+    return catalog_page(request, paginator, page_obj, cursor_pagination, sort, form)
+
+
+def catalog_page(request, paginator, page_obj, cursor_pagination, sort, form):
+    # The fragment is cached per page the paginator actually serves, not
+    # per raw query string, so junk ?page= or ?cursor= values share entries.
+    if cursor_pagination:
+        page_key = paginator.decode(request.GET.get('cursor', ''))
+    else:
+        page_key = SimpleLazyObject(lambda: page_obj.number)
     return render(
         request,
         'catalog.html',
-        {'page_obj': page_obj, 'consultation_form': form}
+        {
+            'page_obj': page_obj, 'page_key': page_key, 'cursor_pagination': cursor_pagination, 'sort': sort,
+            'consultation_form': form,
+        }
     )
 
 
@@ -191,6 +265,28 @@ def card(request, bouquet_id):
     )
 
 
+def search_url(query):
+    url = reverse('search')
+    return f"{url}?{urlencode({'q': query})}" if query else url
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    form = handle_consultation_submission(request, search_url(query))
+    if isinstance(form, HttpResponseRedirect):
+        return form
+    ids = search_bouquets(query, settings.SEARCH_RESULTS_LIMIT)
+    return search_page(request, query, ids, Bouquet.objects.in_bulk(ids), form)
+
+
+def search_page(request, query, ids, found, form):
+    return render(
+        request,
+        'search.html',
+        {'query': query, 'bouquets': [found[i] for i in ids if i in found], 'consultation_form': form}
+    )
+
+
 def consultation(request):
     form = handle_consultation_submission(request, 'index')
     if isinstance(form, HttpResponseRedirect):
@@ -202,56 +298,7 @@ def consultation(request):
     )
 
 
-def order(request, bouquet_id):
-    bouquet = get_object_or_404(Bouquet, id=bouquet_id)
-    if request.method == 'POST':
-        customer_form = CustomerForm(request.POST)
-        order_form = OrderForm(request.POST)
-        if customer_form.is_valid() and order_form.is_valid():
-            customer = customer_form.save()
-            order = order_form.save(commit=False)
-            order.bouquet = bouquet
-            order.customer = customer
-            couriers = Courier.objects.annotate(order_count=Count('order')).order_by('order_count')
-            if couriers.exists():
-                order.courier = couriers.first()
-            order.save()
-            try:
-                Configuration.account_id = settings.YOOKASSA_SHOP_ID
-                Configuration.secret_key = settings.YOOKASSA_SECRET_KEY
-                idempotence_key = str(uuid.uuid4())
-                payment = YooPayment.create(
-                    {
-                        "amount": {"value": str(order.bouquet.price), "currency": "RUB"},
-                        "confirmation": {
-                            "type": "redirect",
-                            "return_url": request.build_absolute_uri(reverse('order_complete', args=[order.id]))
-                        },
-                        "capture": True,
-                        "description": f"Заказ {order.id}: {order.bouquet.name}",
-                        "metadata": {"order_id": order.id}
-                    },
-                    idempotence_key
-                )
-                Payment.objects.create(
-                    order=order,
-                    payment_id=payment.id,
-                    status=payment.status,
-                    amount=order.bouquet.price
-                )
-                return redirect(payment.confirmation.confirmation_url)
-            except Exception as e:
-                messages.error(request, f"Ошибка оплаты: {e}")
-                return render(
-                    request,
-                    'order.html',
-                    {'bouquet': bouquet, 'customer_form': customer_form, 'order_form': order_form}
-                )
-        else:
-            messages.error(request, 'Проверьте данные.')
-    else:
-        customer_form = CustomerForm()
-        order_form = OrderForm()
+def order_page(request, bouquet, customer_form, order_form):
     return render(
         request,
         'order.html',
@@ -259,6 +306,62 @@ def order(request, bouquet_id):
     )
 
 
+def place_order(request, bouquet, customer_form, order_form):
+    """Validate the forms and save the order; returns None after queueing an error message."""
+    if not (customer_form.is_valid() and order_form.is_valid()):
+        messages.error(request, 'Проверьте данные.')
+        return None
+    # The payment request stays outside the transaction so the write
+    # lock is never held across a call to YooKassa.
+    try:
+        with transaction.atomic():
+            customer = upsert_customer(**customer_form.cleaned_data)
+            order = order_form.save(commit=False)
+            order.bouquet = bouquet
+            order.customer = customer
+            order.delivery_slot = get_delivery_slot(*order_form.cleaned_data['delivery_window'])
+            order.courier = dispatch_courier(order.delivery_slot)
+            order.save()
+    except SlotFull:
+        messages.error(request, 'На выбранное время нет свободных курьеров, выберите другое.')
+        return None
+    return order
+
+
+def get_payment_details(request, order):
+    return {
+        'amount': order.bouquet.price,
+        'description': f"Заказ {order.id}: {order.bouquet.name}",
+        'return_url': request.build_absolute_uri(reverse('order_complete', args=[order.id])),
+        'metadata': {"order_id": order.id},
+        'idempotence_key': f"order-{order.id}",
+    }
+
+
+def order(request, bouquet_id):
+    bouquet = get_object_or_404(Bouquet, id=bouquet_id)
+    if request.method != 'POST':
+        return order_page(request, bouquet, CustomerForm(), OrderForm())
+    customer_form = CustomerForm(request.POST)
+    order_form = OrderForm(request.POST)
+    order = place_order(request, bouquet, customer_form, order_form)
+    if order is None:
+        return order_page(request, bouquet, customer_form, order_form)
+    try:
+        payment = get_payment_gateway().create_payment(**get_payment_details(request, order))
+        Payment.objects.create(
+            order=order,
+            payment_id=payment.id,
+            status=payment.status,
+            amount=order.bouquet.price
+        )
+        return redirect(payment.confirmation_url)
+    except PaymentError as e:
+        messages.error(request, f"Ошибка оплаты: {e}")
+        return order_page(request, bouquet, customer_form, order_form)
+
+
+@use_primary
 def order_complete(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     payment = order.payment
@@ -273,75 +376,55 @@ def order_complete(request, order_id):
 def webhook_yookassa(request):
     if request.method == 'POST':
         try:
-            event_json = json.loads(request.body)
-            if event_json['event'] == 'payment.succeeded':
-                payment_id = event_json['object']['id']
-                payment_obj = Payment.objects.get(payment_id=payment_id)
-                payment_obj.status = 'succeeded'
-                payment_obj.save()
-                order = payment_obj.order
-                courier_chat_id = (
-                    order.courier.telegram_chat_id
-                    if order.courier and order.courier.telegram_chat_id
-                    else settings.TELEGRAM_COURIER_CHAT_ID
-                )
-                if courier_chat_id:
-                    message = (
-                        f"<b>Заказ оплачен:</b>\n"
-                        f"Букет: {order.bouquet.name}\n"
-                        f"Адрес: {order.delivery_address}\n"
-                        f"Время: {order.delivery_time}\n"
-                        f"Клиент: {order.customer.first_name} {order.customer.last_name or ''}\n"
-                        f"Телефон: {order.customer.phone_number}\n"
-                        f"Сумма: {payment_obj.amount} руб"
-                    )
-                    send_courier_telegram_message(courier_chat_id, message)
-        except JSONDecodeError:
-            return HttpResponse(status=400)
-        except RequestException:
+            record_event(json.loads(request.body))
+        except (JSONDecodeError, KeyError, TypeError):
             return HttpResponse(status=400)
         return HttpResponse(status=200)
     return HttpResponse(status=400)
 
 
+def get_stats_range(request):
+    form = StatsFilterForm(request.GET or None)
+    if form.is_valid():
+        return form, form.cleaned_data['start'], form.cleaned_data['end']
+    return form, None, None
+
+
 @staff_member_required
 def stats(request):
-    orders_by_bouquet = (
-        Order.objects.values('bouquet__name')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-    orders_by_date = (
-        Order.objects.extra(select={'date': 'date(created_at)'})
-        .values('date')
-        .annotate(count=Count('id'))
-    )
-    orders_by_customer = (
-        Order.objects.values('customer__first_name', 'customer__last_name')
-        .annotate(count=Count('id'))
-    )
+    form, start, end = get_stats_range(request)
     context = {
-        'orders_by_bouquet': orders_by_bouquet,
-        'orders_by_date': orders_by_date,
-        'orders_by_customer': orders_by_customer,
+        'filter_form': form,
+        'orders_by_bouquet': rollups.orders_by_bouquet(start, end),
+        'orders_by_date': rollups.orders_by_date(start, end),
+        'orders_by_customer': rollups.orders_by_customer(start, end),
+        'orders_by_courier': rollups.orders_by_courier(start, end),
+        'fragment_stats': get_fragment_stats(),
     }
     return render(request, 'stats.html', context)
 
 
+def iter_stats_rows(start, end):
+    chunk_size = settings.STATS_EXPORT_CHUNK_SIZE
+    yield ['Тип статистики', 'Категория', 'Количество']
+    for item in rollups.orders_by_bouquet(start, end).iterator(chunk_size=chunk_size):
+        yield ['Букет', item['bouquet__name'], item['count']]
+    for item in rollups.orders_by_date(start, end).iterator(chunk_size=chunk_size):
+        yield ['Дата', item['date'], item['count']]
+    for item in rollups.orders_by_customer(start, end).iterator(chunk_size=chunk_size):
+        yield ['Клиент', f"{item['customer__first_name']} {item['customer__last_name'] or ''}", item['count']]
+    for item in rollups.orders_by_courier(start, end).iterator(chunk_size=chunk_size):
+        yield ['Курьер', item['courier__name'], item['count']]
+
+
 @staff_member_required
 def stats_download(request):
-    output = StringIO()
-    output.write(codecs.BOM_UTF8.decode('utf-8'))
-    writer = csv.writer(output)
-    
-    writer.writerow(['Тип статистики', 'Категория', 'Количество'])
-    for item in Order.objects.values('bouquet__name').annotate(count=Count('id')).order_by('-count'):
-        writer.writerow(['Букет', item['bouquet__name'], item['count']])
-    for item in Order.objects.extra(select={'date': 'date(created_at)'}).values('date').annotate(count=Count('id')):
-        writer.writerow(['Дата', item['date'], item['count']])
-    for item in Order.objects.values('customer__first_name', 'customer__last_name').annotate(count=Count('id')):
-        writer.writerow(['Клиент', f"{item['customer__first_name']} {item['customer__last_name'] or ''}", item['count']])
-    
-    response = HttpResponse(output.getvalue(), content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="stats.csv"'
-    return response
\ No newline at end of file
+    _, start, end = get_stats_range(request)
+    content = iter_csv(iter_stats_rows(start, end))
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(iter_gzip(content), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="stats.csv.gz"'
+    else:
+        response = StreamingHttpResponse(content, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="stats.csv"'
+    return response
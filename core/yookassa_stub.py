@@ -0,0 +1,101 @@
+"""Local stand-in for the YooKassa v3 API used to load-test checkout offline.
+
+Only ``POST /v3/payments`` is implemented. Every response is delayed by
+``latency`` ± ``jitter`` seconds; ``failure_rate`` of requests get a 500 and
+``hang_rate`` of requests sleep for ``hang`` seconds to exercise timeouts.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeYooKassaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, jitter=0.05, failure_rate=0.0, hang_rate=0.0, hang=30.0):
+        super().__init__(address, FakeYooKassaHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.payments = {}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v3'
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeYooKassaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/v3/payments':
+            return self.respond(404, {'type': 'error', 'code': 'not_found'})
+        if self.headers.get('Authorization') is None:
+            return self.respond(401, {'type': 'error', 'code': 'invalid_credentials'})
+        server = self.server
+        time.sleep(max(0, random.gauss(server.latency, server.jitter)))
+        roll = random.random()
+        if roll < server.hang_rate:
+            server.count('hung')
+            time.sleep(server.hang)
+        elif roll < server.hang_rate + server.failure_rate:
+            server.count('failed')
+            return self.respond(500, {'type': 'error', 'code': 'internal_server_error'})
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return self.respond(400, {'type': 'error', 'code': 'invalid_request'})
+        key = self.headers.get('Idempotence-Key')
+        with server.lock:
+            payment = server.payments.get(key)
+            if payment is None:
+                payment_id = str(uuid.uuid4())
+                payment = server.payments[key] = {
+                    'id': payment_id,
+                    'status': 'pending',
+                    'paid': False,
+                    'amount': request.get('amount'),
+                    'description': request.get('description'),
+                    'metadata': request.get('metadata', {}),
+                    'confirmation': {
+                        'type': 'redirect',
+                        'return_url': request.get('confirmation', {}).get('return_url'),
+                        'confirmation_url': f'https://yoomoney.ru/checkout/payments/v2/contract?orderId={payment_id}',
+                    },
+                }
+        server.count('created')
+        self.respond(200, payment)
+
+    def respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_prime_flower_shop.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# App code is imported once get_asgi_application() has set Django up.
+from core.lifespan import Lifespan  # noqa: E402
+
+application = Lifespan(django_application)
@@ -24,6 +24,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.static_files.PrecompressedStaticMiddleware',
+    'core.perf.PerformanceMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -36,7 +39,7 @@ ROOT_URLCONF = 'project_prime_flower_shop.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.perf.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -54,9 +57,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the shared in-memory database, which fails
+        # concurrent writers with "table is locked" instead of making them
+        # wait, so tests can run writers in parallel threads like a server.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Production profile for serving from SQLite: WAL lets readers run next to
+# the single writer, and BEGIN IMMEDIATE takes the write lock at the start of
+# every atomic() block, so writers queue on the busy timeout instead of
+# failing with "database is locked" when a read lock cannot be upgraded.
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA cache_size=-65536;'
+        'PRAGMA temp_store=MEMORY'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 10,
+}
+if os.getenv('SQLITE_PRODUCTION') == '1':
+    DATABASES['default']['OPTIONS'] = SQLITE_PRODUCTION_OPTIONS
+
+# Read replicas, e.g. SQLITE_REPLICAS=db-replica.sqlite3. Safe requests read
+# from them through core.db_router; for SQLite, replicate_sqlite keeps the
+# files in sync. The catalog version marks a replica as fresh, so the cache
+# has to be shared between processes (CACHE_DIR or a cache server).
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.getenv('SQLITE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 15
+REPLICA_MAX_LAG = 30
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'flower-shop',
+    }
+}
+if os.getenv('CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR'),
+    }
+
 LANGUAGE_CODE = 'ru-ru'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -65,6 +118,15 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Hashed names need collectstatic to have run, so this is switched on per deployment.
+STATIC_MANIFEST = os.getenv('STATIC_MANIFEST', '0') == '1'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'core.static_files.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -81,4 +143,67 @@ TELEGRAM_FLORIST_CHAT_ID = os.getenv('TELEGRAM_FLORIST_CHAT_ID')
 TELEGRAM_COURIER_BOT_TOKEN = os.getenv('TELEGRAM_COURIER_BOT_TOKEN')
 TELEGRAM_COURIER_CHAT_ID = os.getenv('TELEGRAM_COURIER_CHAT_ID')
 YOOKASSA_SHOP_ID = os.getenv('YOOKASSA_SHOP_ID')
-YOOKASSA_SECRET_KEY = os.getenv('YOOKASSA_SECRET_KEY')
\ No newline at end of file
+YOOKASSA_SECRET_KEY = os.getenv('YOOKASSA_SECRET_KEY')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT = (3.05, 10)
+TELEGRAM_WORKERS = 8
+TELEGRAM_MAX_ATTEMPTS = 8
+TELEGRAM_RETRY_BASE_DELAY = 5
+TELEGRAM_RETRY_MAX_DELAY = 600
+TELEGRAM_CLAIM_LEASE = 60
+TELEGRAM_MESSAGE_LIMIT = 4096
+TELEGRAM_CHAT_RATE = 1
+TELEGRAM_CHAT_BURST = 1
+TELEGRAM_BOT_RATE = 30
+BOUQUET_INDEX_TTL = 300
+RECOMMENDATIONS_COUNT = 3
+RECOMMENDATIONS_NO_REPEAT = os.getenv('RECOMMENDATIONS_NO_REPEAT') == '1'
+RECOMMENDATIONS_SEEN_LIMIT = 30
+CATALOG_PER_PAGE = 3
+CATALOG_PAGINATION = os.getenv('CATALOG_PAGINATION', 'auto')
+CATALOG_CURSOR_THRESHOLD = 300
+SEARCH_RESULTS_LIMIT = 24
+SEARCH_RANK_CANDIDATES = 1000
+
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+FLORIST_LOAD_WINDOW_HOURS = 24
+FLORIST_ASSIGN_ATTEMPTS = 5
+DELIVERY_WINDOWS = [(10, 12), (12, 14), (14, 16), (16, 18), (18, 20)]
+COURIER_DISPATCH_ATTEMPTS = 5
+STATS_EXPORT_CHUNK_SIZE = 2000
+PAYMENT_BACKEND = os.getenv('PAYMENT_BACKEND', 'core.payments.YooKassaGateway')
+YOOKASSA_API_URL = os.getenv('YOOKASSA_API_URL', 'https://api.yookassa.ru/v3')
+PAYMENT_TIMEOUT = (3.05, 15)
+PAYMENT_POOL_SIZE = 10
+PAYMENT_EVENT_CLAIM_LEASE = 60
+PAYMENT_EVENT_MAX_ATTEMPTS = 5
+PAYMENT_EVENT_RETRY_DELAY = 5
+BOUQUET_IMAGE_WIDTHS = [160, 320, 640, 1024]
+# Anonymous visitors never touch the session: quiz answers and seen
+# recommendations live in signed cookies (core.signed_state), so only admin
+# logins create session rows.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+SIGNED_STATE_MAX_AGE = 7 * 24 * 60 * 60
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == '1'
+
+# Server-Timing shows anyone the query counts and timings of each page, so it
+# is opt-in.
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING') == '1'
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', '0.01'))
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', '500'))
+PERF_QUERY_LOG_LIMIT = 100
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'perf': {'class': 'logging.StreamHandler', 'formatter': 'json_line'},
+    },
+    'loggers': {
+        'core.perf': {'handlers': ['perf'], 'level': os.getenv('PERF_LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}